@@ -0,0 +1,284 @@
+import asyncio
+import json
+import sys
+import uuid
+from urllib.parse import parse_qs
+import exchange_pool
+import metrics
+import ratelimit
+import scanner
+import scheduler
+import server
+import shards
+import shared_cache
+import volume_index
+
+# ASGI serving mode: the same endpoints as server.py, written as coroutines
+# on the server's own event loop. A scan awaiting exchange I/O no longer
+# holds a worker, so one process serves many concurrent scans and reads, and
+# pooled exchange clients live as long as the process.
+#
+#   uvicorn asgi:app --host 0.0.0.0 --port 5000
+#
+# Cache keys, TTLs and the scheduler snapshot logic are shared with server.py.
+
+# Fix for Windows AsyncIO Loop
+if sys.platform == 'win32':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-headers', b'Content-Type,Authorization'),
+    (b'access-control-allow-methods', b'GET,PUT,POST,DELETE,OPTIONS'),
+]
+
+class Request:
+    def __init__(self, scope, receive):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = {k: v[-1] for k, v in parse_qs(scope.get('query_string', b'').decode()).items()}
+        self.headers = {k.decode().lower(): v.decode() for k, v in scope.get('headers', [])}
+        self._receive = receive
+
+    def arg(self, name, default=None, type=str):
+        try:
+            return type(self.args[name]) if name in self.args else default
+        except ValueError:
+            return default
+
+    async def json(self):
+        body = b''
+        while True:
+            message = await self._receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        return json.loads(body or b'{}')
+
+async def send_json(send, data, status=200):
+    body = json.dumps(data, default=float).encode()
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')] + CORS_HEADERS})
+    await send({'type': 'http.response.body', 'body': body})
+
+# --- Endpoints ---
+
+async def health(request, send):
+    await send_json(send, {'status': 'ok', 'message': 'Server is running'})
+
+async def get_pairs(request, send):
+    """Fetch top volume pairs (cached every 1 hour per exchange)"""
+    limit = request.arg('limit', 75, int)
+    exchange_id = request.arg('exchange', 'binance').lower()
+
+    try:
+        pairs = volume_index.top(exchange_id, limit)
+        if pairs is None:
+            print(f"Fetching fresh pairs from {exchange_id}...")
+            pairs = await volume_index.top_pairs(exchange_id, limit)
+    except Exception as e:
+        print(f"Error fetching pairs for {exchange_id}: {e}")
+        return await send_json(send, {'pairs': [], 'error': str(e), 'status': 'error'})
+    await send_json(send, {'pairs': pairs, 'status': 'success'})
+
+async def scan(exchange_id, symbols, config, on_result=None):
+    failed = {}
+    results = await scanner.scan_market_async(exchange_id, symbols, config, on_result=on_result,
+                                              on_error=failed.__setitem__)
+    return {'results': results, 'failed': failed}
+
+async def scan_pairs(request, send):
+    data = await request.json()
+    symbols = data.get('symbols', [])
+    config = data.get('config', {})
+    exchange_id = data.get('exchange', 'binance').lower()
+
+    exchanges = server.requested_exchanges(data)
+    if exchanges:
+        try:
+            payload = await shared_cache.single_flight_async(
+                server.multi_scan_key(exchanges, symbols, config),
+                lambda: server.scan_multi(exchanges, symbols, config),
+                server.scan_ttl(), cacheable=server.complete_scan
+            )
+        except Exception as e:
+            print(f"Scan Error ({', '.join(exchanges)}): {e}")
+            payload = {'results': [], 'failed': {}}
+        return await send_json(send, payload)
+
+    cached = server.snapshot_results(exchange_id, symbols, config)
+    if cached is not None:
+        return await send_json(send, {'results': cached})
+
+    try:
+        payload = await shared_cache.single_flight_async(
+            server.scan_key(exchange_id, symbols, config),
+            lambda: scan(exchange_id, symbols, config),
+            server.scan_ttl(), cacheable=server.complete_scan
+        )
+    except Exception as e:
+        print(f"Scan Error ({exchange_id}): {e}")
+        payload = {'results': [], 'failed': {}}
+    await send_json(send, payload)
+
+async def scan_shard(request, send):
+    """One shard of a coordinator's scan, as server.scan_shard"""
+    if not shards.authorized(request.headers.get('x-shard-token', '')):
+        return await send_json(send, {'error': 'Invalid shard token'}, status=403)
+    data = await request.json()
+    exchange_id = data.get('exchange', 'binance').lower()
+    try:
+        payload = await shards.scan_shard_async(exchange_id, data.get('symbols', []), data.get('config', {}))
+    except Exception as e:
+        print(f"Shard Error ({exchange_id}): {e}")
+        return await send_json(send, {'error': str(e)}, status=500)
+    await send_json(send, payload)
+
+async def rate_limits(request, send):
+    await send_json(send, ratelimit.snapshot())
+
+async def prometheus_metrics(request, send):
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'text/plain; version=0.0.4')] + CORS_HEADERS})
+    await send({'type': 'http.response.body', 'body': metrics.render().encode()})
+
+async def scan_trace(request, send):
+    await send_json(send, metrics.last_trace() or {})
+
+async def scan_stream(request, send):
+    """Server-Sent Events, same events as server.scan_stream"""
+    exchange_id = request.arg('exchange', 'binance').lower()
+    symbols = [s for s in request.arg('symbols', '').split(',') if s]
+    config = {k: request.arg(k, 'false').lower() in ('1', 'true') for k in ('use_rsi', 'use_adx', 'only_pulse')}
+    since = request.arg('since', '')
+    previous = (shared_cache.get_json(f"stream:{since}") if since else None) or {}
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no'),
+    ] + CORS_HEADERS})
+
+    async def emit(event, data):
+        await send({'type': 'http.response.body', 'body': server.sse_event(event, data).encode(), 'more_body': True})
+
+    current = {}
+    failed = {}
+
+    async def on_row(result):
+        current[result['Symbol']] = result
+        old = previous.get(result['Symbol'])
+        if old is None:
+            await emit('add', result)
+        elif old != result:
+            await emit('change', result)
+
+    key = server.scan_key(exchange_id, symbols, config)
+    cached = server.cached_scan_results(exchange_id, symbols, config)
+    token = shared_cache.try_lock(key) if cached is None else None
+    if cached is not None:
+        rows = cached
+    elif token is None:
+        # Another request is scanning the same thing: wait for its result
+        payload = await shared_cache.single_flight_async(key, lambda: scan(exchange_id, symbols, config),
+                                                         server.scan_ttl(), cacheable=server.complete_scan)
+        failed.update(payload['failed'])
+        rows = payload['results']
+    else:
+        queue = asyncio.Queue()
+        task = asyncio.ensure_future(scan(exchange_id, symbols, config, on_result=queue.put_nowait))
+        try:
+            while not (task.done() and queue.empty()):
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait([getter, task], return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    await on_row(getter.result())
+                else:
+                    getter.cancel()
+            payload = task.result()
+            failed.update(payload['failed'])
+            if server.complete_scan(payload):
+                shared_cache.set_json(key, payload, server.scan_ttl())
+        finally:
+            if not task.done():
+                task.cancel() # Client went away mid-stream
+            shared_cache.unlock(key, token)
+        rows = []
+
+    for result in rows:
+        await on_row(result)
+
+    for symbol, error in failed.items():
+        symbol = symbol.replace('.NS', '')
+        await emit('failed', {'Symbol': symbol, 'error': error})
+        if symbol in previous:
+            current[symbol] = previous[symbol]
+
+    for symbol in previous:
+        if symbol not in current:
+            await emit('remove', {'Symbol': symbol})
+
+    snapshot_id = uuid.uuid4().hex
+    shared_cache.set_json(f"stream:{snapshot_id}", current, server.STREAM_SNAPSHOT_TTL)
+    await emit('done', {'snapshot': snapshot_id, 'count': len(current)})
+    await send({'type': 'http.response.body', 'body': b''})
+
+ROUTES = {
+    ('GET', '/health'): health,
+    ('GET', '/api/pairs'): get_pairs,
+    ('POST', '/api/scan'): scan_pairs,
+    ('GET', '/api/scan/stream'): scan_stream,
+    ('POST', '/api/scan/shard'): scan_shard,
+    ('GET', '/api/ratelimits'): rate_limits,
+    ('GET', '/metrics'): prometheus_metrics,
+    ('GET', '/api/scan/trace'): scan_trace,
+}
+
+# --- Application ---
+
+async def lifespan(receive, send):
+    tasks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            tasks.append(asyncio.ensure_future(volume_index.run_forever()))
+            if server.RUN_SCHEDULER:
+                tasks.append(asyncio.ensure_future(scheduler.run_forever()))
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            for task in tasks:
+                task.cancel()
+            await exchange_pool.close_async_clients()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    request = Request(scope, receive)
+    print(f"REQ: {request.method} {request.path} from {(scope.get('client') or ('?',))[0]}")
+    if request.method == 'OPTIONS':
+        await send({'type': 'http.response.start', 'status': 204, 'headers': CORS_HEADERS})
+        return await send({'type': 'http.response.body', 'body': b''})
+
+    handler = ROUTES.get((request.method, request.path))
+    if handler is None:
+        return await send_json(send, {'error': 'Not found'}, status=404)
+    started = False
+
+    async def tracked_send(message):
+        nonlocal started
+        started = started or message['type'] == 'http.response.start'
+        await send(message)
+
+    try:
+        await handler(request, tracked_send)
+    except Exception as e:
+        print(f"ASGI Error {request.path}: {e}")
+        if not started:
+            await send_json(send, {'error': str(e)}, status=500)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, port=5000)
@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import exchange_pool
+import ratelimit
+import scanner
+
+# Bulk OHLCV history: pages through an exchange with since cursors and keeps
+# one Arrow IPC file per exchange/symbol/timeframe/month:
+#   data/history/binance/BTC_USDT/15m/2024-01.arrow
+# Files are uncompressed so readers can memory-map them: read_table slices
+# the mapped buffers without copying, and load_frame copies each column once
+# into the DataFrame it returns.
+# A rerun resumes from the last stored candle; every file is replaced
+# atomically, so an interrupted run never leaves a torn partition behind.
+
+# --- Configuration ---
+HISTORY_DIR = os.environ.get(
+    'HISTORY_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'history')
+)
+DEFAULT_START = '2020-01-01'
+FLUSH_ROWS = 20000  # Buffered candles written out per batch of pages
+SCHEMA = pa.schema([
+    ('timestamp', pa.int64()),  # Candle open time, ms since epoch (UTC)
+    ('open', pa.float64()),
+    ('high', pa.float64()),
+    ('low', pa.float64()),
+    ('close', pa.float64()),
+    ('volume', pa.float64()),
+])
+
+def _symbol_dir(exchange_id, symbol, timeframe):
+    return os.path.join(HISTORY_DIR, exchange_id, symbol.replace('/', '_').replace(':', '_'), timeframe)
+
+def _month(ts_ms):
+    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime('%Y-%m')
+
+def partitions(exchange_id, symbol, timeframe):
+    """Sorted month partition paths for one series"""
+    directory = _symbol_dir(exchange_id, symbol, timeframe)
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.endswith('.arrow')]
+
+# --- Reading ---
+
+def read_partition(path):
+    """Memory-mapped Arrow table (no copy of the column buffers)"""
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+def _first_at_or_after(column, ts_ms):
+    """Row of the first timestamp >= ts_ms, searching each chunk's mapped buffer in place"""
+    offset = 0
+    for chunk in column.chunks:
+        ts = chunk.to_numpy(zero_copy_only=True)
+        if len(ts) and ts[-1] >= ts_ms:
+            return offset + int(np.searchsorted(ts, ts_ms, side='left'))
+        offset += len(ts)
+    return offset
+
+def read_table(exchange_id, symbol, timeframe, start=None, end=None):
+    """
+    Stored candles as one Arrow table, optionally limited to [start, end) in
+    ms. The table is a zero-copy slice over the memory-mapped partitions.
+    """
+    paths = partitions(exchange_id, symbol, timeframe)
+    if start is not None:
+        paths = [p for p in paths if os.path.basename(p)[:7] >= _month(start)]
+    if end is not None:
+        paths = [p for p in paths if os.path.basename(p)[:7] <= _month(end - 1)]
+    if not paths:
+        return SCHEMA.empty_table()
+
+    table = pa.concat_tables([read_partition(p) for p in paths])
+    ts = table.column('timestamp')
+    lo = 0 if start is None else _first_at_or_after(ts, start)
+    hi = table.num_rows if end is None else _first_at_or_after(ts, end)
+    return table.slice(lo, hi - lo)
+
+def load_frame(exchange_id, symbol, timeframe, start=None, end=None):
+    """
+    Stored candles as a timestamp-indexed DataFrame (None if nothing is
+    stored). pandas needs contiguous memory, so the mapped chunks are copied
+    once, straight into the frame's float64 block.
+    """
+    table = read_table(exchange_id, symbol, timeframe, start, end)
+    if table.num_rows == 0:
+        return None
+    names = SCHEMA.names[1:]
+    values = np.empty((len(names), table.num_rows), dtype=np.float64)
+    for row, name in enumerate(names):
+        offset = 0
+        for chunk in table.column(name).chunks:
+            values[row, offset:offset + len(chunk)] = chunk.to_numpy(zero_copy_only=True)
+            offset += len(chunk)
+    ts = np.concatenate([c.to_numpy(zero_copy_only=True) for c in table.column('timestamp').chunks])
+    index = pd.DatetimeIndex(ts.astype('datetime64[ms]'), name='timestamp')
+    # values.T is column-major, so pandas keeps it as the frame's block without another copy
+    return pd.DataFrame(values.T, index=index, columns=names, copy=False)
+
+def last_timestamp(exchange_id, symbol, timeframe):
+    paths = partitions(exchange_id, symbol, timeframe)
+    if not paths:
+        return None
+    ts = read_partition(paths[-1]).column('timestamp')
+    return ts[len(ts) - 1].as_py() if len(ts) else None
+
+# --- Writing ---
+
+def write_rows(exchange_id, symbol, timeframe, rows):
+    """Merge ccxt OHLCV rows into their month partitions (dedupe on timestamp)"""
+    if not rows:
+        return
+    data = np.asarray(rows, dtype=np.float64)
+    months = np.array([_month(ts) for ts in data[:, 0]])
+    directory = _symbol_dir(exchange_id, symbol, timeframe)
+    os.makedirs(directory, exist_ok=True)
+
+    for month in np.unique(months):
+        chunk = data[months == month]
+        path = os.path.join(directory, f"{month}.arrow")
+        new = pa.table({name: (chunk[:, i].astype(np.int64) if i == 0 else chunk[:, i])
+                        for i, name in enumerate(SCHEMA.names)}, schema=SCHEMA)
+        if os.path.exists(path):
+            new = pa.concat_tables([read_partition(path), new])
+        # Sort, keep the newest copy of any timestamp that was fetched twice
+        df = new.to_pandas().drop_duplicates('timestamp', keep='last').sort_values('timestamp')
+        table = pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp, 'wb') as sink:
+            with pa.ipc.new_file(sink, SCHEMA) as writer:
+                writer.write_table(table)
+        os.replace(tmp, path)
+
+# --- Backfill ---
+
+async def backfill_symbol(client, exchange_id, symbol, timeframe='15m', start=None, end=None):
+    """
+    Page forward from the last stored candle (or start, in ms) up to end
+    (default: now), writing closed candles only. Returns candles written.
+    """
+    tf_ms = scanner.TIMEFRAME_MS[timeframe]
+    page = scanner.EXCHANGE_CONFIG.get(exchange_id, {}).get('max_ohlcv_limit', 1000)
+    last = last_timestamp(exchange_id, symbol, timeframe)
+    since = last + tf_ms if last is not None else (start if start is not None else _parse_date(DEFAULT_START))
+    end = end or int(time.time() * 1000)
+
+    written = 0
+    buffer = []
+    while since < end:
+        ohlcv = await ratelimit.call(exchange_id, client.fetch_ohlcv, symbol, timeframe, since=since, limit=page)
+        # Closed candles inside the range only (the newest one may still be forming)
+        now = int(time.time() * 1000)
+        ohlcv = [c for c in ohlcv if c[0] >= since and c[0] < end and c[0] + tf_ms <= now]
+        if not ohlcv:
+            break
+        buffer.extend(ohlcv)
+        since = ohlcv[-1][0] + tf_ms
+        if len(buffer) >= FLUSH_ROWS:
+            write_rows(exchange_id, symbol, timeframe, buffer)
+            written += len(buffer)
+            buffer = []
+
+    write_rows(exchange_id, symbol, timeframe, buffer)
+    return written + len(buffer)
+
+async def backfill(exchange_id, symbols, timeframe='15m', start=None, end=None):
+    """Backfill many symbols concurrently; the exchange's rate limiter paces the requests"""
+    client = await exchange_pool.get_async_client(exchange_id)
+
+    async def one(symbol):
+        started = time.time()
+        try:
+            count = await backfill_symbol(client, exchange_id, symbol, timeframe, start, end)
+            print(f"Backfill {symbol} {timeframe}: {count} candles in {time.time() - started:.1f}s")
+        except Exception as e:
+            # Whatever was flushed before the error is kept; a rerun resumes from there
+            print(f"Backfill Error {symbol} {timeframe}: {e}")
+
+    try:
+        await asyncio.gather(*(one(s) for s in symbols))
+    finally:
+        await exchange_pool.close_async_clients()
+
+def _parse_date(text):
+    return int(pd.Timestamp(text, tz='UTC').timestamp() * 1000)
+
+def main():
+    # Fix for Windows AsyncIO Loop
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+    parser = argparse.ArgumentParser(description='Backfill OHLCV history into monthly Arrow files')
+    parser.add_argument('symbols', nargs='*', help='Symbols to backfill (default: top volume pairs)')
+    parser.add_argument('--exchange', default='binance', choices=[e for e in scanner.EXCHANGE_CONFIG if e != 'nse'])
+    parser.add_argument('--timeframe', default='15m', choices=list(scanner.TIMEFRAME_MS))
+    parser.add_argument('--since', default=DEFAULT_START, help='First date for symbols with no stored history')
+    parser.add_argument('--until', default=None, help='Stop before this date (default: now)')
+    parser.add_argument('--top', type=int, default=scanner.TOP_N_COINS, help='Top volume pairs if no symbols are given')
+    args = parser.parse_args()
+
+    symbols = args.symbols or scanner.fetch_top_volume_pairs_sync(args.exchange, limit=args.top)
+    start = _parse_date(args.since)
+    end = _parse_date(args.until) if args.until else None
+
+    print(f"Backfilling {len(symbols)} symbols ({args.timeframe}) from {args.exchange} into {HISTORY_DIR}...")
+    try:
+        asyncio.run(backfill(args.exchange, symbols, args.timeframe, start, end))
+    except KeyboardInterrupt:
+        print("Interrupted; rerun to resume from the last stored candle.")
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,92 @@
 import pandas as pd
 # import pandas_ta as ta # Removed to avoid import error
-import yfinance as yf
-import ccxt
+# ccxt / yfinance are imported by the loaders that use them (sweeps and stored history need neither)
 import numpy as np
+import indicator_cache
+
+EMA_PERIODS = (21, 50, 100) # fast / mid / slow stack, as in the scanner
 
 def calculate_ema(series, period):
     return series.ewm(span=period, adjust=False).mean()
 
-def fetch_data_ccxt(symbol, limit=1000):
-    print(f"Fetching CCXT data for {symbol}...")
-    ex = ccxt.binance()
-    ohlcv = ex.fetch_ohlcv(symbol, '15m', limit=limit)
-    df_15m = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-    df_15m['timestamp'] = pd.to_datetime(df_15m['timestamp'], unit='ms')
-    df_15m.set_index('timestamp', inplace=True)
-    
+def build_timeframes(df_15m, periods=EMA_PERIODS, symbol=None):
+    """
+    EMAs (columns ema<period>) on the 15m frame (timestamp index) plus the
+    1H/4H frames resampled from it. Every series goes through
+    indicator_cache, so parameter variants over the same candles share them.
+    """
+    fast, mid, slow = periods
+    h15 = indicator_cache.frame_hash(df_15m)
     # Calculate indicators
-    df_15m['ema21'] = calculate_ema(df_15m['close'], 21)
-    df_15m['ema50'] = calculate_ema(df_15m['close'], 50)
+    df_15m[f'ema{fast}'] = indicator_cache.ema(symbol, '15m', df_15m, fast, h15)
+    df_15m[f'ema{mid}'] = indicator_cache.ema(symbol, '15m', df_15m, mid, h15)
     
-    # Resample for 1H
+    # Resample for 1H / 4H
     logic = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
-    df_1h = df_15m.resample('1h').agg(logic).dropna()
-    df_1h['ema21'] = calculate_ema(df_1h['close'], 21)
-    df_1h['ema50'] = calculate_ema(df_1h['close'], 50)
-    
-    # Resample for 4H
-    df_4h = df_15m.resample('4h').agg(logic).dropna()
-    df_4h['ema21'] = calculate_ema(df_4h['close'], 21)
-    df_4h['ema50'] = calculate_ema(df_4h['close'], 50)
-    df_4h['ema100'] = calculate_ema(df_4h['close'], 100)
+    candles = df_15m[list(logic)]
+    frames = []
+    for rule in ('1h', '4h'):
+        df = indicator_cache.resample(symbol, '15m', candles, rule,
+                                      lambda: candles.resample(rule).agg(logic).dropna(), h15)
+        h = indicator_cache.frame_hash(df)
+        for period in ((fast, mid) if rule == '1h' else (fast, mid, slow)):
+            df[f'ema{period}'] = indicator_cache.ema(symbol, rule, df, period, h)
+        frames.append(df)
     
+    df_1h, df_4h = frames
     return df_15m, df_1h, df_4h
 
+def add_filter_indicators(df_15m, symbol=None):
+    """RSI/ADX/DI columns on the 15m frame, as the scanner computes them"""
+    from scanner import RSI_PERIOD, ADX_PERIOD
+    h15 = indicator_cache.frame_hash(df_15m)
+    df_15m['rsi'] = indicator_cache.rsi(symbol, '15m', df_15m, RSI_PERIOD, h15)
+    df_15m['adx'], df_15m['plus_di'], df_15m['minus_di'] = indicator_cache.adx(symbol, '15m', df_15m, ADX_PERIOD, h15)
+    return df_15m
+
+def load_15m_ccxt(symbol, limit=1000, page=1000):
+    """Most recent `limit` 15m candles from Binance as a timestamp-indexed frame, paging past one request"""
+    import ccxt
+    ex = ccxt.binance()
+    tf_ms = 15 * 60 * 1000
+    since = ex.milliseconds() - limit * tf_ms
+    ohlcv = []
+    while len(ohlcv) < limit:
+        batch = ex.fetch_ohlcv(symbol, '15m', since=since, limit=min(page, limit - len(ohlcv)))
+        if not batch:
+            break
+        ohlcv.extend(batch)
+        since = batch[-1][0] + tf_ms
+        if len(batch) < min(page, limit):
+            break
+    df_15m = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df_15m['timestamp'] = pd.to_datetime(df_15m['timestamp'], unit='ms')
+    df_15m.set_index('timestamp', inplace=True)
+    return df_15m
+
+def load_15m_history(symbol, exchange_id='binance', start=None, end=None):
+    """15m candles backfilled by backfill.py (memory-mapped Arrow files), or None"""
+    import backfill
+    return backfill.load_frame(exchange_id, symbol, '15m', start, end)
+
+def fetch_data_history(symbol, exchange_id='binance'):
+    print(f"Loading stored history for {symbol}...")
+    df_15m = load_15m_history(symbol, exchange_id)
+    if df_15m is None:
+        print(f"No stored history for {symbol}; run backfill.py first.")
+        return None, None, None
+    return build_timeframes(df_15m, symbol=symbol)
+
+def fetch_data_ccxt(symbol, limit=1000):
+    print(f"Fetching CCXT data for {symbol}...")
+    return build_timeframes(load_15m_ccxt(symbol, limit))
+
 def fetch_data_yf(symbol, period="60d"):
     print(f"Fetching YFinance data for {symbol}...")
     # Fetch 15m data (base)
     # Note: YFinance mostly blocked in cloud environments, use locally.
     try:
+        import yfinance as yf
         df_15m = yf.download(symbol, interval="15m", period=period, progress=False)
         if df_15m.empty: return None, None, None
         df_15m.columns = df_15m.columns.str.lower()
@@ -51,37 +100,13 @@ def fetch_data_yf(symbol, period="60d"):
             
         df_15m.dropna(inplace=True)
 
-        # Calculate indicators
-        df_15m['ema21'] = calculate_ema(df_15m['close'], 21)
-        df_15m['ema50'] = calculate_ema(df_15m['close'], 50)
-        
-        # Resample for 1H
-        logic = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
-        df_1h = df_15m.resample('1h').agg(logic).dropna()
-        df_1h['ema21'] = calculate_ema(df_1h['close'], 21)
-        df_1h['ema50'] = calculate_ema(df_1h['close'], 50)
-        
-        # Resample for 4H
-        df_4h = df_15m.resample('4h').agg(logic).dropna()
-        df_4h['ema21'] = calculate_ema(df_4h['close'], 21)
-        df_4h['ema50'] = calculate_ema(df_4h['close'], 50)
-        df_4h['ema100'] = calculate_ema(df_4h['close'], 100)
-        
-        return df_15m, df_1h, df_4h
+        return build_timeframes(df_15m)
     except Exception as e:
         print(f"YFinance Failed: {e}")
         return None, None, None
 
-def run_backtest(symbol):
-    if '/' in symbol:
-        df_15m, df_1h, df_4h = fetch_data_ccxt(symbol)
-    else:
-        df_15m, df_1h, df_4h = fetch_data_yf(symbol)
-        
-    if df_15m is None: 
-        print(f"No data for {symbol}.")
-        return
-
+def align_timeframes(df_15m, df_1h, df_4h):
+    """15m rows joined with the last *completed* 1H/4H candle (columns suffixed _1h/_4h)"""
     # Align data (merge lower timeframe with higher timeframe state)
     # We use merge_asof 'forward'?? No. 'backward' to avoid lookahead.
     # We want valid 4h candle at T to be available at T (close time).
@@ -101,14 +126,22 @@ def run_backtest(symbol):
     df = pd.merge_asof(df, df_4h_shifted, left_index=True, right_index=True)
     
     df.dropna(inplace=True)
-    
-    # Run Simulation
-    balance = 10000
+    return df
+
+# --- Simulation ---
+# Both engines take the aligned frame and return (trades, final balance).
+# simulate_loop is the original row-by-row reference; simulate is the
+# array version and produces the identical trade list and balance.
+
+START_BALANCE = 10000
+STOP_LOSS = 0.02 # 2% SL
+TAKE_PROFIT = 0.04 # 4% TP (1:2 RR)
+
+def simulate_loop(df, sl_pct=STOP_LOSS, tp_pct=TAKE_PROFIT):
+    balance = START_BALANCE
     position = None # { 'entry': float, 'sl': float, 'tp': float, 'side': 'LONG' }
     trades = []
     
-    print(f"Simulating trades on {len(df)} candles...")
-    
     for time, row in df.iterrows():
         # Check Exits if in position
         if position:
@@ -145,8 +178,8 @@ def run_backtest(symbol):
         if long_4h and long_1h and long_15m:
             # ENTRY
             entry_price = row['close']
-            sl = entry_price * 0.98 # 2% SL
-            tp = entry_price * 1.04 # 4% TP (1:2 RR)
+            sl = entry_price * (1 - sl_pct)
+            tp = entry_price * (1 + tp_pct)
             
             position = {
                 'entry': entry_price,
@@ -156,6 +189,81 @@ def run_backtest(symbol):
             }
             # print(f"Entry {time} @ {entry_price}")
 
+    return trades, balance
+
+def entry_signals(df, periods=EMA_PERIODS):
+    """Boolean array: the LONG entry conditions of simulate_loop, for every row at once"""
+    fast, mid, slow = (f'ema{p}' for p in periods)
+    col = lambda c: df[c].to_numpy(dtype=float)
+    long_4h = ((col(f'{fast}_4h') > col(f'{mid}_4h')) & (col(f'{mid}_4h') > col(f'{slow}_4h'))
+               & (col('close_4h') > col(f'{fast}_4h')))
+    long_1h = col(f'{fast}_1h') > col(f'{mid}_1h')
+    long_15m = (col(fast) > col(mid)) & (col('close') > col(mid))
+    return long_4h & long_1h & long_15m
+
+def filter_signals(df, use_rsi=False, use_adx=False):
+    """The scanner's optional LONG filters (scanner.passes_filters) as a boolean array"""
+    keep = np.ones(len(df), dtype=bool)
+    if use_rsi:
+        keep &= np.round(df['rsi'].to_numpy(dtype=float), 2) > 50
+    if use_adx:
+        plus_di = np.round(df['plus_di'].to_numpy(dtype=float), 2)
+        minus_di = np.round(df['minus_di'].to_numpy(dtype=float), 2)
+        keep &= (np.round(df['adx'].to_numpy(dtype=float), 2) > 20) & (plus_di > minus_di)
+    return keep
+
+def first_exit(low, high, start, sl, tp, window=64):
+    """
+    Index of the first row >= start whose low hits sl or high hits tp, or -1.
+    Searches in doubling windows, so the cost follows the holding period
+    rather than the length of the series.
+    """
+    n = len(low)
+    while start < n:
+        end = min(start + window, n)
+        hit = (low[start:end] <= sl) | (high[start:end] >= tp)
+        if hit.any():
+            return start + int(hit.argmax())
+        start = end
+        window *= 2
+    return -1
+
+def simulate(df, sl_pct=STOP_LOSS, tp_pct=TAKE_PROFIT, signals=None):
+    """Array-based simulate_loop: jumps from entry to first SL/TP hit to next signal"""
+    if signals is None:
+        signals = entry_signals(df)
+    entries = np.flatnonzero(signals)
+    low = df['low'].to_numpy(dtype=float)
+    high = df['high'].to_numpy(dtype=float)
+    close = df['close'].to_numpy(dtype=float)
+    times = df.index
+    
+    balance = START_BALANCE
+    trades = []
+    k = 0
+    while k < len(entries):
+        i = entries[k]
+        entry_price = close[i]
+        sl = entry_price * (1 - sl_pct)
+        tp = entry_price * (1 + tp_pct)
+        
+        j = first_exit(low, high, i + 1, sl, tp)
+        if j < 0:
+            break # Still open at the end of the data
+        
+        # SL is checked first when one candle spans both levels
+        kind, exit_price = ('SL', sl) if low[j] <= sl else ('TP', tp)
+        pnl = (exit_price - entry_price) / entry_price * 100
+        balance_change = balance * (pnl/100)
+        trades.append({'time': times[j], 'type': kind, 'pnl_pct': pnl, 'balance': balance + balance_change})
+        balance += balance_change
+        
+        # No entry on the exit candle itself
+        k = np.searchsorted(entries, j, side='right')
+
+    return trades, balance
+
+def print_summary(symbol, trades, balance):
     # Stats
     wins = len([t for t in trades if t['pnl_pct'] > 0])
     losses = len([t for t in trades if t['pnl_pct'] <= 0])
@@ -166,9 +274,33 @@ def run_backtest(symbol):
     print(f"RESULTS FOR {symbol}")
     print(f"Total Trades: {total}")
     print(f"Win Rate: {win_rate:.2f}%")
-    print(f"Final Balance: ${balance:.2f} (Start: $10000)")
+    print(f"Final Balance: ${balance:.2f} (Start: ${START_BALANCE})")
     print("-" * 30)
 
+def run_backtest(symbol, engine='vector', source=None):
+    if source == 'history':
+        df_15m, df_1h, df_4h = fetch_data_history(symbol)
+    elif '/' in symbol:
+        df_15m, df_1h, df_4h = fetch_data_ccxt(symbol)
+    else:
+        df_15m, df_1h, df_4h = fetch_data_yf(symbol)
+        
+    if df_15m is None: 
+        print(f"No data for {symbol}.")
+        return
+
+    df = align_timeframes(df_15m, df_1h, df_4h)
+    
+    # Run Simulation
+    print(f"Simulating trades on {len(df)} candles...")
+    if engine == 'loop':
+        trades, balance = simulate_loop(df)
+    else:
+        trades, balance = simulate(df)
+
+    print_summary(symbol, trades, balance)
+    return trades, balance
+
 if __name__ == "__main__":
     # print("Running Stock Backtest (Note: May require running locally if blocked in cloud)")
     # run_backtest("RELIANCE.NS") 
@@ -0,0 +1,158 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import backtest_engine as engine
+import indicator_cache
+
+# Grid backtests: symbols x EMA stacks x SL/TP x RSI/ADX filter toggles,
+# spread over a process pool. Candles are written once per symbol as a .npy
+# file and memory-mapped by the workers, so tasks only carry a path.
+
+# --- Configuration ---
+SWEEP_DIR = os.environ.get(
+    'SWEEP_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sweep')
+)
+COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']  # timestamp in ms
+
+def export_candles(symbol, df_15m, data_dir=SWEEP_DIR):
+    """Write a timestamp-indexed 15m frame as an (n, 6) float64 .npy; returns its path"""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"{symbol.replace('/', '_')}_15m.npy")
+    ms = df_15m.index.values.astype('datetime64[ms]').astype(np.int64)
+    data = np.column_stack([ms.astype(np.float64), df_15m[COLUMNS[1:]].to_numpy(dtype=np.float64)])
+    np.save(path, data)
+    return path
+
+def map_candles(path):
+    """Memory-mapped candles as a timestamp-indexed frame (pages are shared between workers)"""
+    data = np.load(path, mmap_mode='r')
+    index = pd.to_datetime(data[:, 0].astype(np.int64), unit='ms')
+    return pd.DataFrame(data[:, 1:], index=index, columns=COLUMNS[1:])
+
+def max_drawdown(trades):
+    balances = np.array([engine.START_BALANCE] + [t['balance'] for t in trades], dtype=float)
+    peaks = np.maximum.accumulate(balances)
+    return float(((peaks - balances) / peaks).max() * 100)
+
+def run_task(symbol, path, periods, exits, filters):
+    """
+    One worker task: a symbol and one EMA stack, every SL/TP and filter
+    combination. Indicators and the aligned frame are built once and shared
+    by all of them.
+    """
+    df_15m = engine.add_filter_indicators(map_candles(path), symbol)
+    df = engine.align_timeframes(*engine.build_timeframes(df_15m, periods, symbol))
+    signals = engine.entry_signals(df, periods)
+
+    rows = []
+    for use_rsi, use_adx in filters:
+        masked = signals & engine.filter_signals(df, use_rsi, use_adx)
+        for sl_pct, tp_pct in exits:
+            trades, balance = engine.simulate(df, sl_pct, tp_pct, signals=masked)
+            wins = len([t for t in trades if t['pnl_pct'] > 0])
+            rows.append({
+                'symbol': symbol,
+                'ema_fast': periods[0], 'ema_mid': periods[1], 'ema_slow': periods[2],
+                'sl_pct': sl_pct, 'tp_pct': tp_pct,
+                'use_rsi': use_rsi, 'use_adx': use_adx,
+                'candles': len(df),
+                'trades': len(trades),
+                'wins': wins,
+                'win_rate': round(wins / len(trades) * 100, 2) if trades else 0.0,
+                'final_balance': round(balance, 2),
+                'return_pct': round((balance / engine.START_BALANCE - 1) * 100, 2),
+                'max_drawdown_pct': round(max_drawdown(trades), 2),
+            })
+    return rows
+
+def _init_worker(use_disk):
+    # Workers started with spawn/forkserver re-import indicator_cache, so the parent's setting is passed in
+    indicator_cache.USE_DISK = use_disk
+
+def run_sweep(paths, ema_periods, exits, filters, workers=None, use_disk=None):
+    """
+    paths: {symbol: .npy path}. ema_periods: [(fast, mid, slow), ...].
+    exits: [(sl_pct, tp_pct), ...]. filters: [(use_rsi, use_adx), ...].
+    use_disk: share indicator series through the disk cache (default:
+    indicator_cache.USE_DISK). Returns one row per combination, best
+    return first.
+    """
+    if use_disk is None:
+        use_disk = indicator_cache.USE_DISK
+    tasks = [(symbol, path, tuple(periods)) for symbol, path in paths.items() for periods in ema_periods]
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                             initializer=_init_worker, initargs=(use_disk,)) as pool:
+        futures = {pool.submit(run_task, symbol, path, periods, exits, filters): (symbol, periods)
+                   for symbol, path, periods in tasks}
+        for future in as_completed(futures):
+            symbol, periods = futures[future]
+            try:
+                rows.extend(future.result())
+            except Exception as e:
+                print(f"Sweep Error {symbol} {periods}: {e}")
+
+    table = pd.DataFrame(rows)
+    if not table.empty:
+        table = table.sort_values('return_pct', ascending=False).reset_index(drop=True)
+    return table
+
+def parse_list(text, cast=float):
+    return [cast(v) for v in text.split(',') if v]
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel EMA-stack backtest sweep')
+    parser.add_argument('symbols', nargs='*', default=['BTC/USDT'])
+    parser.add_argument('--candles', type=int, default=5000, help='15m candles per symbol')
+    parser.add_argument('--history', action='store_true',
+                        help='Use the full history stored by backfill.py instead of fetching --candles')
+    parser.add_argument('--ema', action='append', help='EMA stack "fast,mid,slow" (repeatable)')
+    parser.add_argument('--sl', default='0.01,0.02,0.03', help='Stop-loss fractions')
+    parser.add_argument('--tp', default='0.02,0.04,0.06', help='Take-profit fractions')
+    parser.add_argument('--filters', default='all', choices=['all', 'none'],
+                        help="'all': every RSI/ADX toggle combination, 'none': unfiltered only")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-disk-cache', action='store_true',
+                        help='Keep indicator series in memory only (default: shared .npy cache)')
+    parser.add_argument('--out', default=os.path.join(SWEEP_DIR, 'results.csv'))
+    args = parser.parse_args()
+
+    ema_periods = [tuple(parse_list(e, int)) for e in (args.ema or ['21,50,100'])]
+    exits = list(itertools.product(parse_list(args.sl), parse_list(args.tp)))
+    filters = list(itertools.product([False, True], repeat=2)) if args.filters == 'all' else [(False, False)]
+
+    paths = {}
+    for symbol in args.symbols:
+        try:
+            if args.history:
+                df_15m = engine.load_15m_history(symbol)
+                if df_15m is None:
+                    raise ValueError("no stored history (run backfill.py)")
+            else:
+                df_15m = engine.load_15m_ccxt(symbol, args.candles)
+            paths[symbol] = export_candles(symbol, df_15m)
+        except Exception as e:
+            print(f"Skipping {symbol}: {e}")
+
+    combos = len(paths) * len(ema_periods) * len(exits) * len(filters)
+    print(f"Sweeping {combos} combinations over {len(paths)} symbols...")
+    start = time.time()
+    # Workers share computed series through the disk cache, and repeated sweeps reuse them
+    table = run_sweep(paths, ema_periods, exits, filters, args.workers, use_disk=not args.no_disk_cache)
+    print(f"Sweep completed in {time.time() - start:.2f} seconds.")
+
+    if table.empty:
+        print("No results.")
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    table.to_csv(args.out, index=False)
+    print(table.head(20).to_string(index=False))
+    print(f"Full table: {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import numpy as np
+
+# Vectorised EMA-stack evaluation for many symbols at once.
+# Each timeframe is packed into 2-D float64 arrays (symbols x bars), right
+# aligned so the last column is every symbol's latest candle and shorter
+# histories are NaN-padded on the left. The EWM recurrences follow pandas'
+# ewm(adjust=False) NaN handling, so a padded row produces exactly the values
+# scanner.calculate_* would produce for that symbol's DataFrame.
+
+def pack(frames, columns=('high', 'low', 'close')):
+    """Stack per-symbol DataFrames or CandleBuffers into right-aligned 2-D arrays; missing ones become empty rows"""
+    lengths = np.array([0 if df is None else len(df) for df in frames], dtype=np.int64)
+    width = max(int(lengths.max()) if len(lengths) else 0, 1)
+    packed = {}
+    for col in columns:
+        arr = np.full((len(frames), width), np.nan)
+        for i, df in enumerate(frames):
+            if lengths[i]:
+                arr[i, width - lengths[i]:] = np.asarray(df[col], dtype=np.float64)
+        packed[col] = arr
+    return packed, lengths
+
+def ewm_2d(values, com=None, span=None, alpha=None):
+    """Row-wise Series.ewm(..., adjust=False).mean() over a 2-D array"""
+    if span is not None:
+        com = (span - 1) / 2.0
+    elif alpha is not None:
+        com = (1 - alpha) / alpha
+    alpha = 1.0 / (1.0 + com)
+    factor = 1.0 - alpha
+
+    out = np.empty_like(values)
+    weighted = values[:, 0].copy()
+    old_wt = np.ones(values.shape[0])
+    out[:, 0] = weighted
+    with np.errstate(invalid='ignore'):
+        for j in range(1, values.shape[1]):
+            cur = values[:, j]
+            obs = cur == cur
+            seeded = weighted == weighted
+            old_wt = np.where(seeded, old_wt * factor, old_wt)
+            blended = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+            weighted = np.where(seeded & obs & (weighted != cur), blended, weighted)
+            old_wt = np.where(seeded & obs, 1.0, old_wt)
+            weighted = np.where(~seeded & obs, cur, weighted)
+            out[:, j] = weighted
+    return out
+
+def _diff(values):
+    out = np.full_like(values, np.nan)
+    out[:, 1:] = values[:, 1:] - values[:, :-1]
+    return out
+
+def ema_2d(close, span):
+    return ewm_2d(close, span=span)
+
+def rsi_2d(close, period=14):
+    delta = _diff(close)
+    gain = np.where(delta == delta, np.maximum(delta, 0.0), np.nan)
+    loss = np.where(delta == delta, -1 * np.minimum(delta, 0.0), np.nan)
+    avg_gain = ewm_2d(gain, com=period - 1)
+    avg_loss = ewm_2d(loss, com=period - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+def adx_2d(high, low, close, period=14):
+    plus_dm = _diff(high)
+    minus_dm = _diff(low)
+    plus_dm[plus_dm < 0] = 0
+    minus_dm[minus_dm > 0] = 0
+
+    prev_close = np.full_like(close, np.nan)
+    prev_close[:, 1:] = close[:, :-1]
+    # fmax skips NaN like DataFrame.max(axis=1)
+    tr = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+
+    atr = ewm_2d(tr, alpha=1 / period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plus_di = 100 * (ewm_2d(plus_dm, alpha=1 / period) / atr)
+        minus_di = 100 * (ewm_2d(np.abs(minus_dm), alpha=1 / period) / atr)
+        dx = (np.abs(plus_di - minus_di) / np.abs(plus_di + minus_di)) * 100
+    adx = ewm_2d(dx, alpha=1 / period)
+    return adx, plus_di, minus_di
+
+# --- Stage Masks ---
+
+def trend_4h(frames, min_bars=20):
+    """LONG/SHORT masks for the 4H stack (EMA21 > 50 > 100 and close beyond EMA21)"""
+    packed, lengths = pack(frames, ('close',))
+    close = packed['close']
+    ema21, ema50, ema100 = (ema_2d(close, p)[:, -1] for p in (21, 50, 100))
+    last = close[:, -1]
+    enough = lengths >= min_bars
+    long_mask = enough & (ema21 > ema50) & (ema50 > ema100) & (last > ema21)
+    short_mask = enough & (ema21 < ema50) & (ema50 < ema100) & (last < ema21)
+    return long_mask, short_mask
+
+def trend_1h(frames, long_mask, short_mask):
+    """Pass mask for the 1H EMA21/EMA50 alignment with the 4H side"""
+    packed, lengths = pack(frames, ('close',))
+    close = packed['close']
+    ema21, ema50 = (ema_2d(close, p)[:, -1] for p in (21, 50))
+    return (lengths > 0) & ((long_mask & (ema21 > ema50)) | (short_mask & (ema21 < ema50)))
+
+def evaluate_batch(symbols, frames_4h, frames_1h, frames_15m, config, exchange_id='binance', rsi_period=14, adx_period=14):
+    """
+    Full LONG/SHORT/PULSE/MOMENTUM classification for a batch of symbols.
+    Returns result dicts in the same shape and order check_conditions_async
+    would produce, for the symbols that pass every stage.
+    """
+    if not symbols:
+        return []
+
+    long_4h, short_4h = trend_4h(frames_4h)
+    pass_1h = trend_1h(frames_1h, long_4h, short_4h)
+
+    packed, lengths = pack(frames_15m)
+    high, low, close = packed['high'], packed['low'], packed['close']
+    ema21 = ema_2d(close, 21)[:, -1]
+    ema50 = ema_2d(close, 50)[:, -1]
+    rsi = rsi_2d(close, rsi_period)[:, -1]
+    adx, plus_di, minus_di = (a[:, -1] for a in adx_2d(high, low, close, adx_period))
+    last = close[:, -1]
+
+    long_mask = long_4h & pass_1h & (lengths > 0) & (ema21 > ema50) & (last > ema50)
+    short_mask = short_4h & pass_1h & (lengths > 0) & (ema21 < ema50) & (last < ema50)
+    pulse_mask = (long_mask & (last < ema21)) | (short_mask & (last > ema21))
+
+    rsi_r = np.round(rsi, 2)
+    adx_r = np.round(adx, 2)
+    plus_di_r = np.round(plus_di, 2)
+    minus_di_r = np.round(minus_di, 2)
+    passed = long_mask | short_mask
+    if config.get('use_rsi'):
+        passed &= ~(long_mask & (rsi_r <= 50)) & ~(short_mask & (rsi_r >= 50))
+    if config.get('use_adx'):
+        passed &= ~(adx_r <= 20)
+        passed &= ~(long_mask & ~(plus_di_r > minus_di_r)) & ~(short_mask & ~(minus_di_r > plus_di_r))
+
+    # 24h change reference: 4H close six candles back
+    closes_4h, lengths_4h = pack(frames_4h, ('close',))
+    ref_24h = closes_4h['close'][:, -7] if closes_4h['close'].shape[1] >= 7 else np.full(len(symbols), np.nan)
+
+    results = []
+    for i in np.flatnonzero(passed):
+        if lengths_4h[i] > 6:
+            change = round(((last[i] - ref_24h[i]) / ref_24h[i]) * 100, 2)
+        else:
+            change = 0.0
+        results.append({
+            'Symbol': symbols[i].replace('.NS', ''),
+            'Exchange': exchange_id,
+            'Side': 'LONG' if long_mask[i] else 'SHORT',
+            '4H EMA Stack': 'PASS',
+            '1H EMA Stack': 'PASS',
+            '15m EMA Stack': 'PASS',
+            'Pass': True,
+            'Type': 'PULSE' if pulse_mask[i] else 'MOMENTUM',
+            'RSI (15m)': rsi_r[i],
+            'ADX (15m)': adx_r[i],
+            '+DI (15m)': plus_di_r[i],
+            '-DI (15m)': minus_di_r[i],
+            'Price': np.round(last[i], 2),
+            '24h Change': change,
+        })
+    return results
@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Offline benchmarks against mock_exchange.MockExchange: repeated scans over
+# synthetic (or recorded, --replay) universes with simulated latency and rate
+# limits, and multi-year backtests. Every case runs in a fresh process so the
+# peak memory it reports is its own. Save a run with --json and pass it to
+# --compare later to see regressions and improvements.
+#
+#   python benchmark.py --json data/bench/baseline.json
+#   python benchmark.py --only scan --universe 500 --latency 0.05 --rate-limit 600/5 --limiter
+
+# --- Configuration ---
+UNIVERSES = [75, 500, 2000]
+BACKTEST_YEARS = [1, 3]
+SCAN_EXCHANGE = 'bybit'  # Scans every target (binance/mexc scans are capped, see scanner.scan_targets)
+SCAN_HISTORY = 1000  # 15m candles behind the open one per mock symbol
+BARS_PER_YEAR = 365 * 96
+
+def peak_memory_mb():
+    """Peak resident set size of this process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float('nan')
+
+# --- Cases (each runs in its own process) ---
+
+def scan_case(universe, repeats, latency, jitter, rate_limit, limiter, batch, advance, replay):
+    import metrics
+    import ratelimit
+    import scanner
+    import symbol_cache
+    from mock_exchange import MockExchange
+
+    scanner.USE_CANDLE_STORE = False  # Measure the scan, not a warm SQLite store
+    symbol_cache.USE_SYMBOL_CACHE = False  # Every scan evaluates every symbol; mock layers stay out of data/cache.db
+    metrics.TRACE_DIR = tempfile.mkdtemp(prefix='bench-traces-')
+    options = dict(latency=latency, jitter=jitter, rate_limit=rate_limit, tick_seconds=0, exchange_id=SCAN_EXCHANGE)
+    if replay:
+        client = MockExchange.from_history(replay, replay_symbols(replay, universe), **options)
+        client.bar = max(client.bar - repeats * advance, 0)  # Leave candles to replay between scans
+    else:
+        symbols = [f"SYM{i:04d}/USDT" for i in range(universe)]
+        client = MockExchange(symbols, history=SCAN_HISTORY, future=repeats * advance + 1, **options)
+    if limiter:
+        ratelimit.attach(client, SCAN_EXCHANGE)
+    for symbol in client.symbols:
+        client._ohlcv(symbol)  # Generate the candles before timing
+
+    config = {'use_rsi': False, 'use_adx': False}
+    durations, latencies, passed, failed = [], [], 0, 0
+
+    def on_error(symbol, error):
+        nonlocal failed
+        failed += 1
+
+    async def run():
+        nonlocal passed
+        for _ in range(repeats):
+            started = time.perf_counter()
+            results = await scanner.scan_market_async(SCAN_EXCHANGE, client.symbols, config, batch=batch,
+                                                      client=client, on_error=on_error, trace=True)
+            durations.append(time.perf_counter() - started)
+            passed += len(results)
+            # Per-symbol latency: scan start until the symbol's last event
+            for events in metrics.last_trace()['symbols'].values():
+                if events:
+                    latencies.append(max(e['at'] for e in events))
+            client.advance(advance)
+
+    asyncio.run(run())
+    total = sum(durations)
+    return {
+        'case': f"scan {len(client.symbols)}" + (' batch' if batch else ''),
+        'symbols': len(client.symbols),
+        'scans': repeats,
+        'scans_per_sec': repeats / total,
+        'symbols_per_sec': len(client.symbols) * repeats / total,
+        'scan_p50_ms': percentile(durations, 50) * 1000,
+        'symbol_p50_ms': percentile(latencies, 50) * 1000,
+        'symbol_p99_ms': percentile(latencies, 99) * 1000,
+        'requests': client.requests,
+        'rejected_429': client.rejected,
+        'passed': passed,
+        'failed': failed,
+        'peak_mb': peak_memory_mb(),
+    }
+
+def replay_symbols(exchange_id, limit):
+    import backfill
+    directory = os.path.join(backfill.HISTORY_DIR, exchange_id)
+    stored = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+    # Directory names are symbols with '/' and ':' flattened; rebuild 'BASE/QUOTE'
+    symbols = [name.replace('_', '/', 1).replace('_', ':', 1) for name in stored
+               if os.path.isdir(os.path.join(directory, name, '15m'))]
+    if not symbols:
+        raise ValueError(f"No stored 15m history under {directory} (run backfill.py)")
+    return symbols[:limit]
+
+def backtest_case(years, loop):
+    import backtest_engine as engine
+    from mock_exchange import MockExchange
+
+    bars = int(years * BARS_PER_YEAR)
+    df_15m = MockExchange(['BENCH/USDT'], history=bars, future=1, tick_seconds=0).history('BENCH/USDT')
+
+    started = time.perf_counter()
+    df = engine.align_timeframes(*engine.build_timeframes(df_15m, symbol='BENCH/USDT'))
+    prepared = time.perf_counter()
+    trades, balance = engine.simulate(df)
+    simulated = time.perf_counter()
+    row = {
+        'case': f"backtest {years:g}y",
+        'candles': len(df),
+        'prepare_sec': prepared - started,
+        'simulate_sec': simulated - prepared,
+        'candles_per_sec': len(df) / (simulated - prepared),
+        'trades': len(trades),
+        'final_balance': round(balance, 2),
+    }
+    if loop:
+        started = time.perf_counter()
+        engine.simulate_loop(df)
+        row['loop_sec'] = time.perf_counter() - started
+    row['peak_mb'] = peak_memory_mb()
+    return row
+
+def run_isolated(func, *args):
+    """One case in a fresh interpreter (clean caches, its own peak RSS)"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(func, *args).result()
+
+# --- Reporting ---
+
+# Higher is better for these; lower is better for every other timing/memory column
+HIGHER_IS_BETTER = {'scans_per_sec', 'symbols_per_sec', 'candles_per_sec'}
+COMPARED = ['scans_per_sec', 'symbol_p50_ms', 'symbol_p99_ms', 'simulate_sec', 'prepare_sec', 'peak_mb']
+
+def print_rows(rows, baseline=None):
+    baseline = {r['case']: r for r in (baseline or [])}
+    for row in rows:
+        print(f"\n{row['case']}")
+        old = baseline.get(row['case'], {})
+        for key, value in row.items():
+            if key == 'case':
+                continue
+            text = f"{value:.2f}" if isinstance(value, float) else str(value)
+            if key in COMPARED and isinstance(old.get(key), (int, float)) and old[key]:
+                change = (value - old[key]) / old[key] * 100
+                better = change > 0 if key in HIGHER_IS_BETTER else change < 0
+                text += f"  ({change:+.1f}% vs baseline, {'better' if better else 'worse'})"
+            print(f"  {key:<16} {text}")
+
+def parse_rate_limit(text):
+    if not text:
+        return None
+    requests, seconds = text.split('/')
+    return int(requests), float(seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline scanner and backtest benchmarks')
+    parser.add_argument('--only', choices=['scan', 'backtest'], default=None)
+    parser.add_argument('--universe', default=','.join(map(str, UNIVERSES)), help='Symbols per scan case')
+    parser.add_argument('--repeats', type=int, default=5, help='Scans per universe')
+    parser.add_argument('--latency', type=float, default=0.02, help='Simulated seconds per request')
+    parser.add_argument('--jitter', type=float, default=0.5, help='Latency jitter as a fraction')
+    parser.add_argument('--rate-limit', default=None, help="Server-side budget 'requests/seconds', e.g. 600/5")
+    parser.add_argument('--limiter', action='store_true', help="Pace requests with ratelimit's token bucket")
+    parser.add_argument('--batch', action='store_true', help='Batch evaluation (scanner.scan_batch_async)')
+    parser.add_argument('--advance', type=int, default=1, help='15m candles the clock moves between scans')
+    parser.add_argument('--replay', default=None, metavar='EXCHANGE',
+                        help='Replay candles stored by backfill.py for this exchange instead of synthetic ones')
+    parser.add_argument('--years', default=','.join(map(str, BACKTEST_YEARS)), help='Backtest lengths')
+    parser.add_argument('--loop', action='store_true', help='Also time the row-by-row reference backtest')
+    parser.add_argument('--json', default=None, help='Write the results here')
+    parser.add_argument('--compare', default=None, help='Earlier --json output to compare against')
+    args = parser.parse_args()
+
+    rows = []
+    if args.only in (None, 'scan'):
+        for universe in (int(u) for u in args.universe.split(',') if u):
+            print(f"Benchmarking scans over {universe} symbols...")
+            rows.append(run_isolated(scan_case, universe, args.repeats, args.latency, args.jitter,
+                                     parse_rate_limit(args.rate_limit), args.limiter, args.batch,
+                                     args.advance, args.replay))
+    if args.only in (None, 'backtest'):
+        for years in (float(y) for y in args.years.split(',') if y):
+            print(f"Benchmarking a {years:g}-year backtest...")
+            rows.append(run_isolated(backtest_case, years, args.loop))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    print_rows(rows, baseline)
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump({'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'args': vars(args), 'results': rows}, f, indent=2)
+        print(f"\nResults: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Compact candle windows for the scanner's hot path, in place of a pandas
+# DataFrame per fetch. A CandleBuffer keeps up to `capacity` candles as one
+# int64 array of timestamps (epoch ms) and one float64 open/high/low/close/
+# volume block, stored column-major so each column of the window is a single
+# contiguous slice: the indicator code reads zero-copy views. New candles are
+# written in place behind the window, and the window only moves back to fresh
+# storage after SLACK appends, so appending is O(1) amortised. Storage that a
+# view or window() has been handed out from is never rewritten: replacing the
+# still-open candle first moves the window to fresh storage, and reset()
+# always starts on new arrays.
+#
+# The scanner keeps one buffer per (exchange, symbol, timeframe, capacity)
+# between scans (an LRU of MAX_BUFFERS), so a rescan only fetches and appends
+# the candles that are new since the last one.
+
+# --- Configuration ---
+MAX_BUFFERS = int(os.environ.get('CANDLE_BUFFERS', '5000'))  # Kept between scans; 0 builds one per fetch
+SLACK = 64  # Spare slots behind the window before it is moved to new storage
+COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+_INDEX = {c: i for i, c in enumerate(COLUMNS)}
+
+class CandleBuffer:
+    """Fixed-capacity window of OHLCV candles (ascending timestamps)"""
+    __slots__ = ('capacity', '_ts', '_values', '_start', '_end', '_shared')
+
+    def __init__(self, capacity, slack=SLACK):
+        self.capacity = capacity
+        self._ts = np.empty(capacity + slack, dtype=np.int64)
+        self._values = np.empty((len(COLUMNS), capacity + slack), dtype=np.float64)
+        self._start = 0
+        self._end = 0
+        self._shared = False  # Views of the storage have been handed out
+
+    @classmethod
+    def wrap(cls, ts, values):
+        """Full buffer over existing arrays (ts: (n,), values: (5, n)), without copying"""
+        buffer = cls.__new__(cls)
+        buffer.capacity = len(ts)
+        buffer._ts = ts
+        buffer._values = values
+        buffer._start = 0
+        buffer._end = len(ts)
+        buffer._shared = True
+        return buffer
+
+    @classmethod
+    def from_rows(cls, rows, capacity=None):
+        """Buffer holding ccxt-style [ts, open, high, low, close, volume] rows"""
+        rows = _as_rows(rows)
+        return cls(capacity or max(len(rows), 1)).reset(rows)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Buffer holding a frame in the scanner's column layout (timestamp, open, ..., volume)"""
+        ts = df['timestamp'].to_numpy().astype('datetime64[ms]').view(np.int64)
+        values = np.ascontiguousarray(df[COLUMNS].to_numpy(dtype=np.float64).T)
+        return cls.wrap(np.ascontiguousarray(ts), values)
+
+    # --- Views ---
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __getitem__(self, column):
+        """Zero-copy view of one column ('timestamp' or an OHLCV column) over the window"""
+        self._shared = True
+        if column == 'timestamp':
+            return self._ts[self._start:self._end]
+        return self._values[_INDEX[column], self._start:self._end]
+
+    @property
+    def timestamp(self):
+        return self['timestamp']
+
+    @property
+    def open(self):
+        return self['open']
+
+    @property
+    def high(self):
+        return self['high']
+
+    @property
+    def low(self):
+        return self['low']
+
+    @property
+    def close(self):
+        return self['close']
+
+    @property
+    def volume(self):
+        return self['volume']
+
+    @property
+    def values(self):
+        """(5, n) view of the OHLCV block"""
+        self._shared = True
+        return self._values[:, self._start:self._end]
+
+    def last_timestamp(self):
+        return int(self._ts[self._end - 1]) if self._end > self._start else None
+
+    def window(self, n=None):
+        """
+        Buffer over the current (or last n) candles that shares this one's
+        storage; later updates here do not change what it holds.
+        """
+        self._shared = True
+        start = self._start if n is None else max(self._start, self._end - n)
+        return CandleBuffer.wrap(self._ts[start:self._end], self._values[:, start:self._end])
+
+    # --- Updates ---
+
+    def reset(self, rows):
+        """Replace the window with rows (only the newest capacity of them are kept)"""
+        self._ts = np.empty_like(self._ts)
+        self._values = np.empty_like(self._values)
+        self._start = self._end = 0
+        self._shared = False
+        return self.extend(rows)
+
+    def extend(self, rows):
+        """
+        Append ccxt-style rows in place. Rows at or before the newest stored
+        candle are skipped, except that one with the same timestamp replaces
+        it (the still-open candle); the oldest candles drop out past capacity.
+        """
+        rows = _as_rows(rows)
+        ts = rows[:, 0].astype(np.int64)
+        last = self.last_timestamp()
+        if last is not None:
+            same = np.flatnonzero(ts == last)
+            if len(same):
+                if self._shared:
+                    self._move(len(self))
+                self._values[:, self._end - 1] = rows[same[-1], 1:]
+            rows, ts = rows[ts > last], ts[ts > last]
+
+        n = len(ts)
+        if n > self.capacity:
+            rows, ts, n = rows[-self.capacity:], ts[-self.capacity:], self.capacity
+        keep = min(len(self), self.capacity - n)
+        if self._end + n > len(self._ts):
+            self._move(keep)  # Out of slack
+        else:
+            self._start = self._end - keep
+        self._ts[self._end:self._end + n] = ts
+        self._values[:, self._end:self._end + n] = rows[:, 1:].T
+        self._end += n
+        return self
+
+    def append(self, ts, open, high, low, close, volume):
+        return self.extend([[ts, open, high, low, close, volume]])
+
+    def _move(self, keep):
+        """Move the newest keep candles to the front of fresh storage; views of the old one stay as they were"""
+        ts_store = np.empty_like(self._ts)
+        values_store = np.empty_like(self._values)
+        ts_store[:keep] = self._ts[self._end - keep:self._end]
+        values_store[:, :keep] = self._values[:, self._end - keep:self._end]
+        self._ts, self._values = ts_store, values_store
+        self._start, self._end = 0, keep
+        self._shared = False
+
+def _as_rows(rows):
+    return np.asarray(rows, dtype=np.float64).reshape(-1, len(COLUMNS) + 1)
+
+def resample(candles, timeframe_ms, per_bar):
+    """
+    Higher-timeframe candles out of lower-timeframe ones, in buckets anchored
+    to the Unix epoch. A leading bucket holding fewer than per_bar candles
+    is dropped; the trailing one is the still-open candle.
+    """
+    ts = candles.timestamp
+    if not len(ts):
+        return candles.window()
+    bucket = ts // timeframe_ms
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+    if ends[0] - starts[0] + 1 < per_bar:
+        starts, ends = starts[1:], ends[1:]
+    if not len(starts):
+        return CandleBuffer.wrap(ts[:0], candles.values[:, :0])
+    values = np.empty((len(COLUMNS), len(starts)), dtype=np.float64)
+    values[0] = candles.open[starts]
+    values[1] = np.maximum.reduceat(candles.high, starts)
+    values[2] = np.minimum.reduceat(candles.low, starts)
+    values[3] = candles.close[ends]
+    values[4] = np.add.reduceat(candles.volume, starts)
+    return CandleBuffer.wrap(bucket[starts] * timeframe_ms, values)
+
+# --- Kept Buffers ---
+
+_buffers = OrderedDict()
+# Structure: {(exchange, symbol, timeframe, capacity): CandleBuffer, ...}
+_lock = threading.Lock()
+
+def get(exchange_id, symbol, timeframe, capacity):
+    """The kept buffer of one series (empty on first use)"""
+    if MAX_BUFFERS <= 0:
+        return CandleBuffer(capacity)
+    key = (exchange_id, symbol, timeframe, capacity)
+    with _lock:
+        buffer = _buffers.get(key)
+        if buffer is None:
+            buffer = _buffers[key] = CandleBuffer(capacity)
+            while len(_buffers) > MAX_BUFFERS:
+                _buffers.popitem(last=False)
+        else:
+            _buffers.move_to_end(key)
+    return buffer
+
+def stats():
+    with _lock:
+        return {'buffers': len(_buffers),
+                'bytes': sum(b._ts.nbytes + b._values.nbytes for b in _buffers.values())}
+
+def clear():
+    with _lock:
+        _buffers.clear()
@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import threading
+import pandas as pd
+
+# --- Configuration ---
+STORE_PATH = os.environ.get(
+    'CANDLE_STORE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'candles.db')
+)
+MAX_CANDLES = 2000  # Rows kept per (exchange, symbol, timeframe) key
+
+COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+_local = threading.local()
+
+def _connect():
+    """One connection per thread (yfinance fetches run in worker threads)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(STORE_PATH), exist_ok=True)
+        conn = sqlite3.connect(STORE_PATH, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS candles (
+                exchange TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                timeframe TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                open REAL, high REAL, low REAL, close REAL, volume REAL,
+                PRIMARY KEY (exchange, symbol, timeframe, ts)
+            ) WITHOUT ROWID
+        """)
+        _local.conn = conn
+    return conn
+
+def stats(exchange, symbol, timeframe):
+    """Returns (row_count, last_timestamp_ms) for a key, (0, None) if empty"""
+    row = _connect().execute(
+        'SELECT COUNT(*), MAX(ts) FROM candles WHERE exchange=? AND symbol=? AND timeframe=?',
+        (exchange, symbol, timeframe)
+    ).fetchone()
+    return row[0], row[1]
+
+def save_candles(exchange, symbol, timeframe, ohlcv, replace=False):
+    """
+    Upserts ccxt-style rows [ts_ms, open, high, low, close, volume].
+    Existing timestamps are overwritten, so re-fetching the still-open
+    last candle updates it in place. replace=True drops the key first
+    (used when the new window does not connect to what is stored).
+    """
+    conn = _connect()
+    key = (exchange, symbol, timeframe)
+    with conn:
+        if replace:
+            conn.execute('DELETE FROM candles WHERE exchange=? AND symbol=? AND timeframe=?', key)
+        conn.executemany(
+            'INSERT OR REPLACE INTO candles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [key + (int(r[0]), r[1], r[2], r[3], r[4], r[5]) for r in ohlcv]
+        )
+        # Trim history beyond MAX_CANDLES
+        conn.execute("""
+            DELETE FROM candles WHERE exchange=? AND symbol=? AND timeframe=? AND ts < (
+                SELECT ts FROM candles WHERE exchange=? AND symbol=? AND timeframe=?
+                ORDER BY ts DESC LIMIT 1 OFFSET ?
+            )
+        """, key + key + (MAX_CANDLES - 1,))
+
+def load_candles(exchange, symbol, timeframe, limit=None, since=None):
+    """Loads the most recent candles (ascending) as ccxt-style rows"""
+    sql = 'SELECT ts, open, high, low, close, volume FROM candles WHERE exchange=? AND symbol=? AND timeframe=?'
+    params = [exchange, symbol, timeframe]
+    if since is not None:
+        sql += ' AND ts >= ?'
+        params.append(int(since))
+    sql += ' ORDER BY ts DESC'
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(int(limit))
+    rows = _connect().execute(sql, params).fetchall()
+    rows.reverse()
+    return rows
+
+def frame_to_rows(df):
+    """DataFrame with a datetime 'timestamp' column -> ccxt-style rows"""
+    ts = (df['timestamp'] - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)
+    values = df[['open', 'high', 'low', 'close', 'volume']].to_numpy(dtype='float64')
+    return [[int(t)] + list(v) for t, v in zip(ts, values)]
+
+def rows_to_frame(rows):
+    """ccxt-style rows -> DataFrame in the scanner's column layout"""
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    return df
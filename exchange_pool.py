@@ -0,0 +1,140 @@
+import asyncio
+import json
+import os
+import ssl
+import threading
+import time
+import ratelimit
+
+# Long-lived ccxt clients, one per exchange (per event loop for async clients),
+# with market metadata persisted to disk so a restarted worker skips the cold
+# load_markets() download.
+
+# --- Configuration ---
+MARKETS_DIR = os.environ.get(
+    'MARKETS_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'markets')
+)
+MARKETS_TTL = 6 * 3600  # Listings change rarely; refresh a few times a day
+KEEPALIVE_SECONDS = 120  # Idle time before a pooled HTTP connection is dropped
+
+_async_clients = {}
+# Structure: {(loop, 'binance'): client, ...}
+_market_loads = {}
+_market_times = {}
+_sync_clients = {}
+_sync_lock = threading.Lock()
+
+def exchange_options(exchange_id):
+    from scanner import EXCHANGE_CONFIG
+    if exchange_id not in EXCHANGE_CONFIG or exchange_id == 'nse':
+        raise ValueError(f"Unsupported exchange: {exchange_id}")
+    return EXCHANGE_CONFIG[exchange_id]['options']
+
+# --- Market Metadata Cache ---
+
+def _markets_path(exchange_id):
+    return os.path.join(MARKETS_DIR, f"{exchange_id}.json")
+
+def load_cached_markets(exchange_id):
+    """(markets, currencies) from disk if younger than MARKETS_TTL, else None"""
+    try:
+        with open(_markets_path(exchange_id)) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - cached.get('timestamp', 0) > MARKETS_TTL:
+        return None
+    return cached['markets'], cached.get('currencies')
+
+def save_markets(exchange_id, client):
+    os.makedirs(MARKETS_DIR, exist_ok=True)
+    path = _markets_path(exchange_id)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'w') as f:
+            json.dump({'timestamp': time.time(), 'markets': client.markets, 'currencies': client.currencies}, f, default=str)
+        os.replace(tmp, path)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Could not persist markets for {exchange_id}: {e}")
+
+def apply_cached_markets(client, exchange_id):
+    cached = load_cached_markets(exchange_id)
+    if cached is None:
+        return False
+    client.set_markets(*cached)
+    return True
+
+# --- Async Clients ---
+
+def _keepalive_session(client):
+    """aiohttp session with a longer keep-alive than ccxt's default connector"""
+    import aiohttp
+    ssl_context = ssl.create_default_context(cafile=client.cafile) if client.verify else False
+    connector = aiohttp.TCPConnector(ssl=ssl_context, keepalive_timeout=KEEPALIVE_SECONDS, enable_cleanup_closed=True)
+    return aiohttp.ClientSession(connector=connector, trust_env=client.aiohttp_trust_env)
+
+async def _load_markets(client, exchange_id):
+    if not apply_cached_markets(client, exchange_id):
+        await client.load_markets()
+        save_markets(exchange_id, client)
+
+async def get_async_client(exchange_id):
+    """Pooled ccxt async client for this event loop, markets already loaded"""
+    import ccxt.async_support as ccxt
+    loop = asyncio.get_running_loop()
+    key = (loop, exchange_id)
+    client = _async_clients.get(key)
+    if client is None:
+        client = getattr(ccxt, exchange_id)({
+            'enableRateLimit': True,
+            'options': exchange_options(exchange_id)
+        })
+        client.session = _keepalive_session(client)
+        client.own_session = False
+        ratelimit.attach(client, exchange_id)
+        _async_clients[key] = client
+    if key not in _market_loads or time.time() - _market_times.get(key, 0) > MARKETS_TTL:
+        _market_times[key] = time.time()
+        _market_loads[key] = asyncio.ensure_future(_load_markets(client, exchange_id))
+    try:
+        await asyncio.shield(_market_loads[key])
+    except Exception as e:
+        # Markets will be loaded lazily by ccxt on the first request instead
+        print(f"Market load failed for {exchange_id}: {e}")
+        _market_loads.pop(key, None)
+    return client
+
+async def close_async_clients():
+    """Close every pooled client that belongs to the running loop"""
+    loop = asyncio.get_running_loop()
+    for key in [k for k in _async_clients if k[0] is loop]:
+        client = _async_clients.pop(key)
+        _market_loads.pop(key, None)
+        _market_times.pop(key, None)
+        session = client.session
+        try:
+            await client.close()
+        finally:
+            if session is not None:
+                await session.close()
+
+# --- Sync Clients ---
+
+def get_sync_client(exchange_id):
+    """Pooled blocking ccxt client (pair discovery, backfills)"""
+    import ccxt
+    with _sync_lock:
+        client = _sync_clients.get(exchange_id)
+        if client is None:
+            client = getattr(ccxt, exchange_id)({
+                'enableRateLimit': True,
+                'options': exchange_options(exchange_id)
+            })
+            _sync_clients[exchange_id] = client
+        if not client.markets or time.time() - _market_times.get(exchange_id, 0) > MARKETS_TTL:
+            _market_times[exchange_id] = time.time()
+            if not apply_cached_markets(client, exchange_id):
+                client.load_markets()
+                save_markets(exchange_id, client)
+    return client
@@ -0,0 +1,25 @@
+import gc
+import os
+
+# Read by gunicorn from the working directory (the Procfile's web process).
+# The master imports the app once and warms up the data-source libraries
+# (scanner.warm_up) before forking, so every worker starts with them already
+# in memory, shared copy-on-write, instead of importing them itself.
+# GUNICORN_PRELOAD=0 goes back to each worker loading the app on its own.
+#
+# Nothing that holds a connection, thread or event loop is created here:
+# the shared cache, the runtime loop and the background refreshers all
+# start lazily inside each worker.
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+def when_ready(server):
+    """Runs in the master after the app is loaded, before the first worker forks"""
+    if not preload_app:
+        return
+    import scanner
+    scanner.warm_up()
+    # Objects that exist now are never collected; keeping the GC off them
+    # stops it from touching (and so un-sharing) the workers' copied pages
+    gc.collect()
+    gc.freeze()
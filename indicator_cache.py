@@ -0,0 +1,168 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from candle_buffer import CandleBuffer
+
+# Content-addressed cache of derived series (resamples, EMA, RSI, ADX).
+# Entries are keyed by (symbol, timeframe, hash of the input candles,
+# indicator, params), so any caller that sees the same candles -- the
+# scanner, the backtester, every variant of a sweep -- computes each series
+# once. Memory is an LRU bounded in bytes; the optional disk layer keeps
+# .npy files that survive restarts and are shared between processes.
+
+# --- Configuration ---
+MAX_BYTES = int(os.environ.get('INDICATOR_CACHE_MB', '256')) * 1024 * 1024
+DISK_DIR = os.environ.get(
+    'INDICATOR_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'indicators')
+)
+USE_DISK = os.environ.get('INDICATOR_CACHE_DISK', '0') == '1'
+OHLCV = ['open', 'high', 'low', 'close', 'volume']
+
+_entries = OrderedDict()
+# Structure: {(symbol, timeframe, data_hash, indicator, params): np.ndarray, ...}
+_size = 0
+_lock = threading.Lock()
+_stats = {'hits': 0, 'disk_hits': 0, 'misses': 0}
+
+def frame_hash(df):
+    """Digest of a candle frame's (or CandleBuffer's) timestamps and OHLCV values"""
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(df, CandleBuffer):
+        # Same bytes as the frame path, so a buffer and a frame of the same candles share entries
+        digest.update(np.ascontiguousarray(df.timestamp).tobytes())
+        for column in OHLCV:
+            digest.update(column.encode())
+            digest.update(np.ascontiguousarray(df[column]).tobytes())
+        return digest.hexdigest()
+    index = df['timestamp'] if 'timestamp' in df.columns else df.index
+    digest.update(np.ascontiguousarray(pd.to_datetime(index).values.astype('datetime64[ms]').view(np.int64)).tobytes())
+    for column in OHLCV:
+        if column in df.columns:
+            digest.update(column.encode())
+            digest.update(np.ascontiguousarray(df[column].to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()
+
+# --- Storage ---
+
+def _disk_path(key):
+    symbol, timeframe, data_hash, indicator, params = key
+    name = '_'.join([indicator] + [str(p) for p in params] + [data_hash])
+    return os.path.join(DISK_DIR, str(symbol).replace('/', '_'), timeframe, f"{name}.npy")
+
+def _remember(key, values):
+    global _size
+    values.setflags(write=False) # Shared between callers
+    with _lock:
+        if key in _entries:
+            return
+        _entries[key] = values
+        _size += values.nbytes
+        while _size > MAX_BYTES and len(_entries) > 1:
+            _, evicted = _entries.popitem(last=False)
+            _size -= evicted.nbytes
+
+def get(key, compute):
+    """Cached array for key, computing (and storing) it on a miss"""
+    with _lock:
+        values = _entries.get(key)
+        if values is not None:
+            _entries.move_to_end(key)
+            _stats['hits'] += 1
+            return values
+
+    if USE_DISK:
+        try:
+            values = np.load(_disk_path(key))
+            _stats['disk_hits'] += 1
+            _remember(key, values)
+            return values
+        except (OSError, ValueError):
+            pass
+
+    _stats['misses'] += 1
+    values = np.ascontiguousarray(compute())
+    if USE_DISK:
+        path = _disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                np.save(f, values)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Indicator cache write failed for {key[3]}: {e}")
+    _remember(key, values)
+    return values
+
+def stats():
+    with _lock:
+        return dict(_stats, entries=len(_entries), bytes=_size)
+
+def clear():
+    global _size
+    with _lock:
+        _entries.clear()
+        _size = 0
+
+# --- Indicators ---
+# Same formulas as the scanner (scanner.calculate_*). The *_values functions
+# take a frame or a CandleBuffer and return the cached (read-only) arrays;
+# ema/rsi/adx wrap them as Series on the frame's index.
+
+def _column(candles, name):
+    """One candle column as a Series (a zero-copy view for CandleBuffers)"""
+    if isinstance(candles, CandleBuffer):
+        return pd.Series(candles[name], copy=False)
+    return candles[name]
+
+def ema_values(symbol, timeframe, candles, period, data_hash=None):
+    from scanner import calculate_ema
+    key = (symbol, timeframe, data_hash or frame_hash(candles), 'ema', (period,))
+    return get(key, lambda: calculate_ema(_column(candles, 'close'), period).to_numpy(dtype=np.float64))
+
+def rsi_values(symbol, timeframe, candles, period, data_hash=None):
+    from scanner import calculate_rsi
+    key = (symbol, timeframe, data_hash or frame_hash(candles), 'rsi', (period,))
+    return get(key, lambda: calculate_rsi(_column(candles, 'close'), period).to_numpy(dtype=np.float64))
+
+def adx_values(symbol, timeframe, candles, period, data_hash=None):
+    """(adx, plus_di, minus_di) arrays"""
+    from scanner import calculate_adx
+
+    def compute():
+        df = pd.DataFrame({c: _column(candles, c) for c in ('high', 'low', 'close')}, copy=False)
+        return np.column_stack([s.to_numpy(dtype=np.float64) for s in calculate_adx(df, period)])
+
+    values = get((symbol, timeframe, data_hash or frame_hash(candles), 'adx', (period,)), compute)
+    return values[:, 0], values[:, 1], values[:, 2]
+
+def ema(symbol, timeframe, df, period, data_hash=None):
+    return pd.Series(ema_values(symbol, timeframe, df, period, data_hash), index=df.index, name=f'ema{period}')
+
+def rsi(symbol, timeframe, df, period, data_hash=None):
+    return pd.Series(rsi_values(symbol, timeframe, df, period, data_hash), index=df.index, name='rsi')
+
+def adx(symbol, timeframe, df, period, data_hash=None):
+    """(adx, plus_di, minus_di)"""
+    return tuple(pd.Series(values, index=df.index, name=name)
+                 for values, name in zip(adx_values(symbol, timeframe, df, period, data_hash),
+                                         ('adx', 'plus_di', 'minus_di')))
+
+def resample(symbol, timeframe, df, rule, compute, data_hash=None):
+    """
+    Cached OHLCV resample of a timestamp-indexed frame. compute() returns the
+    resampled frame; its index and OHLCV columns are what gets stored.
+    """
+    def pack():
+        out = compute()
+        ms = out.index.values.astype('datetime64[ms]').view(np.int64).astype(np.float64)
+        return np.column_stack([ms, out[OHLCV].to_numpy(dtype=np.float64)])
+
+    values = get((symbol, timeframe, data_hash or frame_hash(df), 'resample', (rule,)), pack)
+    index = pd.DatetimeIndex(values[:, 0].astype(np.int64).astype('datetime64[ms]'), name=df.index.name)
+    index = index.astype(df.index.dtype) # Same resolution as the source, for merge_asof
+    return pd.DataFrame(values[:, 1:].copy(), index=index, columns=OHLCV)
@@ -0,0 +1,145 @@
+import math
+
+# Streaming (O(1) per candle) versions of scanner.calculate_ema / calculate_rsi /
+# calculate_adx. Every recurrence mirrors pandas' ewm(adjust=False) kernel
+# step for step, so values match the pandas output bit for bit when fed the
+# same series from the same starting candle.
+
+NAN = float('nan')
+
+def _div(a, b):
+    """Float division with numpy/pandas semantics (x/0 -> +-inf, 0/0 -> nan)"""
+    if b == 0:
+        if a == 0 or a != a:
+            return NAN
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+class Ewm:
+    """Exponentially weighted mean, equivalent to Series.ewm(..., adjust=False).mean()"""
+    __slots__ = ('alpha', 'value', 'old_wt')
+
+    def __init__(self, span=None, com=None, alpha=None):
+        # Same alpha derivation as pandas (via centre of mass)
+        if span is not None:
+            com = (span - 1) / 2.0
+        elif alpha is not None:
+            com = (1 - alpha) / alpha
+        self.alpha = 1.0 / (1.0 + com)
+        self.value = NAN
+        self.old_wt = 1.0
+
+    def step(self, x):
+        """Returns (value, old_wt) after consuming x, without mutating"""
+        weighted, old_wt = self.value, self.old_wt
+        if weighted == weighted:
+            old_wt *= 1.0 - self.alpha
+            if x == x:
+                if weighted != x:
+                    weighted = (old_wt * weighted + self.alpha * x) / (old_wt + self.alpha)
+                old_wt = 1.0
+        elif x == x:
+            weighted = x
+        return weighted, old_wt
+
+    def push(self, x):
+        self.value, self.old_wt = self.step(x)
+        return self.value
+
+class IndicatorState:
+    """
+    Rolling EMA21/50/100, RSI and ADX(+DI/-DI) for one symbol/timeframe.
+    update() advances the state by one closed candle; peek() evaluates a
+    still-open candle on top of the state without committing it.
+    """
+    __slots__ = ('ema21', 'ema50', 'ema100', 'avg_gain', 'avg_loss',
+                 'atr', 'plus_dm', 'minus_dm', 'adx', 'prev_high', 'prev_low',
+                 'prev_close', 'last_ts', 'count')
+
+    def __init__(self, rsi_period=14, adx_period=14):
+        self.ema21 = Ewm(span=21)
+        self.ema50 = Ewm(span=50)
+        self.ema100 = Ewm(span=100)
+        self.avg_gain = Ewm(com=rsi_period - 1)
+        self.avg_loss = Ewm(com=rsi_period - 1)
+        self.atr = Ewm(alpha=1 / adx_period)
+        self.plus_dm = Ewm(alpha=1 / adx_period)
+        self.minus_dm = Ewm(alpha=1 / adx_period)
+        self.adx = Ewm(alpha=1 / adx_period)
+        self.prev_high = NAN
+        self.prev_low = NAN
+        self.prev_close = NAN
+        self.last_ts = None
+        self.count = 0
+
+    @classmethod
+    def from_frame(cls, df, rsi_period=14, adx_period=14):
+        """Seed a state from every candle of an OHLCV DataFrame"""
+        state = cls(rsi_period, adx_period)
+        for ts, high, low, close in zip(df['timestamp'], df['high'], df['low'], df['close']):
+            state.update(high, low, close, ts)
+        return state
+
+    def _advance(self, high, low, close):
+        """Next (value, old_wt) of every recurrence plus the derived indicator values"""
+        # RSI: delta.clip(lower=0) / -1 * delta.clip(upper=0)
+        delta = close - self.prev_close
+        if delta == delta:
+            gain = max(delta, 0.0)
+            loss = -1 * min(delta, 0.0)
+        else:
+            gain = loss = NAN
+
+        # ADX: directional movement and true range as in calculate_adx
+        up = high - self.prev_high
+        down = low - self.prev_low
+        if up == up and up < 0:
+            up = 0.0
+        if down == down and down > 0:
+            down = 0.0
+        tr = max((v for v in (high - low, abs(high - self.prev_close), abs(low - self.prev_close)) if v == v),
+                 default=NAN)
+
+        steps = {
+            'ema21': self.ema21.step(close),
+            'ema50': self.ema50.step(close),
+            'ema100': self.ema100.step(close),
+            'avg_gain': self.avg_gain.step(gain),
+            'avg_loss': self.avg_loss.step(loss),
+            'atr': self.atr.step(tr),
+            'plus_dm': self.plus_dm.step(up),
+            'minus_dm': self.minus_dm.step(abs(down)),
+        }
+        atr = steps['atr'][0]
+        plus_di = 100 * _div(steps['plus_dm'][0], atr)
+        minus_di = 100 * _div(steps['minus_dm'][0], atr)
+        dx = _div(abs(plus_di - minus_di), abs(plus_di + minus_di)) * 100
+        steps['adx'] = self.adx.step(dx)
+
+        rs = _div(steps['avg_gain'][0], steps['avg_loss'][0])
+        values = {
+            'close': close,
+            'ema21': steps['ema21'][0],
+            'ema50': steps['ema50'][0],
+            'ema100': steps['ema100'][0],
+            'rsi': 100 - _div(100, 1 + rs),
+            'adx': steps['adx'][0],
+            'plus_di': plus_di,
+            'minus_di': minus_di,
+        }
+        return steps, values
+
+    def update(self, high, low, close, ts=None):
+        """Commit one closed candle and return the indicator values at it"""
+        steps, values = self._advance(float(high), float(low), float(close))
+        for name, (value, old_wt) in steps.items():
+            ewm = getattr(self, name)
+            ewm.value, ewm.old_wt = value, old_wt
+        self.prev_high, self.prev_low, self.prev_close = float(high), float(low), float(close)
+        self.last_ts = ts
+        self.count += 1
+        return values
+
+    def peek(self, high, low, close):
+        """Indicator values if the next candle were (high, low, close); state is unchanged"""
+        return self._advance(float(high), float(low), float(close))[1]
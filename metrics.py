@@ -0,0 +1,197 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process scan instrumentation: per-stage latency histograms, fail-fast
+# and error counters, rendered as Prometheus text for GET /metrics. Each
+# worker process keeps its own registry (scrape every worker, or sum them).
+# With SCAN_TRACE=1 every scan also records a per-symbol timeline, written
+# as JSON to data/traces and served as the latest trace at /api/scan/trace.
+
+# --- Configuration ---
+TRACE_SCANS = os.environ.get('SCAN_TRACE', '0') == '1'
+TRACE_DIR = os.environ.get(
+    'TRACE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'traces')
+)
+TRACE_KEEP = 50  # Trace files kept on disk (oldest removed first)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+METRICS = {
+    'scanner_stage_seconds': ('histogram', 'Time spent per scan stage (ratelimit_wait, fetch, prefetch, indicators, filter, scan, shard)'),
+    'scanner_symbols_total': ('counter', 'Symbols leaving the pipeline, by stage and outcome'),
+    'scanner_request_errors_total': ('counter', 'Failed exchange requests (each attempt), by kind'),
+    'scanner_scans_total': ('counter', 'Completed scans, by evaluation mode'),
+    'scanner_layer_cache_total': ('counter', 'Per-symbol timeframe layers served from symbol_cache (hit) or computed (miss)'),
+}
+
+_lock = threading.Lock()
+_counters = {}  # (name, labels): value
+_histograms = {}  # (name, labels): [bucket counts..., sum, count]
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+def inc(name, amount=1, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+def observe(name, value, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                h[i] += 1
+        h[-2] += value
+        h[-1] += 1
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+# --- Scan Helpers ---
+
+def record(stage, seconds, exchange, timeframe=None):
+    """One stage timing: into the histogram and the current scan's trace"""
+    observe('scanner_stage_seconds', seconds, exchange=exchange, stage=stage, timeframe=timeframe)
+    trace_event(stage, seconds=round(seconds, 6), timeframe=timeframe)
+
+@contextmanager
+def timer(stage, exchange, timeframe=None):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started, exchange, timeframe)
+
+def count_symbol(exchange, stage, outcome, amount=1):
+    """outcome: no_data / rejected / filtered / passed / failed"""
+    inc('scanner_symbols_total', amount, exchange=exchange, stage=stage, outcome=outcome)
+    if amount:
+        trace_event('outcome', stage=stage, outcome=outcome, count=amount if amount != 1 else None)
+
+def error_kind(error):
+    ccxt = sys.modules.get('ccxt') # Not loaded means not a ccxt error (and keeps NSE-only processes without it)
+    if ccxt is not None:
+        if isinstance(error, ccxt.RequestTimeout):
+            return 'timeout'
+        if isinstance(error, ccxt.DDoSProtection):
+            return 'rate_limited'
+    return 'timeout' if isinstance(error, TimeoutError) else 'error'
+
+# --- Prometheus Text ---
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+def render():
+    """All metrics in the Prometheus text exposition format (0.0.4)"""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == 'counter':
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        else:
+            for (n, labels), h in sorted(histograms.items()):
+                if n != name:
+                    continue
+                for bound, count in zip(BUCKETS, h):
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {h[-1]}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {h[-2]:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {h[-1]}")
+    return '\n'.join(lines) + '\n'
+
+def summary(exchange=None):
+    """Per-stage totals as printable lines (scanner.main)"""
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+    lines = []
+    for (name, labels), h in sorted(histograms.items()):
+        labels = dict(labels)
+        if name != 'scanner_stage_seconds' or (exchange and labels.get('exchange') != exchange):
+            continue
+        stage = labels['stage'] + (f" {labels['timeframe']}" if 'timeframe' in labels else '')
+        lines.append(f"{stage:<20} {h[-1]:>6} calls {h[-2]:>9.3f}s total {h[-2] / h[-1] * 1000:>9.2f}ms avg")
+    return lines
+
+# --- Per-Scan Traces ---
+# The trace and the symbol being evaluated live in context variables, so
+# every task a scan spawns (gather, ensure_future) records into its own scan.
+
+_trace = contextvars.ContextVar('scan_trace', default=None)
+_symbol = contextvars.ContextVar('scan_symbol', default=None)
+_last_trace = None
+
+def start_trace(exchange, symbols, enabled=None):
+    """Begin a trace for the current task if enabled (default: SCAN_TRACE); returns a token for end_trace"""
+    if not (TRACE_SCANS if enabled is None else enabled):
+        return None
+    trace = {
+        'exchange': exchange,
+        'started': time.time(),
+        '_t0': time.perf_counter(),
+        'symbols': {s: [] for s in symbols},
+        'scan': [],
+    }
+    return _trace.set(trace)
+
+def bind_symbol(symbol):
+    """Attribute the current task's (and its children's) events to symbol"""
+    _symbol.set(symbol)
+
+def trace_event(event, **data):
+    trace = _trace.get()
+    if trace is None:
+        return
+    item = {'event': event, 'at': round(time.perf_counter() - trace['_t0'], 6)}
+    item.update((k, v) for k, v in data.items() if v is not None)
+    symbol = _symbol.get()
+    if symbol is None:
+        trace['scan'].append(item)
+    else:
+        trace['symbols'].setdefault(symbol, []).append(item)
+
+def end_trace(token):
+    """Finish the current trace, write it to TRACE_DIR and keep it as the latest one"""
+    global _last_trace
+    if token is None:
+        return None
+    trace = _trace.get()
+    _trace.reset(token)
+    trace['duration'] = round(time.perf_counter() - trace.pop('_t0'), 6)
+    _last_trace = trace
+    try:
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.gmtime(trace['started']))
+        path = os.path.join(TRACE_DIR, f"{trace['exchange']}-{stamp}-{os.getpid()}.json")
+        with open(path, 'w') as f:
+            json.dump(trace, f, default=float)
+        old = sorted(os.listdir(TRACE_DIR), key=lambda n: os.path.getmtime(os.path.join(TRACE_DIR, n)))
+        for name in old[:-TRACE_KEEP]:
+            os.remove(os.path.join(TRACE_DIR, name))
+    except OSError as e:
+        print(f"Trace write error: {e}")
+    return trace
+
+def last_trace():
+    return _last_trace
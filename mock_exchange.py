@@ -0,0 +1,238 @@
+import asyncio
+import time
+import zlib
+import numpy as np
+
+# Deterministic offline stand-in for a ccxt / ccxt.pro async exchange client.
+# Candles are a seeded random walk per symbol on a 15m grid (or recorded
+# candles replayed from backfill.py's store); 1h/4h candles are aggregated
+# from it exactly like an exchange would. A simulated clock decides which
+# 15m candle is currently open, and watch_ohlcv() resolves every time the
+# clock moves, so streaming code can be exercised without a network.
+# Optional per-request latency and a server-side request budget (answered
+# with ccxt.RateLimitExceeded, like a 429) make it usable for benchmarks.
+
+BASE_MS = 15 * 60 * 1000
+TIMEFRAME_MS = {'15m': BASE_MS, '1h': 4 * BASE_MS, '4h': 16 * BASE_MS}
+
+class MockExchange:
+    def __init__(self, symbols, history=2000, future=4000, start_ms=None, tick_seconds=1.0, seed=0, exchange_id='mock',
+                 latency=0.0, jitter=0.0, rate_limit=None, series=None, origin_ms=None):
+        """
+        latency: seconds added to every REST request, +/- jitter (a fraction).
+        rate_limit: (requests, seconds) the simulated server accepts.
+        series: recorded candles {symbol: (n, 5) open/high/low/close/volume}
+        on one 15m grid starting at origin_ms (a 4h boundary); the clock
+        starts at bar `history` and advance() replays the rest.
+        """
+        self.id = exchange_id
+        self.symbols = list(symbols)
+        self.has = {'fetchOHLCV': True, 'fetchTickers': True, 'watchOHLCV': True}
+        self.markets = {}
+        self.tick_seconds = tick_seconds
+        self.seed = seed
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self.rejected = 0
+        self._rng = np.random.default_rng(seed)
+        self._budget = None
+        if rate_limit:
+            capacity, period = rate_limit
+            self._budget = {'capacity': capacity, 'rate': capacity / period, 'tokens': capacity,
+                            'updated': time.monotonic()}
+
+        if series is not None:
+            self._series = {s: np.asarray(series[s], dtype=np.float64) for s in self.symbols}
+            self.capacity = min(len(a) for a in self._series.values())
+            self.origin_ms = origin_ms
+            self.bar = min(history, self.capacity - 1)
+        else:
+            self._series = {}
+            if start_ms is None:
+                start_ms = int(time.time() * 1000)
+            # Origin on a 4h boundary so every higher-timeframe bucket is whole
+            self.origin_ms = (start_ms - history * BASE_MS) // TIMEFRAME_MS['4h'] * TIMEFRAME_MS['4h']
+            self.bar = (start_ms - self.origin_ms) // BASE_MS  # Index of the open 15m candle
+            self.capacity = self.bar + 1 + future  # history plus up to 15 bars of 4h alignment
+
+        self._tick = None
+        self._clock_task = None
+        self._version = 0
+        self._seen = {}
+
+    # --- Synthetic Data ---
+
+    def _ohlcv(self, symbol):
+        series = self._series.get(symbol)
+        if series is None:
+            rng = np.random.default_rng(zlib.crc32(symbol.encode()) + self.seed)
+            n = self.capacity
+            # Trending regimes so the EMA stacks actually line up now and then
+            drift = np.repeat(rng.normal(0, 0.002, n // 200 + 1), 200)[:n]
+            returns = drift + rng.normal(0, 0.004, n)
+            close = 10 ** rng.uniform(-1, 4) * np.exp(np.cumsum(returns))
+            open_ = np.concatenate(([close[0]], close[:-1]))
+            spread = np.abs(rng.normal(0, 0.002, n)) * close
+            high = np.maximum(open_, close) + spread
+            low = np.minimum(open_, close) - spread
+            volume = rng.lognormal(10, 1, n)
+            series = np.column_stack([open_, high, low, close, volume])
+            self._series[symbol] = series
+        return series
+
+    def _candle(self, symbol, timeframe, bucket):
+        per = TIMEFRAME_MS[timeframe] // BASE_MS
+        first = bucket * per
+        last = min(first + per, self.bar + 1)
+        rows = self._ohlcv(symbol)[first:last]
+        return [
+            self.origin_ms + first * BASE_MS,
+            float(rows[0, 0]), float(rows[:, 1].max()), float(rows[:, 2].min()),
+            float(rows[-1, 3]), float(rows[:, 4].sum())
+        ]
+
+    def _check_symbol(self, symbol):
+        if symbol not in self.symbols:
+            raise ValueError(f"{self.id} does not have market symbol {symbol}")
+
+    def history(self, symbol):
+        """Every 15m candle up to the open one, as a timestamp-indexed frame (backtests)"""
+        import pandas as pd
+        rows = self._ohlcv(symbol)[:self.bar + 1]
+        index = pd.to_datetime(self.origin_ms + np.arange(len(rows), dtype=np.int64) * BASE_MS, unit='ms')
+        return pd.DataFrame(rows, index=index.rename('timestamp'), columns=['open', 'high', 'low', 'close', 'volume'])
+
+    @classmethod
+    def from_history(cls, source, symbols, start=None, end=None, **kwargs):
+        """
+        Replay candles stored by backfill.py for exchange `source`. Symbols are trimmed to their
+        common range (starting on a 4h boundary); gaps are filled with flat
+        zero-volume candles at the previous close.
+        """
+        import pandas as pd
+        import backfill
+        frames = {}
+        for symbol in symbols:
+            df = backfill.load_frame(source, symbol, '15m', start, end)
+            if df is None:
+                raise ValueError(f"No stored 15m history for {symbol} (run backfill.py)")
+            frames[symbol] = df
+        first = max(df.index[0] for df in frames.values()).ceil('4h')
+        last = min(df.index[-1] for df in frames.values())
+        grid = pd.date_range(first, last, freq='15min')
+        if len(grid) == 0:
+            raise ValueError("Stored histories do not overlap")
+
+        series = {}
+        for symbol, df in frames.items():
+            df = df.reindex(grid)
+            close = df['close'].ffill().bfill()
+            for column in ('open', 'high', 'low'):
+                df[column] = df[column].fillna(close)
+            df['close'] = close
+            df['volume'] = df['volume'].fillna(0.0)
+            series[symbol] = df[['open', 'high', 'low', 'close', 'volume']].to_numpy()
+
+        kwargs.setdefault('history', len(grid) - 1)
+        kwargs.setdefault('exchange_id', source)
+        return cls(symbols, series=series, origin_ms=int(first.timestamp() * 1000), **kwargs)
+
+    # --- REST Surface ---
+    # Every request passes throttle() first (a no-op unless ratelimit.attach
+    # replaced it), then the simulated server's budget and latency.
+
+    async def throttle(self, cost=None):
+        pass
+
+    def handle_errors(self, code, reason, url, method, headers, body, *args, **kwargs):
+        pass
+
+    async def _request(self):
+        await self.throttle()
+        self.requests += 1
+        budget = self._budget
+        if budget is not None:
+            now = time.monotonic()
+            budget['tokens'] = min(budget['capacity'], budget['tokens'] + (now - budget['updated']) * budget['rate'])
+            budget['updated'] = now
+            if budget['tokens'] < 1:
+                import ccxt
+                self.rejected += 1
+                self.handle_errors(429, 'Too Many Requests', '', 'GET', {}, '')
+                raise ccxt.RateLimitExceeded(f"{self.id} 429 Too Many Requests")
+            budget['tokens'] -= 1
+        if self.latency:
+            await asyncio.sleep(max(self.latency * (1 + self.jitter * self._rng.uniform(-1, 1)), 0))
+
+    async def load_markets(self, reload=False):
+        await self._request()
+        self.markets = {
+            s: {'id': s.replace('/', ''), 'symbol': s, 'base': s.split('/')[0], 'quote': 'USDT', 'active': True}
+            for s in self.symbols
+        }
+        return self.markets
+
+    async def fetch_ohlcv(self, symbol, timeframe='15m', since=None, limit=None, params=None):
+        self._check_symbol(symbol)
+        await self._request()
+        per = TIMEFRAME_MS[timeframe] // BASE_MS
+        current = self.bar // per
+        limit = limit or 500
+        if since is None:
+            start = max(current - limit + 1, 0)
+        else:
+            start = max(-(-(since - self.origin_ms) // TIMEFRAME_MS[timeframe]), 0)
+        end = min(start + limit, current + 1)
+        return [self._candle(symbol, timeframe, b) for b in range(start, end)]
+
+    async def fetch_tickers(self, symbols=None, params=None):
+        await self._request()
+        tickers = {}
+        for s in symbols or self.symbols:
+            rows = self._ohlcv(s)[max(self.bar - 95, 0):self.bar + 1]
+            last = float(rows[-1, 3])
+            tickers[s] = {
+                'symbol': s,
+                'last': last,
+                'close': last,
+                'baseVolume': float(rows[:, 4].sum()),
+                'quoteVolume': float((rows[:, 4] * rows[:, 3]).sum()),
+            }
+        return tickers
+
+    async def close(self):
+        if self._clock_task:
+            self._clock_task.cancel()
+            self._clock_task = None
+
+    # --- Streaming Surface ---
+
+    def advance(self, bars=1):
+        """Move the simulated clock forward; the open 15m candle closes"""
+        self.bar = min(self.bar + bars, self.capacity - 1)
+        self._version += 1
+        if self._tick is not None:
+            self._tick.set()
+            self._tick = asyncio.Event()
+
+    async def _run_clock(self):
+        while self.bar < self.capacity - 1:
+            await asyncio.sleep(self.tick_seconds)
+            self.advance()
+
+    async def watch_ohlcv(self, symbol, timeframe='15m', since=None, limit=None, params=None):
+        """Resolves with the latest candles whenever the clock has moved since the last call"""
+        self._check_symbol(symbol)
+        if self._tick is None:
+            self._tick = asyncio.Event()
+        if self._clock_task is None and self.tick_seconds:
+            self._clock_task = asyncio.ensure_future(self._run_clock())
+
+        key = (symbol, timeframe)
+        if self._seen.get(key) == self._version:
+            await self._tick.wait()
+        self._seen[key] = self._version
+        per = TIMEFRAME_MS[timeframe] // BASE_MS
+        current = self.bar // per
+        return [self._candle(symbol, timeframe, b) for b in range(max(current - 1, 0), current + 1)]
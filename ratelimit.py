@@ -0,0 +1,248 @@
+import asyncio
+import os
+import threading
+import time
+import metrics
+
+# Token-bucket request limiter per exchange, expressed in each exchange's own
+# request-weight units. Buckets refill continuously up to the exchange's
+# published budget, are corrected from the usage headers the exchange sends
+# back, and back off on 429/418 responses. ccxt clients are attached with
+# attach(), which routes ccxt's own throttle() through the bucket.
+#
+# Buckets live in one process, but the venues count per IP. Every process
+# behind one egress IP (gunicorn workers, the scheduler, local shard
+# workers) therefore gets a PROCESSES-th of the budget, and reads the usage
+# headers as the whole IP's count, of which it takes the same share.
+
+# --- Configuration ---
+SAFETY_MARGIN = 0.9  # Fraction of the published budget we allow ourselves
+# Processes sharing one IP's budget (gunicorn's worker count by default)
+PROCESSES = max(1, int(os.environ.get('RATE_LIMIT_PROCESSES', os.environ.get('WEB_CONCURRENCY', '1'))))
+BACKOFF_BASE = 1.0  # Seconds; doubled for every consecutive 429
+BACKOFF_MAX = 120.0
+BAN_BACKOFF = 60.0  # Minimum pause after a 418 (IP ban) without Retry-After
+MIN_RATE_SCALE = 0.1  # Refill rate never drops below this fraction after 429s
+RECOVERY_STEP = 0.02  # Refill rate regained per clean response
+MAX_RETRIES = 3  # Rate-limited/network-failed requests retried before giving up
+
+# weight: 'ccxt' uses ccxt's per-endpoint cost (Binance costs are the exchange's
+# own request weights, e.g. klines by limit); 'request' counts every call as 1.
+# used_header/remaining_header sync the bucket with the exchange's own counter.
+RATE_LIMITS = {
+    'binance': {
+        'capacity': 2400, 'period': 60,  # USDⓈ-M futures: 2400 weight / minute / IP
+        'weight': 'ccxt',
+        'used_header': 'x-mbx-used-weight-1m',
+    },
+    'bybit': {
+        'capacity': 600, 'period': 5,  # 600 requests / 5s / IP
+        'weight': 'request',
+        'remaining_header': 'x-bapi-limit-status',
+    },
+    'mexc': {
+        'capacity': 20, 'period': 2,  # Contract market data: 20 requests / 2s
+        'weight': 'request',
+    },
+    'nse': {
+        'capacity': 20, 'period': 2,  # Yahoo publishes no limit; stays under its burst throttling
+        'weight': 'request',
+    },
+}
+DEFAULT_LIMIT = {'capacity': 10, 'period': 1, 'weight': 'request'}
+
+class RateLimiter:
+    """Token bucket for one exchange; safe to share between event loops"""
+
+    def __init__(self, exchange_id, capacity, period, weight='request', used_header=None, remaining_header=None,
+                 processes=1):
+        self.exchange_id = exchange_id
+        self.processes = processes
+        self.ip_capacity = capacity * SAFETY_MARGIN  # What every process on the IP may use together
+        self.capacity = self.ip_capacity / processes
+        self.rate = self.capacity / period  # Tokens per second at full speed
+        self.weight = weight
+        self.used_header = used_header
+        self.remaining_header = remaining_header
+        self.tokens = self.capacity
+        self.rate_scale = 1.0
+        self.blocked_until = 0.0
+        self.strikes = 0
+        self.updated = time.monotonic()
+        self.waiting = 0
+        self.requests = 0
+        self.throttled = 0
+        self.last_used = None
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate * self.rate_scale)
+        self.updated = now
+
+    def request_weight(self, cost=None):
+        if self.weight == 'ccxt' and cost:
+            return min(float(cost), self.capacity)
+        return 1.0
+
+    def _try_take(self, weight):
+        """Take weight tokens now, or return the seconds to wait before retrying"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.tokens >= weight:
+                self.tokens -= weight
+                self.requests += 1
+                return 0
+            return (weight - self.tokens) / (self.rate * self.rate_scale)
+
+    async def acquire(self, weight=1.0):
+        wait = self._try_take(weight)
+        if not wait:
+            return
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            while wait:
+                await asyncio.sleep(wait)
+                wait = self._try_take(weight)
+        finally:
+            self.waiting -= 1
+            metrics.record('ratelimit_wait', time.perf_counter() - started, self.exchange_id)
+
+    # --- Feedback From Responses ---
+
+    def observe(self, status, headers):
+        """Adjust the bucket from one HTTP response (status code and headers)"""
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        with self._lock:
+            self._refill(time.monotonic())
+            if status in (429, 418):
+                self._penalize(status, headers.get('retry-after'))
+                return
+
+            self.strikes = 0
+            self.rate_scale = min(1.0, self.rate_scale + RECOVERY_STEP)
+            if self.used_header and self.used_header in headers:
+                self.last_used = _number(headers[self.used_header])
+                if self.last_used is not None:
+                    self.tokens = min(self.tokens, (self.ip_capacity - self.last_used) / self.processes)
+            if self.remaining_header and self.remaining_header in headers:
+                remaining = _number(headers[self.remaining_header])
+                if remaining is not None:
+                    self.tokens = min(self.tokens, remaining * SAFETY_MARGIN / self.processes)
+
+    def penalize(self, status=429, retry_after=None):
+        with self._lock:
+            self._refill(time.monotonic())
+            self._penalize(status, retry_after)
+
+    def _penalize(self, status, retry_after):
+        now = time.monotonic()
+        self.throttled += 1
+        self.tokens = 0
+        pause = _number(retry_after)
+        if now < self.blocked_until:
+            # Requests already in flight when the first 429 came back: one slowdown per burst
+            if pause is not None:
+                self.blocked_until = max(self.blocked_until, now + pause)
+            return
+
+        self.strikes += 1
+        self.rate_scale = max(MIN_RATE_SCALE, self.rate_scale / 2)
+        if pause is None:
+            pause = min(BACKOFF_BASE * 2 ** (self.strikes - 1), BACKOFF_MAX)
+            if status == 418:
+                pause = max(pause, BAN_BACKOFF)
+        self.blocked_until = now + pause
+        print(f"Rate limit hit on {self.exchange_id} (HTTP {status}), pausing {pause:.1f}s, "
+              f"rate at {self.rate_scale:.0%}")
+
+    def state(self):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                'exchange': self.exchange_id,
+                'tokens': round(self.tokens, 2),
+                'capacity': round(self.capacity, 2),
+                'processes': self.processes,
+                'rate_per_second': round(self.rate * self.rate_scale, 2),
+                'rate_scale': round(self.rate_scale, 3),
+                'blocked_for': round(max(self.blocked_until - now, 0), 2),
+                'waiting': self.waiting,
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'last_used_weight': self.last_used,
+            }
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+# --- Registry ---
+
+_limiters = {}
+_registry_lock = threading.Lock()
+
+def get_limiter(exchange_id):
+    with _registry_lock:
+        limiter = _limiters.get(exchange_id)
+        if limiter is None:
+            limiter = RateLimiter(exchange_id, **RATE_LIMITS.get(exchange_id, DEFAULT_LIMIT), processes=PROCESSES)
+            _limiters[exchange_id] = limiter
+    return limiter
+
+def snapshot():
+    """Current state of every limiter in this process"""
+    return {exchange_id: limiter.state() for exchange_id, limiter in list(_limiters.items())}
+
+def attach(client, exchange_id=None):
+    """
+    Route a ccxt async client's throttling through the exchange's bucket and
+    feed every response's status and headers back into it.
+    """
+    limiter = get_limiter(exchange_id or client.id)
+    handle_errors = client.handle_errors
+
+    async def throttle(cost=None):
+        await limiter.acquire(limiter.request_weight(cost))
+
+    def observed_handle_errors(code, reason, url, method, headers, body, *args, **kwargs):
+        limiter.observe(code, headers)
+        return handle_errors(code, reason, url, method, headers, body, *args, **kwargs)
+
+    client.enableRateLimit = True
+    client.throttle = throttle
+    client.handle_errors = observed_handle_errors
+    return client
+
+def is_retryable(error):
+    """Rate-limit and transient network errors are worth another attempt"""
+    import ccxt
+    return isinstance(error, ccxt.NetworkError)
+
+async def call(exchange_id, func, *args, **kwargs):
+    """
+    await func(*args, **kwargs), retrying rate-limited and network failures
+    after the bucket's backoff. The final failure is raised, not swallowed.
+    """
+    import ccxt
+    limiter = get_limiter(exchange_id)
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            metrics.inc('scanner_request_errors_total', exchange=exchange_id, kind=metrics.error_kind(e))
+            if not is_retryable(e) or attempt == MAX_RETRIES:
+                raise
+            if isinstance(e, ccxt.DDoSProtection):
+                # Covers 429s that surfaced without headers (e.g. exchange error codes)
+                if time.monotonic() >= limiter.blocked_until:
+                    limiter.penalize()
+                await limiter.acquire(0) # Sit out the backoff even if func bypasses the bucket
+            else:
+                await asyncio.sleep(BACKOFF_BASE * 2 ** attempt)
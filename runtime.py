@@ -0,0 +1,35 @@
+import asyncio
+import os
+import sys
+import threading
+
+# One long-lived event loop per process, running on a daemon thread.
+# Sync code (Flask views, the in-process scheduler) submits coroutines to it,
+# so pooled exchange clients and their HTTP sessions outlive a single request.
+
+_loop = None
+_thread = None
+_pid = None
+_lock = threading.Lock()
+
+def get_loop():
+    """The process-wide loop, (re)started lazily so forked workers get their own"""
+    global _loop, _thread, _pid
+    with _lock:
+        if _loop is None or _pid != os.getpid() or not _thread.is_alive():
+            # Fix for Windows AsyncIO Loop
+            if sys.platform == 'win32':
+                asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, daemon=True, name='scanner-loop')
+            _thread.start()
+            _pid = os.getpid()
+    return _loop
+
+def submit(coro):
+    """Schedule a coroutine on the shared loop; returns a concurrent.futures.Future"""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+def run(coro, timeout=None):
+    """Run a coroutine on the shared loop and block until it finishes"""
+    return submit(coro).result(timeout)
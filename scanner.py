@@ -1,11 +1,20 @@
-import ccxt.async_support as ccxt
 import pandas as pd
 import numpy as np
 import time
 import sys
 from datetime import datetime, timedelta
 import asyncio
-import yfinance as yf
+import os
+import candle_buffer
+import candle_store
+import batch_eval
+import exchange_pool
+import ratelimit
+import indicator_cache
+import metrics
+import shards
+import symbol_cache
+import volume_index
 
 # --- Configuration ---
 TOP_N_COINS = 75  # Scan top volume coins
@@ -13,6 +22,22 @@ TIMEFRAMES = {'4h': '4h', '1h': '1h', '15m': '15m'}
 EMA_PERIODS = [21, 50, 100]
 RSI_PERIOD = 14
 ADX_PERIOD = 14
+OHLCV_LIMIT = 150  # Candles per timeframe handed to the condition checks
+TAIL_MARGIN = 2  # Extra candles asked for on a tail fetch, in case the venue's clock is ahead of ours
+TIMEFRAME_MS = {'15m': 15 * 60 * 1000, '1h': 60 * 60 * 1000, '4h': 4 * 60 * 60 * 1000}
+# 15m candles of a single-fetch pull: enough for max(EMA_PERIODS) + 1 4H bars,
+# so the 4H EMA100 is warmed up even after a partial leading bucket is dropped
+SINGLE_FETCH_BARS = (max(EMA_PERIODS) + 1) * (TIMEFRAME_MS['4h'] // TIMEFRAME_MS['15m'])
+
+# Batch mode: fetch stage by stage for all symbols, then evaluate each stage
+# as one vectorised pass (see batch_eval) instead of per-symbol DataFrames
+BATCH_EVALUATION = os.environ.get('BATCH_EVAL', '0') == '1'
+
+# Persistent candle store: only the tail newer than the last stored candle is fetched
+USE_CANDLE_STORE = os.environ.get('CANDLE_STORE', '1') != '0'
+
+# Venues of a multi-exchange scan (scan_exchanges_async), in tie-break order
+MULTI_EXCHANGES = [e for e in os.environ.get('SCAN_EXCHANGES', 'binance,bybit,mexc,nse').split(',') if e]
 
 NIFTY_TOTAL = [
     # NIFTY 50
@@ -48,78 +73,66 @@ NIFTY_TOTAL = [
 ]
 
 # --- Exchange Configuration ---
+# fetch_strategy controls how the 4H/1H/15m candles of one symbol are requested:
+#   'sequential'  - 4H, then 1H, then 15m, stopping at the first failed stage (fewest requests)
+#   'speculative' - all three in flight at once; 1H/15m are cancelled if an earlier stage fails
+#   'concurrent'  - all three in flight at once and always awaited (one RTT, most requests)
+# single_fetch pulls SINGLE_FETCH_BARS 15m candles and builds 1H/4H locally,
+# paging in equal requests of at most max_ohlcv_limit candles. It saves
+# requests, not always weight: on Binance a cold pull is two ~809-candle pages
+# (weight 5 + 5 = 10) where the three 150-candle fetches cost 3 x 2 = 6, while
+# a warm rescan is one tail request (weight 1) instead of three. The 4H
+# history is also shorter (~101 bars instead of 150)
+# scan_cap is the most symbols one process scans per request; a longer list is
+# truncated unless shard workers are configured (see shards), which take
+# shards of that size each
 EXCHANGE_CONFIG = {
     'binance': {
         'type': 'future',
-        'options': {'defaultType': 'future'}
+        'options': {'defaultType': 'future'},
+        'fetch_strategy': 'speculative',
+        'single_fetch': False,
+        'max_ohlcv_limit': 1500,
+        'scan_cap': 100
     },
     'bybit': {
         'type': 'linear',
-        'options': {'defaultType': 'linear'} 
+        'options': {'defaultType': 'linear'},
+        'fetch_strategy': 'speculative',
+        'single_fetch': False,
+        'max_ohlcv_limit': 1000
     },
     'mexc': {
         'type': 'swap',
-        'options': {'defaultType': 'swap'} 
+        'options': {'defaultType': 'swap'},
+        'fetch_strategy': 'sequential', # Tight rate limits
+        'single_fetch': False,
+        'max_ohlcv_limit': 1000,
+        'scan_cap': 75
     },
     'nse': {
         'type': 'stock',
-        'options': {}
+        'options': {},
+        'fetch_strategy': 'sequential', # Yahoo throttles bursts
+        'batch_download': True # One bulk yf.download per interval for the whole scan
     }
 }
 
-def get_exchange_client_sync(exchange_id):
-    """Factory for sync clients"""
-    import ccxt
-    
-    if exchange_id not in EXCHANGE_CONFIG:
-        raise ValueError(f"Unsupported exchange: {exchange_id}")
-        
-    config = EXCHANGE_CONFIG[exchange_id]
-    
-    # Stocks don't use CCXT
-    if exchange_id == 'nse':
-        return None
-
-    exchange_class = getattr(ccxt, exchange_id)
-    
-    return exchange_class({
-        'enableRateLimit': True,
-        'options': config['options']
-    })
-
 def fetch_top_volume_pairs_sync(exchange_id='binance', limit=TOP_N_COINS):
-    """Fetches top pairs for specific exchange"""
+    """Fetches top pairs for specific exchange (blocking; servers use volume_index)"""
     if exchange_id == 'nse':
         return NIFTY_TOTAL[:limit]
 
     print(f"DEBUG: Starting fetch_top_volume_pairs_sync for {exchange_id}") # DEBUG
     try:
-        client = get_exchange_client_sync(exchange_id)
-        
-        print(f"DEBUG: Loading markets for {exchange_id}...") # DEBUG
-        # Critical for MEXC: specific markets must be loaded first
-        client.load_markets() 
+        # Pooled client; markets are loaded once (critical for MEXC) and cached on disk
+        client = exchange_pool.get_sync_client(exchange_id)
         print(f"DEBUG: Markets loaded. Fetching tickers...") # DEBUG
         
         tickers = client.fetch_tickers()
         print(f"DEBUG: Tickers fetched. Count: {len(tickers) if tickers else 'None'}") # DEBUG
         
-        # Filtering logic needs to be robust across exchanges
-        # Binance/Bybit/MEXC Futures usually have /USDT
-        
-        quote_currency = 'USDT'
-            
-        pairs = []
-        for symbol, ticker in tickers.items():
-            # Robust check: allow 'BTC/USDT' or 'BTCUSDT'
-            is_valid_symbol = (f'/{quote_currency}' in symbol or symbol.endswith(quote_currency))
-            
-            if is_valid_symbol and ticker.get('quoteVolume'):
-                pairs.append({'symbol': symbol, 'volume': ticker['quoteVolume']})
-                
-        # Sort by volume
-        sorted_pairs = sorted(pairs, key=lambda x: x['volume'], reverse=True)
-        return [p['symbol'] for p in sorted_pairs[:limit]]
+        return volume_index.rank_tickers(tickers)[:limit]
         
     except Exception as e:
         print(f"Error fetching top pairs for {exchange_id}: {e}")
@@ -164,154 +177,504 @@ def calculate_adx(df, period=14):
     adx = dx.ewm(alpha=1/period, adjust=False).mean()
     return adx, plus_di, minus_di
 
+# yfinance interval behind each scanner timeframe (4H is resampled from 1H),
+# and the history window downloaded per interval
+STOCK_SOURCE = {'4h': '1h', '1h': '1h', '15m': '15m'}
+STOCK_HISTORY = {'1h': ('1mo', 30), '15m': ('1wk', 7)}  # interval: (period, period_days)
+
+def normalise_stock_history(df):
+    """yfinance frame -> the scanner's column layout (None if empty)"""
+    if df is None or df.empty:
+        return None
+        
+    # Clean headers (lowercase)
+    df = df.reset_index()
+    df.columns = df.columns.str.lower()
+    
+    # Ensure UTC timezone naive for consistency or just drop Timezone
+    if 'date' in df.columns:
+        df.rename(columns={'date': 'timestamp'}, inplace=True)
+    elif 'datetime' in df.columns:
+         df.rename(columns={'datetime': 'timestamp'}, inplace=True)
+         
+    # Remove timezone if present
+    if pd.api.types.is_datetime64_any_dtype(df['timestamp']):
+        df['timestamp'] = df['timestamp'].dt.tz_localize(None)
+        
+    return df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
+
+def download_stock_history(symbol, interval, **kwargs):
+    """Downloads yfinance history and normalises it to the scanner's column layout"""
+    import yfinance as yf  # Only NSE needs it: loaded on first use (or by warm_up)
+    ticker = yf.Ticker(symbol)
+    return normalise_stock_history(ticker.history(interval=interval, **kwargs))
+
+def download_stock_batch(symbols, interval, **kwargs):
+    """
+    One yf.download for many tickers (one shared session, yfinance's own
+    thread pool); returns {symbol: frame} for the tickers that had data.
+    """
+    import yfinance as yf
+    data = yf.download(list(symbols), interval=interval, group_by='ticker', auto_adjust=True,
+                       threads=True, progress=False, **kwargs)
+    frames = {}
+    if data is None or data.empty:
+        return frames
+    for symbol in symbols:
+        if isinstance(data.columns, pd.MultiIndex):
+            if symbol not in data.columns.get_level_values(0):
+                continue
+            df = data[symbol]
+        else:
+            df = data
+        # Rows are the union of every ticker's timestamps: drop the ones this ticker lacks
+        df = normalise_stock_history(df.dropna(how='all'))
+        if df is not None:
+            frames[symbol] = df
+    return frames
+
+def _stock_store_is_stale(last_ts, period_days):
+    return last_ts is None or (time.time() * 1000 - last_ts) > period_days * 86400 * 1000
+
+def _load_stock_window(symbol, interval, period_days):
+    _, last_ts = candle_store.stats('nse', symbol, interval)
+    if last_ts is None:
+        return None
+    since = last_ts - period_days * 86400 * 1000
+    return candle_store.rows_to_frame(candle_store.load_candles('nse', symbol, interval, since=since))
+
+def fetch_stock_history_incremental(symbol, interval, period, period_days):
+    """
+    Serve stock history from the candle store, downloading only the days
+    from the last stored candle onwards (that day is re-fetched in full so
+    the still-open bar gets replaced).
+    """
+    _, last_ts = candle_store.stats('nse', symbol, interval)
+    
+    if _stock_store_is_stale(last_ts, period_days):
+        # Empty or stale store: full download replaces the key
+        df = download_stock_history(symbol, interval, period=period)
+        if df is None:
+            return None
+        candle_store.save_candles('nse', symbol, interval, candle_store.frame_to_rows(df), replace=True)
+    else:
+        start = pd.to_datetime(last_ts, unit='ms').strftime('%Y-%m-%d')
+        df = download_stock_history(symbol, interval, start=start)
+        if df is not None:
+            candle_store.save_candles('nse', symbol, interval, candle_store.frame_to_rows(df))
+        
+    return _load_stock_window(symbol, interval, period_days)
+
+def fetch_stock_batch(symbols, interval):
+    """
+    {symbol: frame} for one interval of many tickers, in at most two bulk
+    downloads: a full window for symbols with an empty or stale store, and
+    the days since the oldest last stored candle for the rest.
+    """
+    period, period_days = STOCK_HISTORY[interval]
+    if not USE_CANDLE_STORE:
+        return download_stock_batch(symbols, interval, period=period)
+
+    stale, fresh, starts = [], [], []
+    for symbol in symbols:
+        _, last_ts = candle_store.stats('nse', symbol, interval)
+        if _stock_store_is_stale(last_ts, period_days):
+            stale.append(symbol)
+        else:
+            fresh.append(symbol)
+            starts.append(last_ts)
+
+    if stale:
+        for symbol, df in download_stock_batch(stale, interval, period=period).items():
+            candle_store.save_candles('nse', symbol, interval, candle_store.frame_to_rows(df), replace=True)
+    if fresh:
+        start = pd.to_datetime(min(starts), unit='ms').strftime('%Y-%m-%d')
+        for symbol, df in download_stock_batch(fresh, interval, start=start).items():
+            candle_store.save_candles('nse', symbol, interval, candle_store.frame_to_rows(df))
+
+    frames = {}
+    for symbol in symbols:
+        df = _load_stock_window(symbol, interval, period_days)
+        if df is not None and not df.empty:
+            frames[symbol] = df
+    return frames
+
+def stock_timeframe(df, timeframe):
+    """Frame for one scanner timeframe out of its yfinance interval's history"""
+    if df is None or df.empty:
+        return None
+
+    # Resample for 4H logic
+    if timeframe == '4h':
+        # Resample 1H to 4H
+        df = df.set_index('timestamp')
+        logic = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+        df = df.resample('4h').agg(logic)
+        df.dropna(inplace=True)
+        df.reset_index(inplace=True)
+        
+    return df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
+
 def fetch_stock_ohlcv(symbol, timeframe):
     """Fetch Stock Data using yfinance with resampling"""
     try:
         # Map timeframe to yfinance arguments
         # yfinance intervals: 1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo, 3mo
-        period = "5d" # Default small period for speed
-        interval = "15m"
-        
-        if timeframe == '4h':
-            interval = "1h"
-            period = "1mo" # Need more data to resample 4h
-        elif timeframe == '1h':
-            interval = "1h"
-            period = "1mo"
-        elif timeframe == '15m':
-            interval = "15m"
-            period = "1wk" # 1 week of 15m data is enough
+        interval = STOCK_SOURCE[timeframe]
+        period, period_days = STOCK_HISTORY[interval]
             
-        ticker = yf.Ticker(symbol)
-        df = ticker.history(period=period, interval=interval)
+        if USE_CANDLE_STORE:
+            df = fetch_stock_history_incremental(symbol, interval, period, period_days)
+        else:
+            df = download_stock_history(symbol, interval, period=period)
         
-        if df.empty:
-            return None
-            
-        # Clean headers (lowercase)
-        df.reset_index(inplace=True)
-        df.columns = df.columns.str.lower()
-        
-        # Ensure UTC timezone naive for consistency or just drop Timezone
-        if 'date' in df.columns:
-            df.rename(columns={'date': 'timestamp'}, inplace=True)
-        elif 'datetime' in df.columns:
-             df.rename(columns={'datetime': 'timestamp'}, inplace=True)
-             
-        # Remove timezone if present
-        if pd.api.types.is_datetime64_any_dtype(df['timestamp']):
-            df['timestamp'] = df['timestamp'].dt.tz_localize(None)
-
-        # Resample for 4H logic
-        if timeframe == '4h':
-            # Resample 1H to 4H
-            df.set_index('timestamp', inplace=True)
-            logic = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
-            df = df.resample('4h').agg(logic)
-            df.dropna(inplace=True)
-            df.reset_index(inplace=True)
-            
-        return df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
+        return stock_timeframe(df, timeframe)
         
     except Exception as e:
         print(f"YFinance Error {symbol} {timeframe}: {e}")
         return None
 
-async def fetch_ohlcv_async(client, symbol, timeframe, is_stock=False):
+async def prefetch_stock_frames(symbols, timeframes=None):
+    """
+    Candles for every (symbol, timeframe) of a stock scan from bulk
+    downloads: one 1H pull (also the source of 4H) and one 15m pull per
+    chunk of tickers. Chunks are sized to the NSE bucket and take one token
+    per ticker, since Yahoo still serves each ticker as its own request.
+    timeframes: {symbol: timeframes still needed}, default all of them.
+    """
+    limiter = ratelimit.get_limiter('nse')
+    size = max(1, int(limiter.capacity))
+    history = {}
+    wanted = {interval: [s for s in symbols
+                         if any(STOCK_SOURCE[tf] == interval for tf in (timeframes or {}).get(s, TIMEFRAMES))]
+              for interval in STOCK_HISTORY}
+
+    async def pull(chunk, interval):
+        await limiter.acquire(len(chunk))
+        try:
+            for symbol, df in (await asyncio.to_thread(fetch_stock_batch, chunk, interval)).items():
+                history[(symbol, interval)] = df
+        except Exception as e:
+            # Tickers of this chunk fall back to per-symbol downloads
+            print(f"YFinance Batch Error {interval} ({len(chunk)} tickers): {e}")
+
+    await asyncio.gather(*(pull(tickers[i:i + size], interval)
+                           for interval, tickers in wanted.items() for i in range(0, len(tickers), size)))
+
+    frames = {}
+    for symbol in symbols:
+        for timeframe, interval in STOCK_SOURCE.items():
+            if (symbol, interval) in history:
+                df = stock_timeframe(history[(symbol, interval)], timeframe)
+                if df is not None:
+                    frames[(symbol, timeframe)] = candle_buffer.CandleBuffer.from_frame(df)
+    return frames
+
+def resample_ohlcv(candles, timeframe, base='15m'):
+    """
+    Build higher-timeframe candles from lower-timeframe ones. Buckets are
+    anchored to the Unix epoch, which is how the exchanges align 1h/4h bars
+    (00:00, 04:00, ... UTC). A leading bucket that the history only covers
+    partially is dropped; the trailing one is the still-open candle, just
+    as the exchange would return it.
+    """
+    per_bar = TIMEFRAME_MS[timeframe] // TIMEFRAME_MS[base]
+    return candle_buffer.resample(candles, TIMEFRAME_MS[timeframe], per_bar)
+
+def single_fetch_enabled(exchange_id):
+    return exchange_id != 'nse' and EXCHANGE_CONFIG.get(exchange_id, {}).get('single_fetch', False)
+
+def derive_timeframe(candles_15m, timeframe):
+    """Candles for one timeframe out of a long 15m history (single-fetch mode)"""
+    if candles_15m is None or not len(candles_15m):
+        return None
+    if timeframe != '15m':
+        candles_15m = resample_ohlcv(candles_15m, timeframe)
+    return candles_15m.window(OHLCV_LIMIT)
+
+async def fetch_ohlcv_window(client, symbol, timeframe, limit=OHLCV_LIMIT):
+    """
+    The newest limit candles. Past the venue's max_ohlcv_limit they are
+    paged forward in the fewest equal requests (smaller pages weigh less on
+    Binance); paging goes on while pages come back full, in case the venue's
+    clock is further ahead of ours.
+    """
+    page = EXCHANGE_CONFIG.get(client.id, {}).get('max_ohlcv_limit') or limit
+    if limit <= page:
+        return await client.fetch_ohlcv(symbol, timeframe, limit=limit)
+    # Room for TAIL_MARGIN more candles, so the last page comes back short unless the venue is further ahead
+    wanted = limit + TAIL_MARGIN
+    size = -(-wanted // -(-wanted // page))
+    tf_ms = TIMEFRAME_MS[timeframe]
+    since = (int(time.time() * 1000) // tf_ms - limit + 1) * tf_ms
+    ohlcv = []
+    while True:
+        batch = await client.fetch_ohlcv(symbol, timeframe, since=since, limit=size)
+        ohlcv.extend(batch)
+        if len(batch) < size:
+            return ohlcv[-limit:]
+        since = batch[-1][0] + tf_ms
+
+async def fetch_ohlcv_incremental(client, symbol, timeframe, limit=OHLCV_LIMIT):
+    """
+    Fetch OHLCV through the candle store. When the stored window is
+    contiguous with now, only the candles from the last stored one onwards
+    are requested; otherwise a full window replaces the key.
+    """
+    exchange_id = client.id
+    count, last_ts = candle_store.stats(exchange_id, symbol, timeframe)
+    tf_ms = TIMEFRAME_MS[timeframe]
+    
+    missing = None
+    if last_ts is not None and count >= limit:
+        missing = int((time.time() * 1000 - last_ts) // tf_ms) + 1
+        
+    if missing is None or missing >= limit:
+        ohlcv = await fetch_ohlcv_window(client, symbol, timeframe, limit)
+        candle_store.save_candles(exchange_id, symbol, timeframe, ohlcv, replace=True)
+    else:
+        # Tail only: last stored (possibly still open) candle + anything newer
+        ohlcv = await client.fetch_ohlcv(symbol, timeframe, since=last_ts, limit=missing + 1)
+        candle_store.save_candles(exchange_id, symbol, timeframe, ohlcv)
+        
+    return candle_store.load_candles(exchange_id, symbol, timeframe, limit=limit)
+
+async def fetch_ohlcv_buffered(client, symbol, timeframe, limit=OHLCV_LIMIT):
+    """
+    Fetch OHLCV into the symbol's kept CandleBuffer. A full buffer that is
+    contiguous with now only requests the few candles from its newest one
+    onwards and appends them in place; otherwise (or if that tail came back
+    as a full page) it is refilled with a full window, through the candle
+    store when enabled. Returns a view of it.
+    """
+    exchange_id = client.id
+    buffer = candle_buffer.get(exchange_id, symbol, timeframe, limit)
+    last_ts = buffer.last_timestamp()
+
+    missing = None
+    if last_ts is not None and len(buffer) >= limit:
+        missing = int((time.time() * 1000 - last_ts) // TIMEFRAME_MS[timeframe]) + 1
+
+    ohlcv = None
+    if missing is not None and missing < limit:
+        # Tail only: newest kept (possibly still open) candle + anything newer, so the request stays light
+        tail = max(missing, 1) + 1 + TAIL_MARGIN
+        ohlcv = await client.fetch_ohlcv(symbol, timeframe, since=last_ts, limit=tail)
+        if len(ohlcv) >= tail:
+            ohlcv = None  # A full page: more may follow (the venue is further ahead), refill instead
+        else:
+            if USE_CANDLE_STORE:
+                candle_store.save_candles(exchange_id, symbol, timeframe, ohlcv)
+            buffer.extend(ohlcv)
+    if ohlcv is None:
+        if USE_CANDLE_STORE:
+            ohlcv = await fetch_ohlcv_incremental(client, symbol, timeframe, limit)
+        else:
+            ohlcv = await fetch_ohlcv_window(client, symbol, timeframe, limit)
+        buffer.reset(ohlcv)
+    return buffer.window()
+
+async def fetch_ohlcv_async(client, symbol, timeframe, is_stock=False, limit=OHLCV_LIMIT):
     if is_stock:
+        if client is not None and (symbol, timeframe) in client:
+            # Prefetched in bulk by scan_market_async
+            return client[(symbol, timeframe)]
         # Run blocking yfinance in a thread
-        return await asyncio.to_thread(fetch_stock_ohlcv, symbol, timeframe)
+        await ratelimit.get_limiter('nse').acquire()
+        with metrics.timer('fetch', 'nse', timeframe):
+            df = await asyncio.to_thread(fetch_stock_ohlcv, symbol, timeframe)
+        return None if df is None else candle_buffer.CandleBuffer.from_frame(df)
         
-    # Crypto Logic
+    # Crypto Logic (the pooled client throttles every request through ratelimit)
     try:
-        ohlcv = await client.fetch_ohlcv(symbol, timeframe, limit=150)
-        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        return df
+        with metrics.timer('fetch', client.id, timeframe):
+            return await ratelimit.call(client.id, fetch_ohlcv_buffered, client, symbol, timeframe, limit)
     except Exception as e:
+        if ratelimit.is_retryable(e):
+            raise # Still rate limited / unreachable after retries: the scan reports the symbol as failed
         # print(f"Error fetching {timeframe} for {symbol}: {e}")
         return None
 
-async def check_conditions_async(client, symbol, config, exchange_id='binance'):
+def get_fetch_strategy(exchange_id):
+    return EXCHANGE_CONFIG.get(exchange_id, {}).get('fetch_strategy', 'sequential')
+
+async def check_conditions_async(client, symbol, config, exchange_id='binance', layers=None, stored=None):
+    """
+    layers: this symbol's cached layers (symbol_cache.lookup_many); stored
+    collects the newly computed ones for symbol_cache.store_many.
+    """
     # print(f"Checking {symbol}...") # Debug
     is_stock = (exchange_id == 'nse')
+    strategy = get_fetch_strategy(exchange_id)
     
-    result = {
-        'Symbol': symbol.replace('.NS', ''), # Clean up for UI
-        'Exchange': exchange_id, # Source Verification
-        'Side': 'NEUTRAL',
-        '4H EMA Stack': 'FAIL',
-        '1H EMA Stack': 'FAIL',
-        '15m EMA Stack': 'FAIL',
-        'Pass': False
-    }
+    # Timeframes whose layer is still cached are neither fetched nor recomputed
+    layers = layers or {}
+    missing = missing_layers(layers)
+
+    pending = {}
+    if missing and single_fetch_enabled(exchange_id):
+        # One long 15m pull; 1H/4H are resampled from it
+        pending = {'base': asyncio.ensure_future(fetch_ohlcv_async(client, symbol, '15m', limit=SINGLE_FETCH_BARS))}
+    elif missing and strategy in ('speculative', 'concurrent'):
+        # Fire all timeframes now; each stage below just awaits its own
+        pending = {tf: asyncio.ensure_future(fetch_ohlcv_async(client, symbol, tf, is_stock)) for tf in missing}
+        if strategy == 'concurrent':
+            await asyncio.wait(pending.values())
+
+    async def fetch(timeframe):
+        if 'base' in pending:
+            return derive_timeframe(await pending['base'], timeframe)
+        if timeframe in pending:
+            return await pending[timeframe]
+        return await fetch_ohlcv_async(client, symbol, timeframe, is_stock)
+
+    try:
+        return await evaluate_symbol(fetch, symbol, config, exchange_id, layers, stored)
+    finally:
+        # Speculative fetches of stages we never reached
+        for task in pending.values():
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception() # Mark a failed, never-awaited stage as retrieved
+
+def missing_layers(layers):
+    """Timeframes still to fetch given the cached layers (none once a cached stage rejects)"""
+    side = side_4h(layers['4h']) if '4h' in layers else None
+    if '4h' in layers and side is None:
+        return []
+    if '1h' in layers and side is not None and not confirms_1h(side, layers['1h']):
+        return []
+    return [tf for tf in TIMEFRAMES if tf not in layers]
+
+async def evaluate_symbol(fetch, symbol, config, exchange_id, layers=None, stored=None):
+    """
+    EMA-stack checks for one symbol; fetch(timeframe) supplies the candles.
+    layers: cached per-timeframe state from symbol_cache; the missing ones
+    are computed from fetched candles and, if stored (a list) is given,
+    added to it as symbol_cache entries that last until their candle closes.
+    """
+    layers = dict(layers or {})
+
+    async def layer(timeframe, compute):
+        if timeframe in layers:
+            metrics.inc('scanner_layer_cache_total', exchange=exchange_id, timeframe=timeframe, result='hit')
+            return layers[timeframe]
+        metrics.inc('scanner_layer_cache_total', exchange=exchange_id, timeframe=timeframe, result='miss')
+        candles = await fetch(timeframe)
+        if candles is None or (timeframe == '4h' and len(candles) < 20):
+            return None
+        with metrics.timer('indicators', exchange_id, timeframe):
+            value = compute(candles)
+        if stored is not None:
+            stored.append(symbol_cache.entry(exchange_id, symbol, timeframe, value, candles))
+        return value
 
     # --- STEP 1: 4H Timeframe (Fail Fast) ---
-    df_4h = await fetch_ohlcv_async(client, symbol, '4h', is_stock)
-    if df_4h is None or len(df_4h) < 20: 
+    def compute_4h(candles):
+        # Arrays come from indicator_cache, so a rescan of unchanged candles reuses them
+        h = indicator_cache.frame_hash(candles)
+        close = candles.close
+        values = symbol_cache.latest_values({
+            'close': close,
+            'ema21': indicator_cache.ema_values(symbol, '4h', candles, 21, h),
+            'ema50': indicator_cache.ema_values(symbol, '4h', candles, 50, h),
+            'ema100': indicator_cache.ema_values(symbol, '4h', candles, 100, h),
+        })
+        values['price_24h_ago'] = float(close[-7]) if len(close) > 6 else None
+        return values
+
+    curr_4h = await layer('4h', compute_4h)
+    if curr_4h is None:
         # print(f"{symbol} 4H fetch failed or not enough data")
-        return None
-    
-    df_4h['ema21'] = calculate_ema(df_4h['close'], 21)
-    df_4h['ema50'] = calculate_ema(df_4h['close'], 50)
-    df_4h['ema100'] = calculate_ema(df_4h['close'], 100)
+        return metrics.count_symbol(exchange_id, '4h', 'no_data')
     
-    curr_4h = df_4h.iloc[-1]
-    
-    long_4h = (curr_4h['ema21'] > curr_4h['ema50'] > curr_4h['ema100']) and (curr_4h['close'] > curr_4h['ema21'])
-    short_4h = (curr_4h['ema21'] < curr_4h['ema50'] < curr_4h['ema100']) and (curr_4h['close'] < curr_4h['ema21'])
-
-    if long_4h:
-        result['Side'] = 'LONG'
-        result['4H EMA Stack'] = 'PASS'
-    elif short_4h:
-        result['Side'] = 'SHORT'
-        result['4H EMA Stack'] = 'PASS'
-    else:
+    side = side_4h(curr_4h)
+    if side is None:
         # print(f"{symbol} 4H Trend Failed")
-        return None # FAIL FAST
+        return metrics.count_symbol(exchange_id, '4h', 'rejected') # FAIL FAST
 
 
     # --- STEP 2: 1H Timeframe (Fail Fast) ---
-    df_1h = await fetch_ohlcv_async(client, symbol, '1h', is_stock)
-    if df_1h is None: return None
+    def compute_1h(candles):
+        h = indicator_cache.frame_hash(candles)
+        return symbol_cache.latest_values({
+            'close': candles.close,
+            'ema21': indicator_cache.ema_values(symbol, '1h', candles, 21, h),
+            'ema50': indicator_cache.ema_values(symbol, '1h', candles, 50, h),
+        })
 
-    df_1h['ema21'] = calculate_ema(df_1h['close'], 21)
-    df_1h['ema50'] = calculate_ema(df_1h['close'], 50)
-    curr_1h = df_1h.iloc[-1]
-    
-    if result['Side'] == 'LONG':
-        if not (curr_1h['ema21'] > curr_1h['ema50']): return None
-    elif result['Side'] == 'SHORT':
-        if not (curr_1h['ema21'] < curr_1h['ema50']): return None
+    curr_1h = await layer('1h', compute_1h)
+    if curr_1h is None: return metrics.count_symbol(exchange_id, '1h', 'no_data')
     
-    result['1H EMA Stack'] = 'PASS'
+    if not confirms_1h(side, curr_1h): return metrics.count_symbol(exchange_id, '1h', 'rejected')
 
 
     # --- STEP 3: 15m Timeframe (Final Check) ---
-    df_15m = await fetch_ohlcv_async(client, symbol, '15m', is_stock)
-    if df_15m is None: return None
+    def compute_15m(candles):
+        h = indicator_cache.frame_hash(candles)
+        # Calc RSI/ADX only if we made it this far
+        adx, plus_di, minus_di = indicator_cache.adx_values(symbol, '15m', candles, ADX_PERIOD, h)
+        return symbol_cache.latest_values({
+            'close': candles.close,
+            'ema21': indicator_cache.ema_values(symbol, '15m', candles, 21, h),
+            'ema50': indicator_cache.ema_values(symbol, '15m', candles, 50, h),
+            'rsi': indicator_cache.rsi_values(symbol, '15m', candles, RSI_PERIOD, h),
+            'adx': adx,
+            'plus_di': plus_di,
+            'minus_di': minus_di,
+        })
 
-    df_15m['ema21'] = calculate_ema(df_15m['close'], 21)
-    df_15m['ema50'] = calculate_ema(df_15m['close'], 50)
-    
-    # Calc indicators only if we made it this far
-    df_15m['rsi'] = calculate_rsi(df_15m['close'], RSI_PERIOD)
-    adx, plus_di, minus_di = calculate_adx(df_15m, ADX_PERIOD)
-    df_15m['adx'] = adx
-    df_15m['plus_di'] = plus_di
-    df_15m['minus_di'] = minus_di
-    
-    curr_15m = df_15m.iloc[-1]
+    curr_15m = await layer('15m', compute_15m)
+    if curr_15m is None: return metrics.count_symbol(exchange_id, '15m', 'no_data')
 
-    if result['Side'] == 'LONG':
-        if not ((curr_15m['ema21'] > curr_15m['ema50']) and (curr_15m['close'] > curr_15m['ema50'])):
-            return None
-    elif result['Side'] == 'SHORT':
-        if not ((curr_15m['ema21'] < curr_15m['ema50']) and (curr_15m['close'] < curr_15m['ema50'])):
-            return None
+    if not confirms_15m(side, curr_15m): return metrics.count_symbol(exchange_id, '15m', 'rejected')
+
+    with metrics.timer('filter', exchange_id):
+        result = build_result(symbol, exchange_id, side, curr_15m, curr_4h['price_24h_ago'], config)
+    metrics.count_symbol(exchange_id, 'filter', 'passed' if result else 'filtered')
+    return result
+
+# --- Stage Rules ---
+# Each takes the latest candle's values (a DataFrame row or any mapping with
+# close/ema*/rsi/adx/plus_di/minus_di), so polling and streaming share them.
 
-    result['15m EMA Stack'] = 'PASS'
+def side_4h(curr_4h):
+    """'LONG'/'SHORT' if the 4H EMA stack is aligned, otherwise None"""
+    long_4h = (curr_4h['ema21'] > curr_4h['ema50'] > curr_4h['ema100']) and (curr_4h['close'] > curr_4h['ema21'])
+    short_4h = (curr_4h['ema21'] < curr_4h['ema50'] < curr_4h['ema100']) and (curr_4h['close'] < curr_4h['ema21'])
+
+    if long_4h:
+        return 'LONG'
+    elif short_4h:
+        return 'SHORT'
+    return None
+
+def confirms_1h(side, curr_1h):
+    if side == 'LONG':
+        return curr_1h['ema21'] > curr_1h['ema50']
+    elif side == 'SHORT':
+        return curr_1h['ema21'] < curr_1h['ema50']
+    return False
+
+def confirms_15m(side, curr_15m):
+    if side == 'LONG':
+        return (curr_15m['ema21'] > curr_15m['ema50']) and (curr_15m['close'] > curr_15m['ema50'])
+    elif side == 'SHORT':
+        return (curr_15m['ema21'] < curr_15m['ema50']) and (curr_15m['close'] < curr_15m['ema50'])
+    return False
+
+def build_result(symbol, exchange_id, side, curr_15m, price_24h_ago, config):
+    """Result row for a symbol that passed all three stacks, or None if a filter rejects it"""
+    result = {
+        'Symbol': symbol.replace('.NS', ''), # Clean up for UI
+        'Exchange': exchange_id, # Source Verification
+        'Side': side,
+        '4H EMA Stack': 'PASS',
+        '1H EMA Stack': 'PASS',
+        '15m EMA Stack': 'PASS',
+        'Pass': False
+    }
 
     # --- Setup Type Classification ---
     setup_type = 'MOMENTUM'
@@ -327,31 +690,131 @@ async def check_conditions_async(client, symbol, config, exchange_id='binance'):
     # --- Optional Filters ---
     result['RSI (15m)'] = round(curr_15m['rsi'], 2)
     result['ADX (15m)'] = round(curr_15m['adx'], 2)
+    result['+DI (15m)'] = round(curr_15m['plus_di'], 2)
+    result['-DI (15m)'] = round(curr_15m['minus_di'], 2)
     result['Price'] = round(curr_15m['close'], 2)
     
     # Calculate 24h Change
-    if len(df_4h) > 6:
-        price_24h_ago = df_4h['close'].iloc[-7] 
+    if price_24h_ago is not None:
         change = ((curr_15m['close'] - price_24h_ago) / price_24h_ago) * 100
         result['24h Change'] = round(change, 2)
     else:
         result['24h Change'] = 0.0
     
+    if not passes_filters(result, config):
+        return None
+
+    result['Pass'] = True
+    return result
+
+def passes_filters(result, config):
+    """Optional RSI/ADX filters, applied to an unfiltered result row"""
     # RSI
     if config.get('use_rsi'):
-        if result['Side'] == 'LONG' and result['RSI (15m)'] <= 50: return None
-        if result['Side'] == 'SHORT' and result['RSI (15m)'] >= 50: return None
+        if result['Side'] == 'LONG' and result['RSI (15m)'] <= 50: return False
+        if result['Side'] == 'SHORT' and result['RSI (15m)'] >= 50: return False
 
     # ADX
     if config.get('use_adx'):
-        if result['ADX (15m)'] <= 20: return None
-        if result['Side'] == 'LONG' and not (curr_15m['plus_di'] > curr_15m['minus_di']): return None
-        if result['Side'] == 'SHORT' and not (curr_15m['minus_di'] > curr_15m['plus_di']): return None
+        if result['ADX (15m)'] <= 20: return False
+        if result['Side'] == 'LONG' and not (result['+DI (15m)'] > result['-DI (15m)']): return False
+        if result['Side'] == 'SHORT' and not (result['-DI (15m)'] > result['+DI (15m)']): return False
+        
+    return True
 
-    result['Pass'] = True
-    return result
+def scan_targets(exchange_id, symbols, shard=False):
+    """Symbols a scan of this exchange actually evaluates"""
+    # A shard, or a scan spread over shard workers, covers every symbol
+    if shard or shards.enabled():
+        return symbols
+    # Cap Binance/MEXC for safer demo
+    cap = EXCHANGE_CONFIG.get(exchange_id, {}).get('scan_cap')
+    return symbols[:cap] if cap else symbols
+
+async def scan_batch_async(fetch, symbols, config, exchange_id):
+    """
+    Batch evaluation: every stage fetches its timeframe for the surviving
+    symbols concurrently, then filters them with one vectorised pass, so the
+    4H/1H fail-fast still saves the lower-timeframe requests. The exchange's
+    fetch_strategy decides whether later stages are requested up front.
+    """
+    strategy = get_fetch_strategy(exchange_id)
+
+    def launch(targets, timeframe):
+        return [asyncio.ensure_future(fetch(sym, timeframe)) for sym in targets]
+
+    async def collect(tasks):
+        frames = await asyncio.gather(*tasks, return_exceptions=True)
+        return [c if isinstance(c, candle_buffer.CandleBuffer) else None for c in frames]
+
+    def cancel(tasks, keep):
+        kept = set(keep.tolist())
+        for i, task in enumerate(tasks):
+            if i not in kept:
+                task.cancel()
+                if task.done() and not task.cancelled():
+                    task.exception() # Already failed; nothing will await it
+        return [tasks[i] for i in keep]
+
+    tasks_4h = launch(symbols, '4h')
+    ahead = {}
+    if strategy in ('speculative', 'concurrent'):
+        ahead = {tf: launch(symbols, tf) for tf in ('1h', '15m')}
+        if strategy == 'concurrent':
+            await asyncio.wait(tasks_4h + ahead['1h'] + ahead['15m'])
+
+    frames_4h = await collect(tasks_4h)
+    with metrics.timer('indicators', exchange_id, '4h'):
+        long_4h, short_4h = batch_eval.trend_4h(frames_4h)
+    keep = np.flatnonzero(long_4h | short_4h)
+    count_dropped(exchange_id, '4h', frames_4h, keep)
+    symbols = [symbols[i] for i in keep]
+    frames_4h = [frames_4h[i] for i in keep]
+    ahead = {tf: cancel(tasks, keep) for tf, tasks in ahead.items()}
+
+    frames_1h = await collect(ahead.get('1h') or launch(symbols, '1h'))
+    with metrics.timer('indicators', exchange_id, '1h'):
+        pass_1h = batch_eval.trend_1h(frames_1h, long_4h[keep], short_4h[keep])
+    keep = np.flatnonzero(pass_1h)
+    count_dropped(exchange_id, '1h', frames_1h, keep)
+    symbols = [symbols[i] for i in keep]
+    frames_4h = [frames_4h[i] for i in keep]
+    frames_1h = [frames_1h[i] for i in keep]
+    ahead = {tf: cancel(tasks, keep) for tf, tasks in ahead.items()}
+
+    frames_15m = await collect(ahead.get('15m') or launch(symbols, '15m'))
+    with metrics.timer('indicators', exchange_id, '15m'):
+        results = batch_eval.evaluate_batch(symbols, frames_4h, frames_1h, frames_15m, config, exchange_id,
+                                            RSI_PERIOD, ADX_PERIOD)
+    # 15m rejections and filter drops are not told apart here
+    metrics.count_symbol(exchange_id, '15m', 'rejected', len(symbols) - len(results))
+    metrics.count_symbol(exchange_id, 'filter', 'passed', len(results))
+    return results
+
+def count_dropped(exchange_id, stage, frames, keep):
+    """Fail-fast counters for one batch stage"""
+    no_data = sum(1 for df in frames if df is None)
+    metrics.count_symbol(exchange_id, stage, 'no_data', no_data)
+    metrics.count_symbol(exchange_id, stage, 'rejected', len(frames) - len(keep) - no_data)
+
+async def scan_market_async(exchange_id, symbols, config=None, batch=None, on_result=None, client=None, on_error=None,
+                            trace=None, shard=False):
+    """
+    Scan symbols on one exchange and return the passing results.
+    on_result, if given, is called with each passing result as soon as it
+    is known (per symbol, or all at once at the end in batch mode).
+    on_error(symbol, message) is called for every symbol whose candles could
+    not be fetched (rate limited or unreachable after retries).
+    client defaults to the pooled client of the running loop, which stays
+    open for the next scan (see exchange_pool.close_async_clients).
+    For NSE it defaults to the candles of prefetch_stock_frames.
+    trace records a per-symbol timeline (default: SCAN_TRACE, see metrics).
+    With shard workers configured (shards.WORKERS) the scan is spread over
+    them; shard=True is one worker's part, scanned here in full.
+    """
+    if batch is None:
+        batch = BATCH_EVALUATION
 
-async def scan_market_async(exchange_id, symbols, config=None):
     if config is None:
         config = {'use_rsi': False, 'use_adx': False}
     
@@ -359,62 +822,196 @@ async def scan_market_async(exchange_id, symbols, config=None):
         print(f"Invalid exchange: {exchange_id}")
         return []
 
-    client = None
-    if exchange_id != 'nse':
-        ex_config = EXCHANGE_CONFIG[exchange_id]
-        exchange_class = getattr(ccxt, exchange_id)
-        client = exchange_class({
-            'enableRateLimit': True, 
-            'options': ex_config['options']
-        })
+    if not shard and client is None and shards.enabled():
+        return await shards.scan_sharded_async(exchange_id, symbols, config, on_result=on_result, on_error=on_error)
+
+    if client is None and exchange_id != 'nse':
+        client = await exchange_pool.get_async_client(exchange_id)
     
-    # Concurrency Control
-    concurrency_limit = 20
-    if exchange_id == 'mexc':
-        concurrency_limit = 6
-    elif exchange_id == 'bybit':
-        concurrency_limit = 5
-    elif exchange_id == 'nse':
-        concurrency_limit = 10 # Yahoo can be rate limited
-        
-    sem = asyncio.Semaphore(concurrency_limit) 
+    # Request pacing is left to the exchange's token bucket (see ratelimit),
+    # so every symbol is started at once and runs as fast as the budget allows
+    failed = {}
+
+    def record_failure(sym, error):
+        if sym not in failed:
+            failed[sym] = f"{type(error).__name__}: {error}"
+            metrics.count_symbol(exchange_id, 'fetch', 'failed')
+            if on_error:
+                on_error(sym, failed[sym])
 
     async def protected_check(sym):
-        async with sem:
-            if exchange_id == 'mexc':
-                await asyncio.sleep(0.5)
-            # Add small delay for NSE to avoid Yahoo rate limits?
-            if exchange_id == 'nse':
-                await asyncio.sleep(0.1)
-                
-            return await check_conditions_async(client, sym, config, exchange_id)
+        metrics.bind_symbol(sym)
+        try:
+            res = await check_conditions_async(client, sym, config, exchange_id, cached.get(sym), stored)
+        except Exception as e:
+            record_failure(sym, e)
+            return None
+        if on_result and res and res.get('Pass'):
+            on_result(res)
+        return res
+
+    async def raw_fetch(sym, timeframe, limit=OHLCV_LIMIT):
+        metrics.bind_symbol(sym)
+        try:
+            return await fetch_ohlcv_async(client, sym, timeframe, exchange_id == 'nse', limit)
+        except Exception as e:
+            record_failure(sym, e)
+            raise
+
+    base_frames = {}
+    async def protected_fetch(sym, timeframe):
+        if not single_fetch_enabled(exchange_id):
+            return await raw_fetch(sym, timeframe)
+        # Single-fetch: every timeframe of a symbol shares one 15m request
+        if sym not in base_frames:
+            base_frames[sym] = asyncio.ensure_future(raw_fetch(sym, '15m', SINGLE_FETCH_BARS))
+        return derive_timeframe(await asyncio.shield(base_frames[sym]), timeframe)
 
     tasks = []
-    scan_targets = symbols
-    
-    # Cap Binance/MEXC for safer demo
-    if exchange_id == 'binance' and len(symbols) > 100:
-        scan_targets = symbols[:100]
-    elif exchange_id == 'mexc' and len(symbols) > 75:
-        scan_targets = symbols[:75]
+    targets = scan_targets(exchange_id, symbols, shard)
         
-    for sym in scan_targets:
-        tasks.append(protected_check(sym))
+    print(f"Scanning {len(targets)} pairs on {exchange_id}...")
+    trace = metrics.start_trace(exchange_id, targets, trace)
+    started = time.perf_counter()
+
+    try:
+        # Cached layers of every target in one read, and the new ones in one write at the end,
+        # off the loop: a busy SQLite cache must not stall other scans and requests
+        # (batch evaluation does not use cached layers)
+        cached, stored = {}, []
+        if not batch:
+            cached = await asyncio.to_thread(symbol_cache.lookup_many, exchange_id, list(targets), TIMEFRAMES)
+
+        if client is None and EXCHANGE_CONFIG[exchange_id].get('batch_download'):
+            # Stocks: the checks read their candles from the bulk downloads
+            needed = None if batch else {s: missing_layers(cached[s]) for s in targets}
+            with metrics.timer('prefetch', exchange_id):
+                client = await prefetch_stock_frames(list(targets), needed)
         
-    print(f"Scanning {len(scan_targets)} pairs on {exchange_id} with concurrency {concurrency_limit}...")
-    
-    results = []
-    responses = await asyncio.gather(*tasks, return_exceptions=True)
-    
-    for res in responses:
-        if isinstance(res, dict) and res.get('Pass'):
-            results.append(res)
+        results = []
+        if batch:
+            results = await scan_batch_async(protected_fetch, list(targets), config, exchange_id)
+            if on_result:
+                for res in results:
+                    on_result(res)
+        else:
+            for sym in targets:
+                tasks.append(protected_check(sym))
+                
+            responses = await asyncio.gather(*tasks, return_exceptions=True)
             
-    if client:
-        await client.close()
+            for res in responses:
+                if isinstance(res, dict) and res.get('Pass'):
+                    results.append(res)
+            if stored:
+                await asyncio.to_thread(symbol_cache.store_many, stored)
+    finally:
+        metrics.record('scan', time.perf_counter() - started, exchange_id)
+        metrics.end_trace(trace)
+    metrics.inc('scanner_scans_total', exchange=exchange_id, mode='batch' if batch else 'per_symbol')
         
+    if failed:
+        print(f"Scan on {exchange_id}: {len(failed)} symbols failed ({', '.join(list(failed)[:5])}"
+              f"{', ...' if len(failed) > 5 else ''})")
     return results
 
+# --- Warm-up ---
+# ccxt (every exchange class) and yfinance are imported on first use, so a
+# process only pays for the venues it actually scans. A gunicorn master with
+# preload_app calls warm_up() before forking instead (see gunicorn.conf.py):
+# the workers then share those modules copy-on-write and skip the imports.
+
+def warm_up(exchanges=None):
+    """Import the data-source libraries these exchanges (default MULTI_EXCHANGES) use"""
+    exchanges = MULTI_EXCHANGES if exchanges is None else exchanges
+    started = time.perf_counter()
+    loaded = []
+    if any(e != 'nse' for e in exchanges):
+        import ccxt.async_support # Pulls in the sync ccxt package as well
+        loaded.append('ccxt')
+    if 'nse' in exchanges:
+        import yfinance
+        loaded.append('yfinance')
+    print(f"Warm-up: loaded {', '.join(loaded) or 'nothing'} in {time.perf_counter() - started:.2f}s")
+
+# --- Multi-Exchange Scans ---
+
+def base_asset(symbol):
+    """'BTC/USDT', 'BTC/USDT:USDT', 'BTCUSDT' -> 'BTC'; 'RELIANCE.NS' -> 'RELIANCE'"""
+    base = symbol.split('/')[0].split(':')[0].replace('.NS', '')
+    if '/' not in symbol and base.endswith('USDT') and len(base) > 4:
+        base = base[:-4]
+    return base
+
+def merge_results(results_by_exchange, order=None):
+    """
+    One ranked list out of several venues' results. Rows for the same base
+    asset and side (crypto and stocks kept apart) become one row: the
+    fields of the first venue in `order`, plus Asset, Exchanges and Venues
+    (every venue's own row). Ranked by how many venues agree, then ADX.
+    """
+    order = order or MULTI_EXCHANGES
+    rank = {e: i for i, e in enumerate(order)}
+    groups = {}
+    for exchange_id in sorted(results_by_exchange, key=lambda e: rank.get(e, len(rank))):
+        kind = EXCHANGE_CONFIG.get(exchange_id, {}).get('type')
+        for row in results_by_exchange[exchange_id]:
+            key = (base_asset(row['Symbol']), row['Side'], kind == 'stock')
+            groups.setdefault(key, []).append(row)
+
+    merged = []
+    for (asset, _, _), rows in groups.items():
+        row = dict(rows[0])
+        row['Asset'] = asset
+        row['Exchanges'] = [r['Exchange'] for r in rows]
+        row['Venues'] = rows
+        merged.append(row)
+    merged.sort(key=lambda r: (-len(r['Venues']), -r['ADX (15m)'], r['Asset']))
+    return merged
+
+async def scan_exchanges_async(symbols_by_exchange, config=None, on_result=None, on_error=None, lookup=None):
+    """
+    Scan several venues concurrently and return merge_results() of them.
+    symbols_by_exchange: {exchange_id: symbols, or None for its top volume
+    pairs}. Every venue runs under its own rate limiter, so the wall time is
+    that of the slowest one. lookup(exchange_id, symbols), if given, may
+    return cached results for a venue to skip its scan. on_result receives
+    each venue's passing rows as they come; on_error gets 'exchange:symbol'
+    keys ('exchange:*' when a whole venue failed).
+    """
+    if config is None:
+        config = {'use_rsi': False, 'use_adx': False}
+
+    def report(key, message):
+        if on_error:
+            on_error(key, message)
+
+    async def one(exchange_id, symbols):
+        if symbols is None:
+            symbols = await volume_index.top_pairs(exchange_id, TOP_N_COINS)
+        cached = lookup(exchange_id, symbols) if lookup else None
+        if cached is not None:
+            if on_result:
+                for row in cached:
+                    on_result(row)
+            return cached
+        return await scan_market_async(exchange_id, symbols, config, on_result=on_result,
+                                       on_error=lambda sym, msg: report(f"{exchange_id}:{sym}", msg))
+
+    exchanges = [e for e in symbols_by_exchange if e in EXCHANGE_CONFIG]
+    started = time.time()
+    responses = await asyncio.gather(*(one(e, symbols_by_exchange[e]) for e in exchanges), return_exceptions=True)
+
+    results_by_exchange = {}
+    for exchange_id, res in zip(exchanges, responses):
+        if isinstance(res, Exception):
+            print(f"Scan Error ({exchange_id}): {res}")
+            report(f"{exchange_id}:*", f"{type(res).__name__}: {res}")
+        else:
+            results_by_exchange[exchange_id] = res
+    print(f"Scanned {len(exchanges)} exchanges in {time.time() - started:.2f} seconds.")
+    return merge_results(results_by_exchange)
+
 def main():
     # Fix for Windows AsyncIO Loop
     if sys.platform == 'win32':
@@ -428,14 +1025,22 @@ def main():
         
         config = {'use_rsi': False, 'use_adx': False}
         
+        async def run_scan():
+            try:
+                return await scan_market_async('nse', pairs, config)
+            finally:
+                await exchange_pool.close_async_clients()
+
         start = time.time()
-        results = asyncio.run(scan_market_async('nse', pairs, config))
+        results = asyncio.run(run_scan())
     except Exception as e:
         print(e)
         return
     end = time.time()
     
     print(f"Scan completed in {end - start:.2f} seconds.")
+    for line in metrics.summary():
+        print(f"  {line}")
     
     if not results:
         print("No pairs found.")
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import os
+import sys
+import time
+import runtime
+import scanner
+import shared_cache
+import volume_index
+
+# --- Configuration ---
+SCHEDULED_EXCHANGES = [e for e in os.environ.get('SCHEDULER_EXCHANGES', 'binance,bybit,mexc,nse').split(',') if e]
+UNIVERSE_SIZE = 150  # Same universe the dashboard requests from /api/pairs
+UNIVERSE_TTL = 3600  # Refresh the top-volume universe hourly
+CLOSE_INTERVAL = 15 * 60  # Every 1h/4h close is also a 15m close
+SETTLE_DELAY = 5  # Seconds after a close before fetching, so the exchange has finalised the candle
+SNAPSHOT_DIR = os.environ.get(
+    'SCAN_SNAPSHOT_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'scans')
+)
+SNAPSHOT_MAX_AGE = 2 * CLOSE_INTERVAL + 300  # Readers ignore snapshots older than this
+
+def next_close(now, interval=CLOSE_INTERVAL):
+    """Unix time of the next candle close boundary after now"""
+    return (int(now) // interval + 1) * interval
+
+def closed_timeframes(boundary):
+    """Timeframes whose candle closes exactly at this boundary"""
+    return [tf for tf, ms in scanner.TIMEFRAME_MS.items() if (boundary * 1000) % ms == 0]
+
+# --- Shared Snapshot Store ---
+# One JSON file per exchange, replaced atomically, so any number of web
+# workers (or a separate scheduler process) share the same results.
+
+_snapshot_cache = {}
+# Structure: {'binance': {'mtime': 0.0, 'data': {...}}, ...}
+
+def _snapshot_path(exchange_id):
+    return os.path.join(SNAPSHOT_DIR, f"{exchange_id}.json")
+
+def publish(exchange_id, results, symbols, boundary=None):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    snapshot = {
+        'exchange': exchange_id,
+        'results': results,
+        'symbols': symbols,
+        'timestamp': time.time(),
+        'boundary': boundary,
+        'closed': closed_timeframes(boundary) if boundary else [],
+    }
+    path = _snapshot_path(exchange_id)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(snapshot, f, default=float)
+    os.replace(tmp, path)
+
+def read_snapshot(exchange_id):
+    """Latest published scan for an exchange, or None if missing or stale"""
+    path = _snapshot_path(exchange_id)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    cached = _snapshot_cache.get(exchange_id)
+    if not cached or cached['mtime'] != mtime:
+        try:
+            with open(path) as f:
+                cached = {'mtime': mtime, 'data': json.load(f)}
+        except (OSError, ValueError):
+            return None
+        _snapshot_cache[exchange_id] = cached
+
+    data = cached['data']
+    if time.time() - data['timestamp'] > SNAPSHOT_MAX_AGE:
+        return None
+    return data
+
+# --- Scan Loop ---
+# Every process that runs the loop (the Procfile's scheduler, or each web
+# worker with SCAN_SCHEDULER=1) wakes at the same close; the first to take
+# the close's lock in shared_cache scans it and the others skip it, so a
+# close costs one scan's exchange budget however many processes run this.
+# That holds for the processes sharing one cache backend (the SQLite file on
+# a host, or Redis); with CACHE_BACKEND=memory each process scans on its own.
+
+async def claim(exchange_id, boundary):
+    """Whether this process scans exchange_id for this close (boundary None: the current interval)"""
+    if boundary is None:
+        boundary = int(time.time()) // CLOSE_INTERVAL * CLOSE_INTERVAL
+    key = shared_cache.make_key('scheduler', exchange_id, boundary)
+    # Held for the whole interval (never released), so a late waker finds it taken
+    return await asyncio.to_thread(shared_cache.try_lock, key, CLOSE_INTERVAL) is not None
+
+async def scan_exchange(exchange_id, universe, boundary):
+    if not await claim(exchange_id, boundary):
+        print(f"Scheduler: {exchange_id} close already claimed by another process, skipping")
+        return
+    scope = universe.setdefault(exchange_id, {'symbols': [], 'timestamp': 0})
+    if not scope['symbols'] or time.time() - scope['timestamp'] > UNIVERSE_TTL:
+        try:
+            symbols = await volume_index.top_pairs(exchange_id, UNIVERSE_SIZE)
+        except Exception as e:
+            print(f"Scheduler: could not rank {exchange_id} pairs: {e}")
+            symbols = []
+        if symbols:
+            scope['symbols'] = symbols
+            scope['timestamp'] = time.time()
+    if not scope['symbols']:
+        print(f"Scheduler: no symbols for {exchange_id}, skipping")
+        return
+
+    start = time.time()
+    # Unfiltered scan; readers apply the RSI/ADX toggles with scanner.passes_filters
+    results = await scanner.scan_market_async(exchange_id, scope['symbols'], {})
+    symbols = scanner.scan_targets(exchange_id, scope['symbols'])
+    publish(exchange_id, results, symbols, boundary)
+    print(f"Scheduler: {exchange_id} scanned in {time.time() - start:.2f}s, {len(results)} setups")
+
+async def run_forever(exchanges=None):
+    exchanges = exchanges or SCHEDULED_EXCHANGES
+    universe = {}
+    boundary = None
+    while True:
+        responses = await asyncio.gather(
+            *(scan_exchange(e, universe, boundary) for e in exchanges), return_exceptions=True
+        )
+        for exchange_id, res in zip(exchanges, responses):
+            if isinstance(res, Exception):
+                print(f"Scheduler Error ({exchange_id}): {res}")
+
+        boundary = next_close(time.time())
+        await asyncio.sleep(max(boundary + SETTLE_DELAY - time.time(), 0))
+
+_future = None
+_future_pid = None
+
+def start_background(exchanges=None):
+    """Run the scheduler on this process's shared event loop (started once per process)"""
+    global _future, _future_pid
+    # A forked worker does not inherit the parent's loop thread
+    if _future is not None and _future_pid == os.getpid() and not _future.done():
+        return
+    _future = runtime.submit(run_forever(exchanges))
+    _future_pid = os.getpid()
+
+def main():
+    # Fix for Windows AsyncIO Loop
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+    print(f"Scheduler: scanning {', '.join(SCHEDULED_EXCHANGES)} on every candle close")
+    asyncio.run(run_forever())
+
+if __name__ == "__main__":
+    main()
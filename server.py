@@ -1,9 +1,20 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response, stream_with_context
 from flask_cors import CORS
 import scanner
+import scheduler
+import runtime
+import shards
+import ratelimit
+import metrics
+import shared_cache
+import volume_index
 import asyncio
+import json
+import os
+import queue
 import sys
 import time
+import uuid
 
 app = Flask(__name__)
 # Explicitly allow everything (Public API standards) - No credentials needed
@@ -16,9 +27,25 @@ if sys.platform == 'win32':
 # Client is now dynamic in scanner.py
 # No global client needed
 
-# Segmented Cache by Exchange
-pairs_cache = {}
-# Structure: {'binance': {'data': [], 'timestamp': 0}, 'bybit': ...}
+# Background scans on candle close. SCAN_SCHEDULER=1 runs the scheduler inside
+# this process; otherwise run `python scheduler.py` as its own process and the
+# endpoints below just read the snapshots it publishes. With it on in every
+# worker, each close is still scanned once: the workers share a lock per
+# close through shared_cache (see scheduler.claim).
+RUN_SCHEDULER = os.environ.get('SCAN_SCHEDULER', '0') == '1'
+
+# Caches live in shared_cache (SQLite WAL file by default), so every gunicorn
+# worker shares them and identical concurrent requests run once (single flight).
+# Per-symbol 4H/1H/15m state is cached by symbol_cache until each candle
+# closes, so different symbol lists and configs share work; a whole scan
+# result is only kept briefly, and never past the next 15m close.
+SCAN_TTL = 60  # Longest a scan result (per exchange, symbol list and config) is kept
+
+def scan_ttl(now=None):
+    """Seconds a scan result stays valid: SCAN_TTL, cut short by the next 15m close"""
+    now = time.time() if now is None else now
+    to_close = 900 - now % 900
+    return max(1, int(min(SCAN_TTL, to_close)))
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -28,6 +55,10 @@ def health_check():
 def log_request_info():
     # Log every request to see if laptop hits are reaching us
     print(f"REQ: {request.method} {request.url} from {request.remote_addr}")
+    # Started lazily so gunicorn forks don't lose the thread
+    if RUN_SCHEDULER:
+        scheduler.start_background()
+    volume_index.start_background()
 
 @app.after_request
 def add_cors_headers(response):
@@ -40,28 +71,17 @@ def add_cors_headers(response):
 @app.route('/api/pairs', methods=['GET'])
 def get_pairs():
     """Fetch top volume pairs (cached every 1 hour per exchange)"""
-    global pairs_cache
-    
-    current_time = time.time()
     limit = request.args.get('limit', default=75, type=int)
     exchange_id = request.args.get('exchange', default='binance', type=str).lower()
     
-    # Initialize cache scope if needed
-    if exchange_id not in pairs_cache:
-        pairs_cache[exchange_id] = {'data': [], 'timestamp': 0}
-    
-    # Check cache
-    cache_scope = pairs_cache[exchange_id]
-    if cache_scope['data'] and (current_time - cache_scope['timestamp'] < 3600):
-        return jsonify({'pairs': cache_scope['data'][:limit]})
+    # Served from the in-memory volume index; only a cold index waits on the exchange
+    pairs = volume_index.top(exchange_id, limit)
+    if pairs is not None:
+        return jsonify({'pairs': pairs, 'status': 'success'})
 
     try:
         print(f"Fetching fresh pairs from {exchange_id}...")
-        # Note: We need to update scanner.fetch_top_volume_pairs to accept exchange_id
-        pairs = scanner.fetch_top_volume_pairs_sync(exchange_id, limit=limit)
-        if pairs:
-            cache_scope['data'] = pairs
-            cache_scope['timestamp'] = current_time
+        pairs = runtime.run(volume_index.top_pairs(exchange_id, limit))
     except Exception as e:
         print(f"Error fetching pairs for {exchange_id}: {e}")
         # Return the error to the frontend for debugging
@@ -69,55 +89,237 @@ def get_pairs():
         
     return jsonify({'pairs': pairs, 'status': 'success'})
 
-# Segmented Result Cache
-scan_cache = {}
-# Structure: {'binance': {'results': [], 'timestamp': 0, 'config_hash': ''}, ...}
+# --- Scan Results ---
+
+def scan_key(exchange_id, symbols, config):
+    return shared_cache.make_key('scan', exchange_id, symbols, sorted(config.items()))
+
+def snapshot_results(exchange_id, symbols, config):
+    """Pre-computed results from the scheduler (only if it scanned every symbol the scan would)"""
+    snapshot = scheduler.read_snapshot(exchange_id)
+    # A capped exchange only scans its first scan_cap symbols, so the rest need not be in the snapshot
+    if snapshot and set(scanner.scan_targets(exchange_id, symbols)) <= set(snapshot['symbols']):
+        wanted = {s.replace('.NS', '') for s in symbols}
+        return [r for r in snapshot['results'] if r['Symbol'] in wanted and scanner.passes_filters(r, config)]
+    return None
+
+def cached_scan_results(exchange_id, symbols, config):
+    """Results from the scheduler snapshot or the shared 60s scan cache, None on a miss"""
+    results = snapshot_results(exchange_id, symbols, config)
+    if results is None:
+        cached = shared_cache.get_json(scan_key(exchange_id, symbols, config))
+        if cached is not None:
+            print(f"Serving cached scan results for {exchange_id}...")
+            results = cached['results']
+    return results
+
+def scan_blocking(exchange_id, symbols, config):
+    """Run a scan on the shared loop; returns {'results', 'failed'}"""
+    failed = {}
+    # Runs on the process-wide loop so pooled exchange clients are reused
+    results = runtime.run(scanner.scan_market_async(exchange_id, symbols, config, on_error=failed.__setitem__))
+    return {'results': results, 'failed': failed}
+
+def complete_scan(payload):
+    return not payload['failed'] # Never cache a partial scan
+
+# --- Multi-Exchange Scans ---
+# {'exchange': 'all'} or {'exchanges': [...]} scans the venues concurrently
+# and returns one merged list (see scanner.merge_results). symbols may be a
+# {exchange: [...]} dict; venues without a list scan their top volume pairs.
+
+def requested_exchanges(data):
+    """Venues of a multi-exchange scan request, None for a single-exchange one"""
+    if data.get('exchanges'):
+        return [e.lower() for e in data['exchanges']]
+    if str(data.get('exchange', '')).lower() == 'all':
+        return list(scanner.MULTI_EXCHANGES)
+    return None
+
+def multi_scan_key(exchanges, symbols, config):
+    return shared_cache.make_key('scan', 'multi', exchanges, symbols if isinstance(symbols, dict) else {},
+                                 sorted(config.items()))
+
+async def scan_multi(exchanges, symbols, config):
+    """Multi-exchange scan; venues with a scheduler snapshot or cached scan are not rescanned"""
+    symbols = symbols if isinstance(symbols, dict) else {}
+    failed = {}
+    results = await scanner.scan_exchanges_async(
+        {e: symbols.get(e) for e in exchanges}, config, on_error=failed.__setitem__,
+        lookup=lambda exchange_id, syms: cached_scan_results(exchange_id, syms, config)
+    )
+    return {'results': results, 'failed': failed}
 
 @app.route('/api/scan', methods=['POST'])
 def scan_pairs():
     """
     Scan with multi-exchange support and caching.
     """
-    global scan_cache
-    
     data = request.json
     symbols = data.get('symbols', [])
     config = data.get('config', {})
     exchange_id = data.get('exchange', 'binance').lower()
-    
-    # Initialize cache scope
-    if exchange_id not in scan_cache:
-        scan_cache[exchange_id] = {'results': [], 'timestamp': 0, 'config_hash': ''}
-        
-    cache_scope = scan_cache[exchange_id]
 
-    current_config_hash = str(sorted(config.items()))
-    current_time = time.time()
+    exchanges = requested_exchanges(data)
+    if exchanges:
+        try:
+            payload = shared_cache.single_flight(
+                multi_scan_key(exchanges, symbols, config),
+                lambda: runtime.run(scan_multi(exchanges, symbols, config)),
+                scan_ttl(), cacheable=complete_scan
+            )
+        except Exception as e:
+            print(f"Scan Error ({', '.join(exchanges)}): {e}")
+            payload = {'results': [], 'failed': {}}
+        return jsonify(payload)
     
-    # 1. Check Cache
-    if (cache_scope['results'] and 
-        (current_time - cache_scope['timestamp'] < 60) and 
-        cache_scope['config_hash'] == current_config_hash):
-        
-        print(f"Serving cached scan results for {exchange_id}...")
-        return jsonify({'results': cache_scope['results']})
-    
-    # 2. Cache Miss
-    print(f"Scanning {len(symbols)} pairs on {exchange_id}...")
+    cached = snapshot_results(exchange_id, symbols, config)
+    if cached is not None:
+        return jsonify({'results': cached})
     
+    # Cache miss: one worker scans, identical concurrent requests wait for its result
     try:
-        results = asyncio.run(scanner.scan_market_async(exchange_id, symbols, config))
-        
-        if results:
-            cache_scope['results'] = results
-            cache_scope['timestamp'] = current_time
-            cache_scope['config_hash'] = current_config_hash
-            
+        payload = shared_cache.single_flight(
+            scan_key(exchange_id, symbols, config),
+            lambda: scan_blocking(exchange_id, symbols, config),
+            scan_ttl(), cacheable=complete_scan
+        )
     except Exception as e:
         print(f"Scan Error ({exchange_id}): {e}")
-        results = []
+        payload = {'results': [], 'failed': {}}
+        
+    return jsonify(payload)
+
+@app.route('/api/scan/shard', methods=['POST'])
+def scan_shard():
+    """One shard of a coordinator's scan (see shards): every given symbol, no caps, not cached"""
+    if not shards.authorized(request.headers.get('X-Shard-Token', '')):
+        return jsonify({'error': 'Invalid shard token'}), 403
+    data = request.json
+    exchange_id = data.get('exchange', 'binance').lower()
+    try:
+        payload = runtime.run(shards.scan_shard_async(exchange_id, data.get('symbols', []), data.get('config', {})))
+    except Exception as e:
+        print(f"Shard Error ({exchange_id}): {e}")
+        return jsonify({'error': str(e)}), 500
+    return jsonify(payload)
+
+@app.route('/api/ratelimits', methods=['GET'])
+def rate_limits():
+    """Token bucket state per exchange (tokens, refill rate, backoff, 429 count)"""
+    return jsonify(ratelimit.snapshot())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Scan stage latencies, fail-fast and error counters of this worker (Prometheus text)"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/scan/trace', methods=['GET'])
+def scan_trace():
+    """Per-symbol timeline of this worker's latest scan (needs SCAN_TRACE=1)"""
+    return jsonify(metrics.last_trace() or {})
+
+# --- Streaming Scan (Server-Sent Events) ---
+# Every finished stream is remembered as a snapshot in the shared cache; a
+# client that sends its last snapshot id only receives the rows that were
+# added, changed or removed, whichever worker it reconnects to.
+STREAM_SNAPSHOT_TTL = 3600
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=float)}\n\n"
+
+def iter_scan_results(exchange_id, symbols, config, failed, token):
+    """
+    Yield passing results as the scan produces them (scan runs on the shared
+    loop). Symbols that could not be fetched are collected in failed. The
+    caller holds the scan's single-flight lock (token); it is released once
+    the complete result is published.
+    """
+    key = scan_key(exchange_id, symbols, config)
+    results = queue.Queue()
+    done = object()
+
+    def finished(future):
+        try:
+            payload = {'results': future.result(), 'failed': dict(failed)}
+            if complete_scan(payload):
+                shared_cache.set_json(key, payload, scan_ttl())
+        except Exception as e:
+            print(f"Scan Error ({exchange_id}): {e}")
+        finally:
+            shared_cache.unlock(key, token)
+            results.put(done)
+
+    scan = scanner.scan_market_async(exchange_id, symbols, config, on_result=results.put,
+                                     on_error=failed.__setitem__)
+    runtime.submit(scan).add_done_callback(finished)
+    while True:
+        item = results.get()
+        if item is done:
+            return
+        yield item
+
+def scan_source(exchange_id, symbols, config, failed):
+    """Cached results, the live scan, or another worker's identical scan"""
+    cached = cached_scan_results(exchange_id, symbols, config)
+    if cached is not None:
+        return cached
+    key = scan_key(exchange_id, symbols, config)
+    token = shared_cache.try_lock(key)
+    if token is not None:
+        return iter_scan_results(exchange_id, symbols, config, failed, token)
+    payload = shared_cache.single_flight(key, lambda: scan_blocking(exchange_id, symbols, config),
+                                         scan_ttl(), cacheable=complete_scan)
+    failed.update(payload['failed'])
+    return payload['results']
+
+@app.route('/api/scan/stream', methods=['GET'])
+def scan_stream():
+    """
+    Stream scan results as Server-Sent Events:
+    add/change (a result row), remove ({'Symbol'}), failed ({'Symbol',
+    'error'}; its previous row is kept) and a final done ({'snapshot', 'count'}). Query: exchange, symbols (comma separated),
+    use_rsi, use_adx, only_pulse, since (snapshot id of the previous stream).
+    """
+    exchange_id = request.args.get('exchange', default='binance', type=str).lower()
+    symbols = [s for s in request.args.get('symbols', default='', type=str).split(',') if s]
+    config = {k: request.args.get(k, default='false').lower() in ('1', 'true')
+              for k in ('use_rsi', 'use_adx', 'only_pulse')}
+    since = request.args.get('since', default='', type=str)
+    previous = (shared_cache.get_json(f"stream:{since}") if since else None) or {}
+
+    def generate():
+        current = {}
+        failed = {}
+        source = scan_source(exchange_id, symbols, config, failed)
         
-    return jsonify({'results': results})
+        for result in source:
+            current[result['Symbol']] = result
+            old = previous.get(result['Symbol'])
+            if old is None:
+                yield sse_event('add', result)
+            elif old != result:
+                yield sse_event('change', result)
+                
+        for symbol, error in failed.items():
+            symbol = symbol.replace('.NS', '')
+            yield sse_event('failed', {'Symbol': symbol, 'error': error})
+            if symbol in previous:
+                # Unknown this time round, not gone: keep the last known row
+                current[symbol] = previous[symbol]
+
+        for symbol in previous:
+            if symbol not in current:
+                yield sse_event('remove', {'Symbol': symbol})
+                
+        snapshot_id = uuid.uuid4().hex
+        shared_cache.set_json(f"stream:{snapshot_id}", current, STREAM_SNAPSHOT_TTL)
+        yield sse_event('done', {'snapshot': snapshot_id, 'count': len(current)})
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # Don't let proxies buffer the stream
+    return response
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import metrics
+import runtime
+
+# Sharded scanning. A coordinator splits an exchange's symbol list into
+# shards of at most one process's budget (the exchange's scan_cap, else
+# SHARD_SIZE) and hands them to workers. Each worker scans its shard on its
+# own event loop and rate limiter; the results are merged back in symbol
+# order. Workers on separate hosts each have their own egress IP and so the
+# venue's whole budget, while local processes split one host's budget (see
+# ratelimit.PROCESSES). A single process caps Binance/MEXC scans
+# (scanner.scan_targets). Once shard workers are configured every symbol is
+# scanned, and more hosts make it faster instead of dropping symbols.
+#
+# Workers are either servers reached over HTTP (SHARD_WORKERS, which serve
+# POST /api/scan/shard) or local processes, e.g. to try it on one machine:
+#
+#   python shards.py --local 4 --exchange binance --limit 300
+#   python shards.py --local 4 --mock 1000 --compare   # offline, against MockExchange
+
+# --- Configuration ---
+WORKERS = [u for u in os.environ.get('SHARD_WORKERS', '').split(',') if u]  # e.g. http://10.0.0.2:5000,...
+SHARD_SIZE = int(os.environ.get('SHARD_SIZE', '100'))  # Symbols per shard on venues without a scan_cap
+SHARD_TOKEN = os.environ.get('SHARD_TOKEN', '')  # Shared secret for /api/scan/shard (empty: open)
+SHARD_TIMEOUT = 300  # Seconds a remote worker gets per shard (gunicorn's worker timeout)
+SHARD_RETRIES = 1  # Times a failed shard is handed to another worker before its symbols count as failed
+
+def enabled():
+    """Scans are spread over remote shard workers"""
+    return bool(WORKERS)
+
+def shard_size(exchange_id):
+    import scanner
+    return scanner.EXCHANGE_CONFIG.get(exchange_id, {}).get('scan_cap') or SHARD_SIZE
+
+def partition(symbols, size):
+    """Consecutive shards of at most size symbols (top volume pairs land in the first one)"""
+    return [symbols[i:i + size] for i in range(0, len(symbols), size)]
+
+def authorized(token):
+    return not SHARD_TOKEN or token == SHARD_TOKEN
+
+# --- Worker Side ---
+
+async def scan_shard_async(exchange_id, symbols, config, client=None):
+    """Scan exactly these symbols in this process (no caps); {'results', 'failed'}"""
+    import scanner
+    failed = {}
+    results = await scanner.scan_market_async(exchange_id, symbols, config, client=client,
+                                              on_error=failed.__setitem__, shard=True)
+    return {'results': results, 'failed': failed}
+
+# --- Workers ---
+# Each has a name and `await run(exchange_id, symbols, config)` returning
+# the payload of scan_shard_async; any exception marks the worker unhealthy.
+
+class HttpWorker:
+    """A scanner server taking shards at POST /api/scan/shard"""
+
+    def __init__(self, url, timeout=SHARD_TIMEOUT):
+        self.name = url.rstrip('/')
+        self.timeout = timeout
+
+    async def run(self, exchange_id, symbols, config):
+        import requests
+
+        def post():
+            response = requests.post(f"{self.name}/api/scan/shard", timeout=self.timeout,
+                                     headers={'X-Shard-Token': SHARD_TOKEN} if SHARD_TOKEN else {},
+                                     json={'exchange': exchange_id, 'symbols': symbols, 'config': config})
+            response.raise_for_status()
+            return response.json()
+
+        return await asyncio.to_thread(post)
+
+_local_client = None # MockExchange of a local worker process (--mock)
+
+def mock_client(mock):
+    """MockExchange paced by the real exchange's rate budget, as a pooled client would be"""
+    import ratelimit
+    from mock_exchange import MockExchange
+    return ratelimit.attach(MockExchange(**mock), mock['exchange_id'])
+
+def mock_offline():
+    """Keep MockExchange candles and verdicts out of the candle store and shared cache under data/"""
+    import scanner
+    import symbol_cache
+    scanner.USE_CANDLE_STORE = False
+    symbol_cache.USE_SYMBOL_CACHE = False
+
+def _init_local(mock, processes):
+    global _local_client
+    import ratelimit
+    ratelimit.PROCESSES = processes  # The pool's processes share this host's IP budget
+    if mock:
+        mock_offline()
+        _local_client = mock_client(mock)
+
+def _run_local(exchange_id, symbols, config):
+    # Runs in the worker process: its shared loop keeps pooled clients between shards
+    return runtime.run(scan_shard_async(exchange_id, symbols, config, client=_local_client))
+
+class LocalWorker:
+    """One slot of a local process pool"""
+
+    def __init__(self, pool, index):
+        self.name = f"local-{index}"
+        self.pool = pool
+
+    async def run(self, exchange_id, symbols, config):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, _run_local, exchange_id, symbols, config)
+
+def local_workers(processes, mock=None):
+    """
+    (pool, workers) for `processes` spawned worker processes, each with its
+    own event loop, exchange clients and share of the rate budget. mock: MockExchange
+    keyword arguments, to scan a synthetic exchange in every process
+    instead. Shut the pool down when done.
+    """
+    pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=_init_local, initargs=(mock, processes))
+    return pool, [LocalWorker(pool, i) for i in range(processes)]
+
+# --- Coordinator ---
+
+async def scan_sharded_async(exchange_id, symbols, config=None, workers=None, on_result=None, on_error=None,
+                             size=None):
+    """
+    Scan every symbol across the workers (default: SHARD_WORKERS) and return
+    the passing results in symbol order. A worker takes the next shard as
+    soon as it is free. A worker that fails is not used again; its shard
+    goes to another worker up to SHARD_RETRIES times, after which every
+    symbol in it is reported to on_error. size: symbols per shard
+    (default shard_size).
+    """
+    if config is None:
+        config = {'use_rsi': False, 'use_adx': False}
+    if workers is None:
+        workers = [HttpWorker(url) for url in WORKERS]
+    symbols = list(symbols)
+    pending = deque((shard, 0) for shard in partition(symbols, size or shard_size(exchange_id)))
+    results = []
+
+    def report(symbol, message):
+        metrics.count_symbol(exchange_id, 'shard', 'failed')
+        if on_error:
+            on_error(symbol, message)
+
+    async def drain(worker):
+        while pending:
+            shard, attempts = pending.popleft()
+            started = time.perf_counter()
+            try:
+                payload = await worker.run(exchange_id, shard, config)
+            except Exception as e:
+                print(f"Shard Error ({worker.name}, {len(shard)} {exchange_id} symbols): {e}")
+                if attempts < SHARD_RETRIES:
+                    pending.append((shard, attempts + 1))
+                else:
+                    for symbol in shard:
+                        report(symbol, f"Shard failed on {worker.name}: {type(e).__name__}: {e}")
+                return False # Leave the remaining shards to the healthy workers
+            metrics.record('shard', time.perf_counter() - started, exchange_id)
+            for symbol, message in payload['failed'].items():
+                report(symbol, message)
+            for row in payload['results']:
+                results.append(row)
+                if on_result:
+                    on_result(row)
+        return True
+
+    print(f"Scanning {len(symbols)} pairs on {exchange_id} in {len(pending)} shards over {len(workers)} workers...")
+    healthy = list(workers)
+    while pending and healthy:
+        # Another round picks up shards requeued after the others had finished
+        done = await asyncio.gather(*(drain(w) for w in healthy))
+        healthy = [w for w, ok in zip(healthy, done) if ok]
+    while pending:
+        for symbol in pending.popleft()[0]:
+            report(symbol, 'Shard not scanned: no healthy shard worker left')
+
+    order = {s.replace('.NS', ''): i for i, s in enumerate(symbols)}
+    return sorted(results, key=lambda r: order.get(r['Symbol'], len(order)))
+
+# --- Local Launcher ---
+
+def main():
+    parser = argparse.ArgumentParser(description='Sharded scan over local worker processes or SHARD_WORKERS')
+    parser.add_argument('--exchange', default='binance')
+    parser.add_argument('--local', type=int, default=0, help='Local worker processes (default: the SHARD_WORKERS servers)')
+    parser.add_argument('--limit', type=int, default=300, help='Top volume pairs to scan')
+    parser.add_argument('--shard-size', type=int, default=None, help="Symbols per shard (default: the exchange's scan_cap)")
+    parser.add_argument('--mock', type=int, default=0, metavar='SYMBOLS',
+                        help='Scan this many synthetic MockExchange symbols instead of the live exchange')
+    parser.add_argument('--latency', type=float, default=0.02, help='Simulated seconds per mock request')
+    parser.add_argument('--compare', action='store_true', help='Also scan unsharded in this process and compare')
+    args = parser.parse_args()
+
+    # Fix for Windows AsyncIO Loop
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+    mock = None
+    if args.mock:
+        # Every process builds the same candles (same symbols, seed and clock)
+        mock = {'symbols': [f"SYM{i:04d}/USDT" for i in range(args.mock)], 'history': 1000, 'future': 1,
+                'tick_seconds': 0, 'exchange_id': args.exchange, 'latency': args.latency,
+                'start_ms': int(time.time() * 1000)}
+        symbols = mock['symbols']
+        mock_offline()  # The --compare scan runs in this process
+    else:
+        import volume_index
+        symbols = runtime.run(volume_index.top_pairs(args.exchange, args.limit))
+
+    pool = None
+    if args.local:
+        pool, workers = local_workers(args.local, mock)
+    elif WORKERS:
+        workers = [HttpWorker(url) for url in WORKERS]
+    else:
+        parser.error('Give --local N or set SHARD_WORKERS')
+
+    failed = {}
+    try:
+        started = time.perf_counter()
+        results = runtime.run(scan_sharded_async(args.exchange, symbols, {}, workers, on_error=failed.__setitem__,
+                                                     size=args.shard_size))
+        elapsed = time.perf_counter() - started
+    finally:
+        if pool:
+            pool.shutdown()
+    print(f"Sharded: {len(symbols)} symbols, {len(results)} setups, {len(failed)} failed in {elapsed:.2f}s")
+
+    if args.compare:
+        started = time.perf_counter()
+        client = mock_client(mock) if mock else None
+        single = runtime.run(scan_shard_async(args.exchange, symbols, {}, client=client))
+        print(f"One process: {len(single['results'])} setups, {len(single['failed'])} failed "
+              f"in {time.perf_counter() - started:.2f}s; results {'match' if single['results'] == results else 'DIFFER'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Key/value cache shared by every worker process, with a Redis-style surface
+# (get / set(ex=, nx=) / delete). The default backend is a SQLite file in WAL
+# mode, so all gunicorn workers on a host see one store; CACHE_URL=redis://...
+# switches to Redis (needs the redis package) for several hosts, and
+# CACHE_BACKEND=memory keeps it in-process. On top of it, single_flight lets
+# concurrent identical requests share one execution.
+
+# --- Configuration ---
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'sqlite')  # sqlite | memory | redis
+CACHE_URL = os.environ.get('CACHE_URL', '')
+CACHE_PATH = os.environ.get(
+    'CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache.db')
+)
+LOCK_TTL = 300  # Seconds a single-flight lock survives a crashed owner
+POLL_INTERVAL = 0.2  # Seconds between checks while waiting on another worker
+PURGE_EVERY = 200  # Writes between sweeps of expired SQLite rows
+MGET_CHUNK = 500  # Keys per SQLite IN (...) query
+
+class MemoryCache:
+    """In-process stand-in (tests, single worker)"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires <= time.time():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ex=None, nx=False):
+        with self._lock:
+            item = self._data.get(key)
+            if nx and item is not None and (item[1] is None or item[1] > time.time()):
+                return False
+            self._data[key] = (value, time.time() + ex if ex else None)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            return 1 if self._data.pop(key, None) is not None else 0
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set_many(self, items):
+        for key, value, ex in items:
+            self.set(key, value, ex=ex)
+
+class SQLiteCache:
+    """One SQLite file in WAL mode shared by all processes on the host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    expires REAL
+                ) WITHOUT ROWID
+            """)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value FROM cache WHERE key=? AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ex=None, nx=False):
+        conn = self._connect()
+        now = time.time()
+        expires = now + ex if ex else None
+        if nx:
+            # Atomic across processes: only replaces a missing or expired key
+            cur = conn.execute("""
+                INSERT INTO cache (key, value, expires) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET value=excluded.value, expires=excluded.expires
+                WHERE cache.expires IS NOT NULL AND cache.expires <= ?
+            """, (key, value, expires, now))
+            return cur.rowcount > 0
+        conn.execute('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)', (key, value, expires))
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            conn.execute('DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?', (now,))
+        return True
+
+    def delete(self, key):
+        return self._connect().execute('DELETE FROM cache WHERE key=?', (key,)).rowcount
+
+    def mget(self, keys):
+        conn = self._connect()
+        now = time.time()
+        found = {}
+        for i in range(0, len(keys), MGET_CHUNK):
+            chunk = keys[i:i + MGET_CHUNK]
+            found.update(conn.execute(
+                f"SELECT key, value FROM cache WHERE key IN ({','.join('?' * len(chunk))})"
+                " AND (expires IS NULL OR expires > ?)", (*chunk, now)
+            ).fetchall())
+        return [found.get(key) for key in keys]
+
+    def set_many(self, items):
+        """(key, value, ex) items in one transaction"""
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute('BEGIN')
+            conn.executemany('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                             [(key, value, now + ex if ex else None) for key, value, ex in items])
+
+def _redis_client(url):
+    import redis  # Optional dependency, only needed for CACHE_URL=redis://
+    return redis.Redis.from_url(url)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            if CACHE_URL.startswith(('redis://', 'rediss://', 'unix://')) or CACHE_BACKEND == 'redis':
+                _cache = _redis_client(CACHE_URL or 'redis://localhost:6379/0')
+            elif CACHE_BACKEND == 'memory':
+                _cache = MemoryCache()
+            else:
+                _cache = SQLiteCache(CACHE_PATH)
+    return _cache
+
+# --- JSON Helpers ---
+
+def make_key(*parts):
+    """Stable key; lists/dicts are hashed so large symbol lists stay short"""
+    out = []
+    for part in parts:
+        if isinstance(part, (list, tuple, set, dict)):
+            data = json.dumps(sorted(part) if not isinstance(part, dict) else part, sort_keys=True, default=str)
+            part = hashlib.sha1(data.encode()).hexdigest()[:16]
+        out.append(str(part))
+    return ':'.join(out)
+
+def get_json(key):
+    value = get_cache().get(key)
+    return json.loads(value) if value is not None else None
+
+def set_json(key, value, ttl=None):
+    get_cache().set(key, json.dumps(value, default=float), ex=ttl)
+
+def get_many_json(keys):
+    """Values of many keys (None where missing) in one round trip"""
+    if not keys:
+        return []
+    return [json.loads(v) if v is not None else None for v in get_cache().mget(list(keys))]
+
+def set_many_json(items):
+    """Write (key, value, ttl) items in one round trip (one transaction on SQLite)"""
+    items = [(key, json.dumps(value, default=float), ttl) for key, value, ttl in items]
+    if not items:
+        return
+    cache = get_cache()
+    if hasattr(cache, 'set_many'):
+        cache.set_many(items)
+    else:
+        pipe = cache.pipeline(transaction=False)  # Redis
+        for key, value, ttl in items:
+            pipe.set(key, value, ex=ttl)
+        pipe.execute()
+
+# --- Single Flight ---
+# The first caller for a key takes a lock entry and computes; everyone else
+# (any thread, any process) waits for the value it publishes. A crashed owner
+# only delays others until the lock's TTL runs out.
+
+def try_lock(key, ttl=LOCK_TTL):
+    """Lock token if this caller should compute key, else None"""
+    token = uuid.uuid4().hex
+    return token if get_cache().set(f"lock:{key}", token, ex=ttl, nx=True) else None
+
+def unlock(key, token):
+    cache = get_cache()
+    held = cache.get(f"lock:{key}")
+    if held is not None and (held.decode() if isinstance(held, bytes) else held) == token:
+        cache.delete(f"lock:{key}")
+
+def single_flight(key, compute, ttl, cacheable=None, timeout=LOCK_TTL):
+    """Cached JSON value for key, computed at most once at a time across workers"""
+    deadline = time.time() + timeout
+    while True:
+        value = get_json(key)
+        if value is not None:
+            return value
+        token = try_lock(key)
+        if token is not None:
+            try:
+                # The previous owner may have published and unlocked since the miss above
+                value = get_json(key)
+                if value is not None:
+                    return value
+                value = compute()
+                if cacheable is None or cacheable(value):
+                    set_json(key, value, ttl)
+                return value
+            finally:
+                unlock(key, token)
+        if time.time() > deadline:
+            return compute()
+        time.sleep(POLL_INTERVAL)
+
+async def single_flight_async(key, compute, ttl, cacheable=None, timeout=LOCK_TTL):
+    """single_flight for coroutines; compute is an async callable"""
+    deadline = time.time() + timeout
+    while True:
+        value = get_json(key)
+        if value is not None:
+            return value
+        token = try_lock(key)
+        if token is not None:
+            try:
+                # The previous owner may have published and unlocked since the miss above
+                value = get_json(key)
+                if value is not None:
+                    return value
+                value = await compute()
+                if cacheable is None or cacheable(value):
+                    set_json(key, value, ttl)
+                return value
+            finally:
+                unlock(key, token)
+        if time.time() > deadline:
+            return await compute()
+        await asyncio.sleep(POLL_INTERVAL)
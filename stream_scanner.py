@@ -0,0 +1,243 @@
+import argparse
+import asyncio
+import sys
+import time
+from collections import deque
+import scanner
+import indicators
+
+# --- Configuration ---
+STREAMS_PER_CONNECTION = 200  # Subscriptions batched per watch_ohlcv_for_symbols call
+SEED_CONCURRENCY = 5  # REST requests in flight while seeding indicator state
+RECONNECT_DELAY = 5  # Seconds to wait after a stream error
+
+class StreamScanner:
+    """
+    Event-driven EMA-stack scanner over exchange kline streams.
+
+    Indicator state is seeded once per symbol/timeframe over REST, then
+    advanced in O(1) from the WebSocket feed. Conditions are re-evaluated only
+    when a candle closes, and signal changes ('add', 'change', 'remove') are
+    pushed to every subscriber queue.
+    """
+
+    def __init__(self, exchange_id, symbols, config=None, client=None):
+        self.exchange_id = exchange_id
+        self.symbols = list(symbols)
+        self.config = config or {}
+        self.client = client
+        self.states = {}  # (symbol, timeframe) -> indicators.IndicatorState
+        self.forming = {}  # (symbol, timeframe) -> open candle [ts, o, h, l, c, v]
+        self.closes_4h = {}  # symbol -> last six closed 4H closes (24h change)
+        self.signals = {}  # symbol -> current passing result
+        self._queues = set()
+        self._tasks = []
+
+    # --- Subscribers ---
+
+    def subscribe(self):
+        queue = asyncio.Queue()
+        self._queues.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._queues.discard(queue)
+
+    def _publish(self, event):
+        for queue in self._queues:
+            queue.put_nowait(event)
+
+    # --- State ---
+
+    async def seed(self, symbol):
+        """Build indicator state from one REST window per timeframe"""
+        for tf in scanner.TIMEFRAMES:
+            ohlcv = await self.client.fetch_ohlcv(symbol, tf, limit=scanner.OHLCV_LIMIT)
+            if not ohlcv:
+                continue
+            state = indicators.IndicatorState(scanner.RSI_PERIOD, scanner.ADX_PERIOD)
+            for candle in ohlcv[:-1]:
+                state.update(candle[2], candle[3], candle[4], candle[0])
+            self.states[(symbol, tf)] = state
+            self.forming[(symbol, tf)] = ohlcv[-1]
+            if tf == '4h':
+                self.closes_4h[symbol] = deque((c[4] for c in ohlcv[:-1]), maxlen=6)
+
+    def on_candles(self, symbol, timeframe, ohlcv):
+        """Apply streamed candles; returns True if at least one candle closed"""
+        key = (symbol, timeframe)
+        state = self.states.get(key)
+        if state is None:
+            return False
+
+        closed = False
+        for candle in sorted(ohlcv, key=lambda c: c[0]):
+            forming = self.forming.get(key)
+            if forming is None or candle[0] == forming[0]:
+                self.forming[key] = candle
+            elif candle[0] > forming[0]:
+                # A newer candle opened, so the previous one is final
+                state.update(forming[2], forming[3], forming[4], forming[0])
+                if timeframe == '4h':
+                    self.closes_4h[symbol].append(forming[4])
+                self.forming[key] = candle
+                closed = True
+        return closed
+
+    def evaluate(self, symbol):
+        """Scanner rules on the current candles (closed state + open candle)"""
+        values = {}
+        for tf in scanner.TIMEFRAMES:
+            state = self.states.get((symbol, tf))
+            forming = self.forming.get((symbol, tf))
+            if state is None or forming is None:
+                return None
+            values[tf] = state.peek(forming[2], forming[3], forming[4])
+
+        # Same minimum history as the polling scanner's 4H check
+        if self.states[(symbol, '4h')].count + 1 < 20:
+            return None
+        side = scanner.side_4h(values['4h'])
+        if side is None or not scanner.confirms_1h(side, values['1h']) or not scanner.confirms_15m(side, values['15m']):
+            return None
+
+        closes = self.closes_4h.get(symbol)
+        price_24h_ago = closes[0] if closes is not None and len(closes) == closes.maxlen else None
+        return scanner.build_result(symbol, self.exchange_id, side, values['15m'], price_24h_ago, self.config)
+
+    def refresh(self, symbol):
+        """Re-evaluate one symbol and publish the change, if any"""
+        result = self.evaluate(symbol)
+        previous = self.signals.get(symbol)
+
+        if result is None:
+            if previous is None:
+                return
+            del self.signals[symbol]
+            event = 'remove'
+        else:
+            self.signals[symbol] = result
+            if previous is None:
+                event = 'add'
+            elif (previous['Side'], previous['Type']) != (result['Side'], result['Type']):
+                event = 'change'
+            else:
+                return
+        self._publish({'event': event, 'symbol': symbol, 'result': result, 'time': time.time()})
+
+    # --- Streams ---
+
+    async def _watch(self, symbol, timeframe):
+        while True:
+            try:
+                ohlcv = await self.client.watch_ohlcv(symbol, timeframe)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Stream Error {symbol} {timeframe}: {e}")
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            if self.on_candles(symbol, timeframe, ohlcv):
+                self.refresh(symbol)
+
+    async def _watch_many(self, subscriptions):
+        """One multiplexed connection for many symbol/timeframe pairs"""
+        while True:
+            try:
+                updates = await self.client.watch_ohlcv_for_symbols(subscriptions)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Stream Error ({len(subscriptions)} streams): {e}")
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            for symbol, by_timeframe in updates.items():
+                if any(self.on_candles(symbol, tf, ohlcv) for tf, ohlcv in by_timeframe.items()):
+                    self.refresh(symbol)
+
+    async def run(self):
+        if self.client is None:
+            import ccxt.pro as ccxtpro
+            options = scanner.EXCHANGE_CONFIG[self.exchange_id]['options']
+            self.client = getattr(ccxtpro, self.exchange_id)({'enableRateLimit': True, 'options': options})
+
+        sem = asyncio.Semaphore(SEED_CONCURRENCY)
+
+        async def protected_seed(symbol):
+            async with sem:
+                try:
+                    await self.seed(symbol)
+                except Exception as e:
+                    print(f"Seed Error {symbol}: {e}")
+
+        print(f"Seeding {len(self.symbols)} symbols on {self.exchange_id}...")
+        await asyncio.gather(*(protected_seed(s) for s in self.symbols))
+        for symbol in self.symbols:
+            self.refresh(symbol)
+
+        subscriptions = [[s, tf] for s in self.symbols for tf in scanner.TIMEFRAMES if (s, tf) in self.states]
+        if self.client.has.get('watchOHLCVForSymbols'):
+            for i in range(0, len(subscriptions), STREAMS_PER_CONNECTION):
+                self._tasks.append(asyncio.ensure_future(self._watch_many(subscriptions[i:i + STREAMS_PER_CONNECTION])))
+        else:
+            self._tasks = [asyncio.ensure_future(self._watch(s, tf)) for s, tf in subscriptions]
+
+        print(f"Streaming {len(subscriptions)} kline subscriptions...")
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            await self.close()
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self.client:
+            await self.client.close()
+
+async def print_signals(stream):
+    queue = stream.subscribe()
+    while True:
+        event = await queue.get()
+        result = event['result'] or {}
+        print(f"{time.strftime('%H:%M:%S')} {event['event'].upper():<7} {event['symbol']:<16} "
+              f"{result.get('Side', '')} {result.get('Type', '')}")
+
+async def main_async(args):
+    if args.mock:
+        from mock_exchange import MockExchange
+        symbols = [f"MOCK{i}/USDT" for i in range(args.limit)]
+        client = MockExchange(symbols, tick_seconds=args.tick)
+    else:
+        symbols = scanner.fetch_top_volume_pairs_sync(args.exchange, limit=args.limit)
+        client = None
+
+    stream = StreamScanner(args.exchange if not args.mock else 'mock', symbols,
+                           {'use_rsi': args.rsi, 'use_adx': args.adx}, client)
+    printer = asyncio.ensure_future(print_signals(stream))
+    try:
+        await stream.run()
+    finally:
+        printer.cancel()
+
+def main():
+    # Fix for Windows AsyncIO Loop
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+    parser = argparse.ArgumentParser(description='Real-time EMA stack scanner over kline streams')
+    parser.add_argument('exchange', nargs='?', default='binance')
+    parser.add_argument('--limit', type=int, default=scanner.TOP_N_COINS, help='Number of symbols to watch')
+    parser.add_argument('--rsi', action='store_true', help='Apply the RSI filter')
+    parser.add_argument('--adx', action='store_true', help='Apply the ADX filter')
+    parser.add_argument('--mock', action='store_true', help='Use the local mock feed instead of the exchange')
+    parser.add_argument('--tick', type=float, default=1.0, help='Mock feed: seconds per simulated 15m candle')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main_async(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
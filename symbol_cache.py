@@ -0,0 +1,66 @@
+import math
+import os
+import time
+import pandas as pd
+import shared_cache
+
+# Per-symbol evaluation state, one layer per timeframe: the latest candle's
+# close and indicator values that the stage rules (scanner.side_4h,
+# confirms_1h, confirms_15m, build_result) read. Each layer expires when the
+# candle it was computed from closes, so a 4H layer is reused for up to four
+# hours and a 15m one for up to 15 minutes. Layers carry no config (filters
+# are applied per request) and live in shared_cache, so every worker and
+# every overlapping symbol list reuses them. A scan reads all its symbols'
+# layers in one batch before it starts and writes the new ones in one batch
+# when it ends, both off the event loop.
+#
+# Within a layer's lifetime the open candle keeps moving; its verdict is
+# the one from when the layer was computed.
+
+# --- Configuration ---
+USE_SYMBOL_CACHE = os.environ.get('SYMBOL_CACHE', '1') != '0'
+MIN_TTL = 60  # Seconds a layer is kept when its newest candle is already closed (e.g. market shut)
+TIMEFRAME_MS = {'15m': 15 * 60 * 1000, '1h': 60 * 60 * 1000, '4h': 4 * 60 * 60 * 1000}
+CANDLE_TZ = {'nse': 'Asia/Kolkata'}  # Venues whose candle timestamps are local wall time (default UTC)
+
+def _key(exchange_id, symbol, timeframe):
+    return shared_cache.make_key('layer', exchange_id, symbol, timeframe)
+
+def ttl_until_close(exchange_id, candles, timeframe, now=None):
+    """Seconds until the newest candle of a CandleBuffer closes"""
+    now = time.time() if now is None else now
+    last = pd.Timestamp(int(candles.timestamp[-1]), unit='ms')
+    if exchange_id in CANDLE_TZ:
+        last = last.tz_localize(CANDLE_TZ[exchange_id])
+    close = last.timestamp() + TIMEFRAME_MS[timeframe] / 1000
+    ttl = close - now
+    return ttl if ttl > 0 else MIN_TTL
+
+def lookup_many(exchange_id, symbols, timeframes):
+    """{symbol: {timeframe: layer}} for the cached layers of many symbols, in one cache read"""
+    layers = {symbol: {} for symbol in symbols}
+    if not USE_SYMBOL_CACHE:
+        return layers
+    pairs = [(symbol, tf) for symbol in symbols for tf in timeframes]
+    values = shared_cache.get_many_json([_key(exchange_id, symbol, tf) for symbol, tf in pairs])
+    for (symbol, tf), layer in zip(pairs, values):
+        if layer is not None:
+            layers[symbol][tf] = layer
+    return layers
+
+def entry(exchange_id, symbol, timeframe, layer, candles, now=None):
+    """(key, layer, expiry) for store_many: kept until the candle it was computed from closes"""
+    now = time.time() if now is None else now
+    return _key(exchange_id, symbol, timeframe), layer, now + ttl_until_close(exchange_id, candles, timeframe, now)
+
+def store_many(entries, now=None):
+    """Write the entries of a scan in one cache write (ones whose candle closed meanwhile are dropped)"""
+    if not USE_SYMBOL_CACHE:
+        return
+    now = time.time() if now is None else now
+    shared_cache.set_many_json([(key, layer, math.ceil(expiry - now)) for key, layer, expiry in entries
+                                if expiry > now])
+
+def latest_values(columns):
+    """{name: array} -> the newest value of each as a plain float"""
+    return {name: float(values[-1]) for name, values in columns.items()}
@@ -0,0 +1,18 @@
+import os
+import sys
+import pytest
+
+# Tests import the top-level modules directly and must never touch the
+# production caches under data/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('CACHE_BACKEND', 'memory')
+os.environ.setdefault('CANDLE_STORE', '0')
+os.environ.setdefault('SYMBOL_CACHE', '0')
+
+@pytest.fixture
+def cache(monkeypatch):
+    """A fresh in-process shared_cache for one test"""
+    import shared_cache
+    fresh = shared_cache.MemoryCache()
+    monkeypatch.setattr(shared_cache, '_cache', fresh)
+    return fresh
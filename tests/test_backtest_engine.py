@@ -0,0 +1,12 @@
+import backtest_engine as engine
+from mock_exchange import MockExchange
+
+START_MS = 1_700_000_000_000
+
+def test_simulate_matches_loop():
+    df_15m = MockExchange(['BT/USDT'], history=96 * 120, future=1, start_ms=START_MS, tick_seconds=0) \
+        .history('BT/USDT')
+    df = engine.align_timeframes(*engine.build_timeframes(df_15m, symbol='BT/USDT'))
+    trades, balance = engine.simulate(df)
+    assert trades, 'mock history produced no trades to compare'
+    assert (trades, balance) == engine.simulate_loop(df)
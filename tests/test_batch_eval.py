@@ -0,0 +1,22 @@
+import candle_buffer
+import runtime
+import scanner
+from mock_exchange import MockExchange
+
+START_MS = 1_700_000_000_000
+SYMBOLS = [f"SYM{i:03d}/USDT" for i in range(60)]
+
+def scan(batch, config):
+    candle_buffer.clear()
+    client = MockExchange(SYMBOLS, history=1000, future=1, start_ms=START_MS, tick_seconds=0, exchange_id='bybit')
+    failed = {}
+    results = runtime.run(scanner.scan_market_async('bybit', SYMBOLS, config, batch=batch, client=client,
+                                                    on_error=failed.__setitem__))
+    assert not failed
+    return results
+
+def test_batch_matches_per_symbol():
+    for config in ({'use_rsi': False, 'use_adx': False}, {'use_rsi': True, 'use_adx': True}):
+        per_symbol = scan(False, config)
+        assert per_symbol, 'mock universe produced no setups to compare'
+        assert scan(True, config) == per_symbol
@@ -0,0 +1,98 @@
+import numpy as np
+import candle_buffer
+import indicator_cache
+import runtime
+import scanner
+from candle_buffer import CandleBuffer
+from mock_exchange import MockExchange
+
+START_MS = 1_700_000_000_000
+
+def rows(n, start=START_MS, step=900_000, offset=0.0):
+    ts = start + np.arange(n) * step
+    base = np.arange(n, dtype=np.float64) + offset
+    return np.column_stack([ts, base, base + 2, base - 1, base + 1, base * 10]).tolist()
+
+def snapshot(window):
+    return window.timestamp.copy(), window.values.copy()
+
+def assert_unchanged(window, before):
+    np.testing.assert_array_equal(window.timestamp, before[0])
+    np.testing.assert_array_equal(window.values, before[1])
+
+def test_windows_survive_updates():
+    buffer = CandleBuffer.from_rows(rows(50), capacity=50)
+    window = buffer.window()
+    before = snapshot(window)
+
+    last = rows(50)[-1]
+    buffer.extend([[last[0], -1, -1, -1, -1, -1]])  # Open candle rewritten
+    assert buffer.close[-1] == -1
+    assert_unchanged(window, before)
+
+    buffer.extend(rows(200, start=last[0] + 900_000))  # Past the slack
+    assert_unchanged(window, before)
+
+    buffer.reset(rows(50, offset=1000))
+    assert_unchanged(window, before)
+    assert buffer.close[0] == 1001
+
+def test_resample_matches_pandas():
+    df = MockExchange(['RS/USDT'], history=1000, future=1, start_ms=START_MS + 5 * 900_000, tick_seconds=0) \
+        .history('RS/USDT').reset_index()
+    candles = CandleBuffer.from_frame(df)
+    for timeframe, rule in (('1h', '1h'), ('4h', '4h')):
+        per_bar = scanner.TIMEFRAME_MS[timeframe] // scanner.TIMEFRAME_MS['15m']
+        grouped = df.set_index('timestamp').resample(rule, origin='epoch')
+        expected = grouped.agg({'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'})
+        counts = grouped['close'].count()
+        expected = expected[counts > 0]
+        if counts[counts > 0].iloc[0] < per_bar:
+            expected = expected.iloc[1:]
+
+        got = scanner.resample_ohlcv(candles, timeframe)
+        np.testing.assert_array_equal(got.timestamp, expected.index.to_numpy().astype('datetime64[ms]').view(np.int64))
+        np.testing.assert_allclose(got.values, expected[candle_buffer.COLUMNS].to_numpy().T, rtol=1e-12)
+
+def test_indicators_match_frame():
+    df = MockExchange(['IC/USDT'], history=600, future=1, start_ms=START_MS, tick_seconds=0) \
+        .history('IC/USDT').reset_index()
+    candles = CandleBuffer.from_frame(df)
+    np.testing.assert_array_equal(indicator_cache.ema_values('IC/USDT', '15m', candles, 21),
+                                  scanner.calculate_ema(df['close'], 21).to_numpy())
+    np.testing.assert_array_equal(indicator_cache.rsi_values('IC/USDT', '15m', candles, 14),
+                                  scanner.calculate_rsi(df['close']).to_numpy())
+    adx = scanner.calculate_adx(df)
+    np.testing.assert_array_equal(indicator_cache.adx_values('IC/USDT', '15m', candles, 14),
+                                  np.vstack([s.to_numpy() for s in adx]))
+
+def test_kept_buffers_match_fresh_fetches():
+    # Wall-clock mock, so warm buffers take the incremental tail fetch
+    symbols = [f"KB{i:02d}/USDT" for i in range(40)]
+    client = MockExchange(symbols, history=16 * scanner.OHLCV_LIMIT + 200, future=20, tick_seconds=0, exchange_id='bybit')
+    config = {'use_rsi': True, 'use_adx': True}
+    candle_buffer.clear()
+    runtime.run(scanner.scan_market_async('bybit', symbols, config, client=client))
+    for bars in (1, 2, 1, 8, 1):  # 8: the tail fetch comes back full and the buffer is refilled
+        client.advance(bars)
+        kept = runtime.run(scanner.scan_market_async('bybit', symbols, config, client=client))
+        candle_buffer.clear()
+        assert kept == runtime.run(scanner.scan_market_async('bybit', symbols, config, client=client))
+
+def test_warm_buffers_fetch_only_the_tail():
+    limits = []
+
+    class Recording(MockExchange):
+        async def fetch_ohlcv(self, symbol, timeframe='15m', since=None, limit=None, params=None):
+            limits.append((since is not None, limit))
+            return await super().fetch_ohlcv(symbol, timeframe, since, limit, params)
+
+    symbols = ['TL0/USDT', 'TL1/USDT']
+    client = Recording(symbols, history=16 * scanner.OHLCV_LIMIT + 200, future=5, tick_seconds=0, exchange_id='bybit')
+    candle_buffer.clear()
+    runtime.run(scanner.scan_market_async('bybit', symbols, {}, client=client))
+    assert limits and all(not tail and limit == scanner.OHLCV_LIMIT for tail, limit in limits)
+    limits.clear()
+    client.advance(1)
+    runtime.run(scanner.scan_market_async('bybit', symbols, {}, client=client))
+    assert limits and all(tail and limit <= 2 + 1 + scanner.TAIL_MARGIN for tail, limit in limits)
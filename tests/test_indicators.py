@@ -0,0 +1,39 @@
+import numpy as np
+import scanner
+from indicators import IndicatorState
+from mock_exchange import MockExchange
+
+START_MS = 1_700_000_000_000
+
+def candles(bars=600):
+    return MockExchange(['IND/USDT'], history=bars, future=1, start_ms=START_MS, tick_seconds=0) \
+        .history('IND/USDT').reset_index()
+
+def streamed(df):
+    state = IndicatorState()
+    rows = [state.update(h, l, c, ts) for ts, h, l, c in zip(df['timestamp'], df['high'], df['low'], df['close'])]
+    return {name: np.array([r[name] for r in rows]) for name in rows[0]}
+
+def test_matches_pandas_ewm():
+    df = candles()
+    got = streamed(df)
+    adx, plus_di, minus_di = scanner.calculate_adx(df)
+    expected = {
+        'ema21': scanner.calculate_ema(df['close'], 21),
+        'ema50': scanner.calculate_ema(df['close'], 50),
+        'ema100': scanner.calculate_ema(df['close'], 100),
+        'rsi': scanner.calculate_rsi(df['close']),
+        'adx': adx,
+        'plus_di': plus_di,
+        'minus_di': minus_di,
+    }
+    for name, series in expected.items():
+        np.testing.assert_array_equal(got[name], series.to_numpy(), err_msg=name)
+
+def test_peek_leaves_state_unchanged():
+    df = candles(200)
+    state = IndicatorState.from_frame(df.iloc[:-1])
+    last = df.iloc[-1]
+    peeked = state.peek(last['high'], last['low'], last['close'])
+    assert state.count == len(df) - 1
+    assert state.update(last['high'], last['low'], last['close']) == peeked
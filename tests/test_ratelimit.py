@@ -0,0 +1,111 @@
+import asyncio
+import types
+import pytest
+import ratelimit
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Manual monotonic clock for the limiter"""
+    fake = types.SimpleNamespace(now=1000.0)
+    fake.monotonic = lambda: fake.now
+    fake.perf_counter = fake.monotonic
+    monkeypatch.setattr(ratelimit, 'time', fake)
+    return fake
+
+def limiter(exchange_id, processes=1):
+    return ratelimit.RateLimiter(exchange_id, **ratelimit.RATE_LIMITS[exchange_id], processes=processes)
+
+def test_processes_split_the_ip_budget(clock):
+    shared = limiter('binance', processes=4)
+    assert shared.capacity == pytest.approx(2400 * ratelimit.SAFETY_MARGIN / 4)
+    assert shared.rate == pytest.approx(shared.capacity / 60)
+    # The header counts the whole IP: 1800 of 2160 used leaves each of 4 processes 90
+    shared.observe(200, {'X-MBX-USED-WEIGHT-1M': '1800'})
+    assert shared.tokens == pytest.approx((2400 * ratelimit.SAFETY_MARGIN - 1800) / 4)
+
+    bybit = limiter('bybit', processes=3)
+    bybit.observe(200, {'X-Bapi-Limit-Status': '30'})
+    assert bybit.tokens == pytest.approx(30 * ratelimit.SAFETY_MARGIN / 3)
+
+def test_registry_uses_processes(monkeypatch):
+    monkeypatch.setattr(ratelimit, 'PROCESSES', 2)
+    monkeypatch.setattr(ratelimit, '_limiters', {})
+    assert ratelimit.get_limiter('mexc').capacity == pytest.approx(20 * ratelimit.SAFETY_MARGIN / 2)
+
+def test_refill_is_continuous_and_capped(clock):
+    bucket = limiter('mexc')  # 18 requests / 2s after the safety margin
+    for _ in range(18):
+        assert bucket._try_take(1) == 0
+    wait = bucket._try_take(1)
+    assert wait == pytest.approx(1 / bucket.rate)
+    clock.now += wait * 1.001
+    assert bucket._try_take(1) == 0
+    clock.now += 3600
+    assert bucket.state()['tokens'] == pytest.approx(bucket.capacity)
+
+def test_ccxt_weights(clock):
+    bucket = limiter('binance')
+    assert bucket.request_weight(5) == 5
+    assert bucket.request_weight(None) == 1
+    assert bucket.request_weight(10 ** 6) == bucket.capacity
+    assert limiter('bybit').request_weight(5) == 1
+
+def test_used_weight_header_syncs_tokens(clock):
+    bucket = limiter('binance')
+    bucket.observe(200, {'x-mbx-used-weight-1m': '2000'})
+    assert bucket.tokens == pytest.approx(bucket.capacity - 2000)
+    assert bucket.state()['last_used_weight'] == 2000
+    bucket.observe(200, {'x-mbx-used-weight-1m': 'garbage'})  # Ignored
+    assert bucket.tokens == pytest.approx(bucket.capacity - 2000)
+
+def test_429_backs_off_exponentially(clock):
+    bucket = limiter('bybit')
+    bucket.observe(429, {})
+    assert bucket.tokens == 0 and bucket.rate_scale == 0.5
+    assert bucket._try_take(1) == pytest.approx(ratelimit.BACKOFF_BASE)
+    bucket.observe(429, {})  # Same burst: no further slowdown
+    assert bucket.rate_scale == 0.5 and bucket.strikes == 1
+
+    clock.now += ratelimit.BACKOFF_BASE
+    bucket.observe(429, {})
+    assert bucket.strikes == 2 and bucket.rate_scale == 0.25
+    assert bucket._try_take(1) == pytest.approx(2 * ratelimit.BACKOFF_BASE)
+
+    clock.now += 2 * ratelimit.BACKOFF_BASE
+    bucket.observe(200, {})
+    assert bucket.strikes == 0 and bucket.rate_scale == pytest.approx(0.25 + ratelimit.RECOVERY_STEP)
+
+def test_retry_after_and_ban(clock):
+    bucket = limiter('binance')
+    bucket.observe(429, {'Retry-After': '7'})
+    assert bucket.state()['blocked_for'] == pytest.approx(7)
+
+    banned = limiter('binance')
+    banned.observe(418, {})
+    assert banned.state()['blocked_for'] == pytest.approx(ratelimit.BAN_BACKOFF)
+    assert banned.state()['throttled'] == 1
+
+def test_call_retries_after_the_backoff(monkeypatch):
+    import ccxt
+    monkeypatch.setattr(ratelimit, '_limiters', {})
+    monkeypatch.setattr(ratelimit, 'BACKOFF_BASE', 0.01)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ccxt.DDoSProtection('429')
+        return 'ok'
+
+    assert asyncio.run(ratelimit.call('bybit', flaky)) == 'ok'
+    assert len(attempts) == 3
+    assert ratelimit.get_limiter('bybit').throttled == 2
+
+    async def broken():
+        attempts.append(1)
+        raise ccxt.BadSymbol('nope')
+
+    attempts.clear()
+    with pytest.raises(ccxt.BadSymbol):
+        asyncio.run(ratelimit.call('bybit', broken))
+    assert len(attempts) == 1  # Not retryable
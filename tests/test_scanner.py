@@ -0,0 +1,35 @@
+import candle_buffer
+import runtime
+import scanner
+from mock_exchange import MockExchange
+
+class Recording(MockExchange):
+    """MockExchange that records the limit of every OHLCV request"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limits = []
+
+    async def fetch_ohlcv(self, symbol, timeframe='15m', since=None, limit=None, params=None):
+        self.limits.append(limit)
+        return await super().fetch_ohlcv(symbol, timeframe, since, limit, params)
+
+def test_window_pages_past_the_venue_limit():
+    client = Recording(['PG/USDT'], history=3000, future=1, tick_seconds=0, exchange_id='bybit')
+    expected = runtime.run(MockExchange.fetch_ohlcv(client, 'PG/USDT', '15m', limit=scanner.SINGLE_FETCH_BARS))
+    ohlcv = runtime.run(scanner.fetch_ohlcv_window(client, 'PG/USDT', '15m', scanner.SINGLE_FETCH_BARS))
+    assert ohlcv == expected
+    page = scanner.EXCHANGE_CONFIG['bybit']['max_ohlcv_limit']
+    assert len(client.limits) == 2 and max(client.limits) <= page
+
+def test_single_fetch_warms_up_the_4h_ema(monkeypatch):
+    monkeypatch.setitem(scanner.EXCHANGE_CONFIG['bybit'], 'single_fetch', True)
+    client = Recording(['SF/USDT'], history=3000, future=1, tick_seconds=0, exchange_id='bybit')
+    candle_buffer.clear()
+    base = runtime.run(scanner.fetch_ohlcv_async(client, 'SF/USDT', '15m', limit=scanner.SINGLE_FETCH_BARS))
+    assert len(base) == scanner.SINGLE_FETCH_BARS
+    assert len(scanner.derive_timeframe(base, '4h')) >= max(scanner.EMA_PERIODS)
+
+    client.limits.clear()
+    runtime.run(scanner.scan_market_async('bybit', ['SF/USDT'], {}, client=client))
+    assert client.limits and max(client.limits) <= 2 + 1 + scanner.TAIL_MARGIN  # Warm: one tail request
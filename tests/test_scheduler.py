@@ -0,0 +1,24 @@
+import asyncio
+import scheduler
+
+def test_one_process_scans_each_close(cache, monkeypatch, tmp_path):
+    monkeypatch.setattr(scheduler, 'SNAPSHOT_DIR', str(tmp_path))
+    scans = []
+
+    async def scan(exchange_id, symbols, config):
+        scans.append(exchange_id)
+        return []
+
+    monkeypatch.setattr(scheduler.scanner, 'scan_market_async', scan)
+    boundary = 1_700_000_100
+    # Two workers (each with its own universe) waking at the same close, on a shared cache
+    for _ in range(2):
+        universe = {'bybit': {'symbols': ['A/USDT'], 'timestamp': float('inf')},
+                    'mexc': {'symbols': ['A/USDT'], 'timestamp': float('inf')}}
+        asyncio.run(scheduler.scan_exchange('bybit', universe, boundary))
+        asyncio.run(scheduler.scan_exchange('mexc', universe, boundary))
+    assert scans == ['bybit', 'mexc']
+
+    asyncio.run(scheduler.scan_exchange('bybit', universe, boundary + scheduler.CLOSE_INTERVAL))
+    assert scans == ['bybit', 'mexc', 'bybit']
+    assert scheduler.read_snapshot('bybit') is not None
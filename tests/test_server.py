@@ -0,0 +1,58 @@
+import json
+import pytest
+import server
+
+SYMBOLS = ['A/USDT', 'B/USDT', 'C/USDT']
+
+@pytest.fixture
+def stream(cache, monkeypatch, tmp_path):
+    """stream(rows, failed=None, since='') -> [(event, data), ...] of one /api/scan/stream request"""
+    monkeypatch.setattr(server.volume_index, 'start_background', lambda: None)
+    monkeypatch.setattr(server.scheduler, 'SNAPSHOT_DIR', str(tmp_path))
+    client = server.app.test_client()
+
+    def run(rows, failed=None, since=''):
+        async def scan(exchange_id, symbols, config, on_result=None, on_error=None):
+            for row in rows:
+                on_result(row)
+            for symbol, error in (failed or {}).items():
+                on_error(symbol, error)
+            return rows
+
+        monkeypatch.setattr(server.scanner, 'scan_market_async', scan)
+        cache.delete(server.scan_key('bybit', SYMBOLS, {'use_rsi': False, 'use_adx': False, 'only_pulse': False}))
+        body = client.get(f"/api/scan/stream?exchange=bybit&symbols={','.join(SYMBOLS)}&since={since}").data.decode()
+        events = []
+        for block in body.strip().split('\n\n'):
+            event, data = block.split('\n')
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+        return events
+
+    return run
+
+def row(symbol, price):
+    return {'Symbol': symbol, 'Price': price, 'Pass': True}
+
+def test_first_stream_adds_every_row(stream):
+    events = stream([row('A/USDT', 1), row('B/USDT', 2)])
+    assert events[:-1] == [('add', row('A/USDT', 1)), ('add', row('B/USDT', 2))]
+    assert events[-1][0] == 'done' and events[-1][1]['count'] == 2
+
+def test_deltas_against_the_previous_snapshot(stream):
+    first = stream([row('A/USDT', 1), row('B/USDT', 2)])[-1][1]['snapshot']
+    events = stream([row('A/USDT', 1.5), row('C/USDT', 3)], since=first)
+    assert events[:-1] == [('change', row('A/USDT', 1.5)), ('add', row('C/USDT', 3)), ('remove', {'Symbol': 'B/USDT'})]
+
+    second = events[-1][1]['snapshot']
+    events = stream([row('A/USDT', 1.5), row('C/USDT', 3)], since=second)
+    assert events[:-1] == []  # Nothing changed
+
+def test_failed_symbol_keeps_its_last_row(stream):
+    first = stream([row('A/USDT', 1), row('B/USDT', 2)])[-1][1]['snapshot']
+    events = stream([row('A/USDT', 1)], failed={'B/USDT': 'NetworkError: timeout'}, since=first)
+    assert events[:-1] == [('failed', {'Symbol': 'B/USDT', 'error': 'NetworkError: timeout'})]
+    assert events[-1][1]['count'] == 2
+
+    # The snapshot still holds B, so a later stream without it removes it
+    events = stream([row('A/USDT', 1)], since=events[-1][1]['snapshot'])
+    assert events[:-1] == [('remove', {'Symbol': 'B/USDT'})]
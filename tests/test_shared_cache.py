@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import pytest
+import shared_cache
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, monkeypatch, tmp_path):
+    """shared_cache on each local backend"""
+    if request.param == 'memory':
+        cache = shared_cache.MemoryCache()
+    else:
+        cache = shared_cache.SQLiteCache(str(tmp_path / 'cache.db'))
+    monkeypatch.setattr(shared_cache, '_cache', cache)
+    return cache
+
+def test_lock_is_exclusive_until_it_expires(backend):
+    token = shared_cache.try_lock('job')
+    assert token is not None
+    assert shared_cache.try_lock('job') is None
+    shared_cache.unlock('job', 'someone-else')  # Not the owner: still held
+    assert shared_cache.try_lock('job') is None
+    shared_cache.unlock('job', token)
+    assert shared_cache.try_lock('job') is not None
+
+def test_expired_lock_is_taken_over(backend):
+    # A crashed owner's lock past its TTL: NX still succeeds (an upsert over the expired row on SQLite)
+    backend.set('lock:job', 'crashed', ex=-1)
+    token = shared_cache.try_lock('job')
+    assert token is not None
+    held = backend.get('lock:job')
+    assert (held.decode() if isinstance(held, bytes) else held) == token
+
+def test_single_flight_computes_once(backend):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'n': len(calls)}
+
+    assert shared_cache.single_flight('value', compute, ttl=60) == {'n': 1}
+    assert shared_cache.single_flight('value', compute, ttl=60) == {'n': 1}
+    assert len(calls) == 1
+    assert shared_cache.try_lock('value') is not None  # Released after computing
+
+def test_single_flight_skips_uncacheable(backend):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'symbols': []}
+
+    for _ in range(2):
+        shared_cache.single_flight('empty', compute, ttl=60, cacheable=lambda v: bool(v['symbols']))
+    assert len(calls) == 2
+
+def test_single_flight_waits_for_the_owner(backend, monkeypatch):
+    monkeypatch.setattr(shared_cache, 'POLL_INTERVAL', 0.01)
+    token = shared_cache.try_lock('shared')
+    waited = {}
+    waiter = threading.Thread(target=lambda: waited.update(
+        value=shared_cache.single_flight('shared', lambda: {'by': 'waiter'}, ttl=60, timeout=5)))
+    waiter.start()
+    shared_cache.set_json('shared', {'by': 'owner'}, 60)
+    shared_cache.unlock('shared', token)
+    waiter.join()
+    assert waited['value'] == {'by': 'owner'}
+
+def test_single_flight_gives_up_after_timeout(backend, monkeypatch):
+    monkeypatch.setattr(shared_cache, 'POLL_INTERVAL', 0.01)
+    assert shared_cache.try_lock('stuck') is not None
+    assert shared_cache.single_flight('stuck', lambda: {'by': 'self'}, ttl=60, timeout=0.05) == {'by': 'self'}
+
+def test_single_flight_async(backend):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {'ok': True}
+
+    async def both():
+        return await asyncio.gather(shared_cache.single_flight_async('async', compute, ttl=60),
+                                    shared_cache.single_flight_async('async', compute, ttl=60))
+
+    assert asyncio.run(both()) == [{'ok': True}, {'ok': True}]
+    assert len(calls) == 1
@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+import candle_buffer
+import runtime
+import scanner
+import shared_cache
+import symbol_cache
+from mock_exchange import MockExchange
+
+class Counting(MockExchange):
+    """MockExchange that counts OHLCV requests"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requests = 0
+
+    async def fetch_ohlcv(self, *args, **kwargs):
+        self.requests += 1
+        return await super().fetch_ohlcv(*args, **kwargs)
+
+def test_store_and_lookup_many(cache, monkeypatch):
+    monkeypatch.setattr(symbol_cache, 'USE_SYMBOL_CACHE', True)
+    candles = candle_buffer.CandleBuffer.from_rows([[1_000 * 900_000, 1, 2, 0.5, 1.5, 10]])
+    now = 1_000 * 900_000 / 1000 + 60  # A minute into the candle
+    symbol_cache.store_many([symbol_cache.entry('bybit', 'A/USDT', '15m', {'close': 1.5}, candles, now)], now)
+    # Written after its candle closed (a long scan): dropped
+    symbol_cache.store_many([symbol_cache.entry('bybit', 'B/USDT', '15m', {'close': 2.5}, candles, now)], now + 900)
+    assert symbol_cache.lookup_many('bybit', ['A/USDT', 'B/USDT'], ['15m', '1h']) == \
+        {'A/USDT': {'15m': {'close': 1.5}}, 'B/USDT': {}}
+
+def test_rescan_reuses_layers(cache, monkeypatch):
+    monkeypatch.setattr(symbol_cache, 'USE_SYMBOL_CACHE', True)
+    symbols = [f"SC{i:02d}/USDT" for i in range(30)]
+    # Candles of a closed market, so layers live MIN_TTL and no candle closes mid-test
+    client = Counting(symbols, history=1000, future=1, start_ms=1_700_000_000_000, tick_seconds=0, exchange_id='bybit')
+    config = {'use_rsi': True, 'use_adx': True}
+    candle_buffer.clear()
+    first = runtime.run(scanner.scan_market_async('bybit', symbols, config, client=client))
+    requests = client.requests
+    assert runtime.run(scanner.scan_market_async('bybit', symbols, config, client=client)) == first
+    assert client.requests == requests  # Every layer was served from the cache
+
+def test_sqlite_batches(tmp_path):
+    sqlite = shared_cache.SQLiteCache(str(tmp_path / 'cache.db'))
+    sqlite.set_many([(f"k{i}", f"v{i}".encode(), 60 if i % 2 else None) for i in range(shared_cache.MGET_CHUNK + 5)])
+    sqlite.set_many([('gone', b'x', -1)])
+    keys = [f"k{i}" for i in range(shared_cache.MGET_CHUNK + 5)] + ['gone', 'absent']
+    assert sqlite.mget(keys) == [f"v{i}".encode() for i in range(shared_cache.MGET_CHUNK + 5)] + [None, None]
+
+def candle_at(ts):
+    """CandleBuffer whose newest candle opened at ts (datetime-like)"""
+    ms = int(pd.Timestamp(ts).value // 1_000_000)
+    return candle_buffer.CandleBuffer.from_rows([[ms, 1, 2, 0.5, 1.5, 10]])
+
+def epoch(ts):
+    return pd.Timestamp(ts).timestamp()
+
+def test_ttl_runs_until_the_candle_closes():
+    candles = candle_at('2024-01-02 08:00')
+    for timeframe, seconds in (('15m', 900), ('1h', 3600), ('4h', 14400)):
+        now = epoch('2024-01-02 08:00:10+00:00')
+        assert symbol_cache.ttl_until_close('bybit', candles, timeframe, now) == pytest.approx(seconds - 10)
+
+def test_ttl_of_a_closed_candle_is_the_minimum():
+    # e.g. a market that is shut: its last candle closed long ago
+    candles = candle_at('2024-01-02 08:00')
+    now = epoch('2024-01-02 09:00+00:00')
+    assert symbol_cache.ttl_until_close('bybit', candles, '15m', now) == symbol_cache.MIN_TTL
+
+def test_nse_candles_close_in_kolkata_time():
+    # yfinance NSE bars carry IST wall time: the 10:15 1h bar closes at 11:15 IST = 05:45 UTC
+    candles = candle_at('2024-01-02 10:15')
+    now = epoch('2024-01-02 10:45+05:30')
+    assert symbol_cache.ttl_until_close('nse', candles, '1h', now) == pytest.approx(1800)
+    # Read as UTC, it would look 5.5 hours in the future
+    assert symbol_cache.ttl_until_close('bybit', candles, '1h', now) == pytest.approx(1800 + 5.5 * 3600)
+
+def test_store_many_writes_the_remaining_ttl(cache, monkeypatch):
+    monkeypatch.setattr(symbol_cache, 'USE_SYMBOL_CACHE', True)
+    candles = candle_at('2024-01-02 08:00')
+    now = epoch('2024-01-02 08:05+00:00')
+    entry = symbol_cache.entry('bybit', 'A/USDT', '15m', {'close': 1.5}, candles, now)
+    writes = []
+    monkeypatch.setattr(shared_cache, 'set_many_json', writes.extend)
+    symbol_cache.store_many([entry], now + 120)  # Written two minutes later, at the end of the scan
+    assert writes == [(entry[0], {'close': 1.5}, 600 - 120)]
+
+def test_disabled_cache_is_a_no_op(cache):
+    assert not symbol_cache.USE_SYMBOL_CACHE  # SYMBOL_CACHE=0 in conftest
+    symbol_cache.store_many([('k', {'a': 1}, float('inf'))])
+    assert cache._data == {}
+    assert symbol_cache.lookup_many('bybit', ['A/USDT'], ['15m']) == {'A/USDT': {}}
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import time
+import exchange_pool
+import ratelimit
+import runtime
+import shared_cache
+
+# Rolling top-volume ranking per exchange. A background task on the shared
+# event loop refreshes every exchange's tickers concurrently through the
+# pooled clients; readers get the top N straight from memory. The ranking is
+# also published to shared_cache, so across all workers only one of them
+# downloads the tickers per refresh interval.
+
+# --- Configuration ---
+INDEX_EXCHANGES = [e for e in os.environ.get('PAIRS_EXCHANGES', 'binance,bybit,mexc').split(',') if e]
+REFRESH_INTERVAL = 300  # Seconds between ticker snapshots
+MAX_AGE = 3600  # Older rankings are refreshed before being served
+QUOTE_CURRENCY = 'USDT'
+
+_index = {}
+# Structure: {'binance': {'symbols': ['BTC/USDT:USDT', ...], 'timestamp': 0.0}, ...}
+
+def rank_tickers(tickers, quote_currency=QUOTE_CURRENCY):
+    """Symbols quoted in quote_currency, highest quoteVolume first"""
+    pairs = []
+    for symbol, ticker in tickers.items():
+        # Robust check: allow 'BTC/USDT' or 'BTCUSDT'
+        is_valid_symbol = (f'/{quote_currency}' in symbol or symbol.endswith(quote_currency))
+
+        if is_valid_symbol and ticker.get('quoteVolume'):
+            pairs.append({'symbol': symbol, 'volume': ticker['quoteVolume']})
+
+    # Sort by volume
+    sorted_pairs = sorted(pairs, key=lambda x: x['volume'], reverse=True)
+    return [p['symbol'] for p in sorted_pairs]
+
+def top(exchange_id, limit):
+    """Top symbols from memory, or None if the ranking is missing or too old"""
+    if exchange_id == 'nse':
+        from scanner import NIFTY_TOTAL
+        return NIFTY_TOTAL[:limit]
+    entry = _index.get(exchange_id)
+    if entry is None or time.time() - entry['timestamp'] > MAX_AGE:
+        return None
+    return entry['symbols'][:limit]
+
+async def refresh(exchange_id, ttl=REFRESH_INTERVAL):
+    """Update the ranking (from another worker's snapshot if one is fresh enough)"""
+    async def fetch():
+        client = await exchange_pool.get_async_client(exchange_id)
+        tickers = await ratelimit.call(exchange_id, client.fetch_tickers)
+        return {'symbols': rank_tickers(tickers), 'timestamp': time.time()}
+
+    entry = await shared_cache.single_flight_async(
+        shared_cache.make_key('volume', exchange_id), fetch, ttl, cacheable=lambda e: bool(e['symbols'])
+    )
+    _index[exchange_id] = entry
+    return entry['symbols']
+
+async def top_pairs(exchange_id, limit):
+    """Top symbols, refreshing first on a cold or stale index"""
+    symbols = top(exchange_id, limit)
+    if symbols is None:
+        symbols = (await refresh(exchange_id))[:limit]
+    return symbols
+
+async def refresh_all(exchanges=None):
+    exchanges = exchanges or INDEX_EXCHANGES
+    responses = await asyncio.gather(*(refresh(e) for e in exchanges), return_exceptions=True)
+    for exchange_id, res in zip(exchanges, responses):
+        if isinstance(res, Exception):
+            print(f"Volume index error ({exchange_id}): {res}")
+
+async def run_forever(exchanges=None, interval=REFRESH_INTERVAL):
+    while True:
+        started = time.time()
+        await refresh_all(exchanges)
+        await asyncio.sleep(max(interval - (time.time() - started), 1))
+
+_future = None
+_future_pid = None
+
+def start_background(exchanges=None):
+    """Keep the index warm from this process's shared event loop (started once per process)"""
+    global _future, _future_pid
+    if _future is not None and _future_pid == os.getpid() and not _future.done():
+        return
+    _future = runtime.submit(run_forever(exchanges))
+    _future_pid = os.getpid()
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import PropTypes from 'prop-types';
 import { Logo } from './Logo';
@@ -29,6 +29,7 @@ export default function ScannerDashboard() {
     });
 
     const [searchQuery, setSearchQuery] = useState(''); // Symbol Search State
+    const snapshotRef = useRef({ key: null, id: null }); // Last streamed result set, for delta refreshes
 
     const [searchParams] = useSearchParams();
     const marketMode = searchParams.get('market') || 'crypto';
@@ -39,8 +40,10 @@ export default function ScannerDashboard() {
     ] : [
         { id: 'binance', name: 'Binance', color: 'text-yellow-400', url: 'https://www.binance.com/en/futures/' },
         { id: 'bybit', name: 'Bybit', color: 'text-orange-400', url: 'https://www.bybit.com/trade/' },
-        { id: 'mexc', name: 'MEXC', color: 'text-green-400', url: 'https://www.mexc.com/exchange/' }
+        { id: 'mexc', name: 'MEXC', color: 'text-green-400', url: 'https://www.mexc.com/exchange/' },
+        { id: 'all', name: 'All Venues', color: 'text-indigo-400', url: '' }
     ];
+    const MULTI_EXCHANGES = ['binance', 'bybit', 'mexc'];
 
     // Force exchange selection if handling stocks
     useEffect(() => {
@@ -77,9 +80,87 @@ export default function ScannerDashboard() {
         setResults([]); // Just clear results on exchange switch
         setPairs([]);   // Clear pairs to force re-fetch on next scan
         setError(null);
+        snapshotRef.current = { key: null, id: null };
     }, [selectedExchange]);
 
+    // Stream results over SSE: rows appear as soon as each symbol is evaluated.
+    // A refresh with the same exchange/config only receives adds, changes and removes.
+    const streamScan = (targets) => new Promise((resolve, reject) => {
+        const key = `${selectedExchange}|${JSON.stringify(config)}`;
+        const params = new URLSearchParams({
+            exchange: selectedExchange,
+            symbols: targets.join(','),
+            use_rsi: config.use_rsi,
+            use_adx: config.use_adx,
+            only_pulse: config.only_pulse
+        });
+        if (snapshotRef.current.key === key && snapshotRef.current.id) {
+            params.set('since', snapshotRef.current.id);
+        } else {
+            setResults([]);
+        }
+
+        const source = new EventSource(`${API_BASE}/scan/stream?${params}`);
+        const failed = [];
+        const upsert = (e) => {
+            const row = JSON.parse(e.data);
+            setResults(prev => prev.some(r => r.Symbol === row.Symbol)
+                ? prev.map(r => (r.Symbol === row.Symbol ? row : r))
+                : [...prev, row]);
+        };
+        source.addEventListener('add', upsert);
+        source.addEventListener('change', upsert);
+        source.addEventListener('remove', (e) => {
+            const { Symbol } = JSON.parse(e.data);
+            setResults(prev => prev.filter(r => r.Symbol !== Symbol));
+        });
+        source.addEventListener('failed', (e) => {
+            failed.push(JSON.parse(e.data).Symbol);
+        });
+        source.addEventListener('done', (e) => {
+            const { snapshot, count } = JSON.parse(e.data);
+            snapshotRef.current = { key, id: snapshot };
+            source.close();
+            resolve({ count, failed });
+        });
+        source.onerror = () => {
+            source.close();
+            snapshotRef.current = { key: null, id: null };
+            reject(new Error('Scan stream failed'));
+        };
+    });
+
+    const failedMessage = (failed) =>
+        `${failed.length} symbol(s) could not be fetched (rate limited or unreachable): ${failed.slice(0, 5).join(', ')}${failed.length > 5 ? ', ...' : ''}`;
+
+    // All venues: one request scans every exchange's top pairs concurrently and
+    // returns a merged list (rows of the same asset grouped across exchanges)
+    const multiScan = async () => {
+        setIsDemo(false);
+        setIsScanning(true);
+        setError(null);
+        setResults([]);
+        try {
+            const res = await axios.post(`${API_BASE}/scan`, { exchanges: MULTI_EXCHANGES, config: config });
+            const failed = Object.keys(res.data.failed || {});
+            if (failed.length > 0) {
+                setError(failedMessage(failed));
+            } else if (res.data.results && res.data.results.length === 0) {
+                setError("No setups found matching current criteria.");
+            }
+            setResults(res.data.results || []);
+        } catch (err) {
+            console.error("Scan failed", err);
+            setError("Scan execution failed.");
+        } finally {
+            setIsScanning(false);
+        }
+    };
+
     const handleScan = async (manualPairs = null) => {
+        if (selectedExchange === 'all') {
+            return multiScan();
+        }
         let targets = Array.isArray(manualPairs) ? manualPairs : pairs;
 
         // If no pairs loaded, try to fetch them first
@@ -108,15 +189,33 @@ export default function ScannerDashboard() {
 
         setIsDemo(false);
         setIsScanning(true);
-        setResults([]);
         setError(null);
+        if (typeof EventSource !== 'undefined') {
+            try {
+                const { count, failed } = await streamScan(targets);
+                if (failed.length > 0) {
+                    setError(failedMessage(failed));
+                } else if (count === 0) {
+                    setError("No setups found matching current criteria.");
+                }
+                setIsScanning(false);
+                return;
+            } catch (err) {
+                console.error("Scan stream failed, falling back to a single request", err);
+            }
+        }
+
+        setResults([]);
         try {
             const res = await axios.post(`${API_BASE}/scan`, {
                 symbols: targets,
                 config: config,
                 exchange: selectedExchange // Critical Fix: Pass selected exchange
             });
-            if (res.data.results && res.data.results.length === 0) {
+            const failed = Object.keys(res.data.failed || {});
+            if (failed.length > 0) {
+                setError(failedMessage(failed));
+            } else if (res.data.results && res.data.results.length === 0) {
                 setError("No setups found matching current criteria.");
             }
             setResults(res.data.results || []);
@@ -372,10 +471,10 @@ export default function ScannerDashboard() {
                                     })
                                     .map((item, idx) => (
                                         <ResultTicket
-                                            key={item.Symbol}
+                                            key={item.Asset ? `${item.Asset}-${item.Side}` : item.Symbol}
                                             item={item}
                                             index={idx}
-                                            exchange={selectedExchange}
+                                            exchange={selectedExchange === 'all' ? item.Exchange : selectedExchange}
                                         />
                                     ))}
                             </AnimatePresence>
@@ -525,7 +624,7 @@ const ResultTicket = ({ item, index, exchange }) => {
                         </div>
                         {/* Source Verification Badge */}
                         <div className="px-2 py-0.5 rounded text-[10px] font-mono text-gray-500 bg-gray-800/50 border border-gray-700">
-                            {item.Exchange || exchange}
+                            {item.Exchanges ? item.Exchanges.join(' · ') : (item.Exchange || exchange)}
                         </div>
                     </div>
                     <div className="text-xl font-mono font-bold text-white">